@@ -1,7 +1,8 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, request, abort, jsonify
+import os
+from flask import Flask, jsonify
 from routes.index import bp as index_bp
 from routes.basket import bp as basket_bp
 from routes.yolo import bp as yolo_bp
@@ -9,10 +10,14 @@ from routes.export import bp as export_bp
 from routes.result_page import bp as result_bp
 from routes.upload import bp as upload_bp
 from routes.videos import bp as videos_bp
-from services.r2_service import r2_stream_video, r2_list_videos
+from routes.hls import bp as hls_bp
+from routes.sprites import bp as sprites_bp
+from services.r2_service import r2_list_videos
 from routes.analysis_end import bp as analysis_end_bp
 from routes.test_r2_permission import bp as test_r2_permission_bp
 from routes.delete_video import bp as delete_video_bp
+from routes.events import bp as events_bp
+import config
 
 app = Flask(__name__, 
             static_folder='static',
@@ -26,10 +31,12 @@ app.register_blueprint(export_bp)
 app.register_blueprint(result_bp)
 app.register_blueprint(upload_bp)
 app.register_blueprint(videos_bp)
+app.register_blueprint(hls_bp)
+app.register_blueprint(sprites_bp)
 app.register_blueprint(analysis_end_bp)
 app.register_blueprint(test_r2_permission_bp)
 app.register_blueprint(delete_video_bp)
-
+app.register_blueprint(events_bp)
 
 # 🔥 디버깅: R2 파일 목록 확인
 @app.route("/debug/r2_files")
@@ -37,26 +44,30 @@ def debug_r2_files():
     files = r2_list_videos()
     return jsonify(files)
 
-# 🔥 R2 영상 스트리밍
-@app.route("/videos/<path:filename>")
-def stream_video(filename):
-    print(f"🔍 Streaming request: {filename}")
-    
-    # R2에 파일이 있는지 확인
-    all_files = r2_list_videos()
-    if filename not in all_files:
-        print(f"❌ File not found in R2: {filename}")
-        print(f"📁 Available files: {all_files}")
-        return abort(404)
-    
-    resp = r2_stream_video(filename, request)
-    if resp is None:
-        print(f"❌ Stream failed: {filename}")
-        return abort(500)
-    
-    print(f"✅ Streaming success: {filename}")
-    return resp
+# 🔥 디버깅: 모델 로딩 / warm-up / 추론 시간
+@app.route("/debug/models")
+def debug_models():
+    from services.model_registry import registry, memory_stats
+    return jsonify({"pid": os.getpid(), "memory_mb": memory_stats(), "models": registry.stats()})
+
+# 🔥 디버깅: R2 다운로드 캐시 hit / miss / 절약한 바이트
+@app.route("/debug/r2_cache")
+def debug_r2_cache():
+    from services.r2_cache_service import r2_cache
+    return jsonify(r2_cache.stats())
+
+# 🔥 디버깅: R2 객체 목록 캐시
+@app.route("/debug/r2_index")
+def debug_r2_index():
+    from services.r2_index_service import r2_index
+    return jsonify(r2_index.stats())
 
 if __name__ == "__main__":
+    # 🔥 영구 작업 큐 워커 (별도 프로세스를 띄우지 않는 배포에서는 웹 프로세스 안에서 실행)
+    #    import 될 때가 아니라 여기서만 시작 (spawn 으로 뜨는 분석 풀 프로세스도 이 모듈을 import 함)
+    #    gunicorn 은 gunicorn.conf.py 의 post_fork 에서 / debug reloader 는 실제 서버 프로세스에서만
+    if config.JOB_QUEUE and config.JOB_WORKER_EMBEDDED and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from worker import start_embedded_worker
+        start_embedded_worker()
     print("http://127.0.0.1:8000")
     app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1,111 @@
+"""
+YOLO 백엔드 비교 (torch / onnx / openvino) - 같은 프레임으로 속도 + 검출 결과 일치 여부 확인
+
+    python bench_backends.py sample.mp4 --frames 300 --backends torch,onnx,openvino --int8
+
+- 속도     : 백엔드별 프레임당 추론 시간 / FPS (warm-up 제외)
+- 일치 여부 : torch 결과 기준
+    ball_agree   공 검출 여부가 같은 프레임 비율
+    ball_px      둘 다 공을 찾은 프레임의 중심 좌표 차이 (평균 / 최대, px)
+    person_diff  사람 수 차이 평균
+"""
+import argparse
+import math
+import time
+
+import cv2
+
+import config
+from services.yolo_service import YoloHighlighter
+
+
+def read_frames(video_path, count, start_sec=0.0):
+    cap = cv2.VideoCapture(str(video_path))
+    cap.set(cv2.CAP_PROP_POS_MSEC, start_sec * 1000)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_backend(frames, backend, int8, batch_size):
+    yolo = YoloHighlighter(config.YOLO_MODEL_PATH, None, None, backend=backend, int8=int8)
+    view = (0, 0, 1.0, 1.0, False)
+
+    detections = []
+    t0 = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        batch = [(i + j, f, False, view) for j, f in enumerate(frames[i:i + batch_size])]
+        detections.extend(yolo._infer(batch))
+    elapsed = time.perf_counter() - t0
+    return detections, elapsed
+
+
+def compare(base, other):
+    agree = sum(1 for a, b in zip(base, other) if a[0] == b[0])
+    dists = [
+        math.hypot(a[1] - b[1], a[2] - b[2])
+        for a, b in zip(base, other) if a[0] and b[0]
+    ]
+    person_diff = sum(abs(a[3] - b[3]) for a, b in zip(base, other)) / max(len(base), 1)
+    return {
+        "ball_agree": agree / max(len(base), 1),
+        "ball_px_mean": sum(dists) / len(dists) if dists else 0.0,
+        "ball_px_max": max(dists) if dists else 0.0,
+        "person_diff": person_diff,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--start", type=float, default=0.0, help="시작 위치 (초)")
+    parser.add_argument("--backends", default="torch,onnx,openvino")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--batch", type=int, default=config.YOLO_BATCH_SIZE)
+    parser.add_argument("--min-agree", type=float, default=0.98)
+    parser.add_argument("--max-px", type=float, default=4.0)
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames, args.start)
+    if not frames:
+        raise SystemExit(f"영상을 읽을 수 없습니다: {args.video}")
+    print(f"🎞 {len(frames)} frames, batch {args.batch}")
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "torch" not in backends:
+        backends.insert(0, "torch")
+
+    results = {}
+    for backend in backends:
+        int8 = args.int8 and backend != "torch"
+        detections, elapsed = run_backend(frames, backend, int8, args.batch)
+        results[backend] = detections
+        print(
+            f"⏱ {backend:<9}{' int8' if int8 else '     '} "
+            f"{elapsed / len(frames) * 1000:7.1f} ms/frame  {len(frames) / elapsed:6.1f} fps"
+        )
+
+    failed = False
+    for backend in backends:
+        if backend == "torch":
+            continue
+        r = compare(results["torch"], results[backend])
+        ok = r["ball_agree"] >= args.min_agree and r["ball_px_max"] <= args.max_px
+        failed |= not ok
+        print(
+            f"{'✅' if ok else '❌'} {backend:<9} ball_agree {r['ball_agree']:.3f}  "
+            f"ball_px {r['ball_px_mean']:.2f}/{r['ball_px_max']:.2f}  "
+            f"person_diff {r['person_diff']:.2f}"
+        )
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
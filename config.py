@@ -17,11 +17,12 @@ PROGRESS_PATH = BASE_DIR / "progress.json"
 # 골대 좌표 저장 파일
 COORDS_PATH = BASE_DIR / "basket_coords.json"
 
-# 분석 결과(클립, 프레임 정보 등) 저장 파일
+# 분석 결과(클립, 통계 등) 저장 DB
+ANALYSIS_DB_PATH = BASE_DIR / "utils" / "analysis_store.db"
+ANALYSIS_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+# 예전 JSON 저장 파일 (처음 실행 시 ANALYSIS_DB_PATH 로 옮기고 .migrated 로 이름 변경)
 ANALYSIS_STORE_PATH = BASE_DIR / "utils" / "analysis_store.json"
-ANALYSIS_STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
-if not ANALYSIS_STORE_PATH.exists():
-    ANALYSIS_STORE_PATH.write_text("[]", encoding="utf-8")
 
 
 from dotenv import load_dotenv
@@ -32,3 +33,183 @@ load_dotenv()
 R2_ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
 R2_SECRET_KEY = os.getenv("R2_SECRET_KEY")
 R2_BUCKET = os.getenv("R2_BUCKET")
+
+# YOLO 모델
+# - MODEL_PRELOAD : 1 이면 gunicorn master 에서 가중치만 미리 로딩 (fork 된 워커가 가중치 메모리 공유)
+#                   master 에서는 추론하지 않음 (torch 스레드 풀 / CUDA 는 fork 이후 워커에서 처음 초기화)
+# - MODEL_WARMUP  : 1 이면 빈 프레임으로 1번 추론해서 첫 요청 지연을 없앰
+#                   (preload 면 워커 fork 직후 post_fork 에서, 아니면 첫 로딩 직후)
+YOLO_MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "mixup100epo.pt")
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "1") == "1"
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+# - YOLO_BACKEND   : torch / onnx / openvino (onnx, openvino 는 가중치 옆에 변환 결과를 캐시)
+# - YOLO_INT8      : 1 이면 INT8 양자화 모델 사용 (onnx / openvino 만)
+# - YOLO_INT8_DATA : openvino INT8 보정용 데이터셋 yaml (비우면 ultralytics 기본값)
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch")
+YOLO_INT8 = os.getenv("YOLO_INT8", "0") == "1"
+YOLO_INT8_DATA = os.getenv("YOLO_INT8_DATA") or None
+
+# YOLO 추론 설정
+# - YOLO_BATCH_SIZE : model() 한 번에 넣을 프레임 수
+# - YOLO_STRIDE     : 골대 근처에 공이 없을 때 k 프레임마다 1번 추론 (1 = 매 프레임, 기존과 동일)
+YOLO_BATCH_SIZE = int(os.getenv("YOLO_BATCH_SIZE", "8"))
+YOLO_STRIDE = int(os.getenv("YOLO_STRIDE", "1"))
+# - YOLO_PIPELINE     : 1 이면 디코딩 / 추론 / 후처리를 스레드로 겹쳐서 실행
+# - YOLO_QUEUE_DEPTH  : pipeline 모드의 디코딩 프레임 큐 길이 (메모리 상한)
+# - YOLO_DECODE_WIDTH : 디코딩 단계에서 미리 축소할 폭 (0 = 원본 그대로)
+YOLO_PIPELINE = os.getenv("YOLO_PIPELINE", "0") == "1"
+YOLO_QUEUE_DEPTH = int(os.getenv("YOLO_QUEUE_DEPTH", "16"))
+YOLO_DECODE_WIDTH = int(os.getenv("YOLO_DECODE_WIDTH", "0"))
+# - YOLO_ROI            : 1 이면 저장된 골대 좌표 주변만 crop 해서 추론
+# - YOLO_ROI_MARGIN_*   : crop 여백 (골대 폭 배수)
+# - YOLO_ROI_FULL_EVERY : 사람 수 집계용 전체 프레임 추론 간격 (프레임)
+YOLO_ROI = os.getenv("YOLO_ROI", "0") == "1"
+YOLO_ROI_MARGIN_X = float(os.getenv("YOLO_ROI_MARGIN_X", "3.0"))
+YOLO_ROI_MARGIN_TOP = float(os.getenv("YOLO_ROI_MARGIN_TOP", "4.0"))
+YOLO_ROI_MARGIN_BOTTOM = float(os.getenv("YOLO_ROI_MARGIN_BOTTOM", "2.0"))
+YOLO_ROI_FULL_EVERY = int(os.getenv("YOLO_ROI_FULL_EVERY", "30"))
+
+# 다중 영상 분석 프로세스 풀
+# - YOLO_WORKERS       : 동시에 분석할 워커 프로세스 수
+# - YOLO_TORCH_THREADS : 워커당 torch 스레드 수 (0 = CPU 코어 수 / 워커 수)
+YOLO_WORKERS = int(os.getenv("YOLO_WORKERS", "1"))
+YOLO_TORCH_THREADS = int(os.getenv("YOLO_TORCH_THREADS", "0"))
+# - YOLO_SHARDS        : 영상 1개 분석 시 나눌 시간 구간 수 (0/1 = 나누지 않음)
+YOLO_SHARDS = int(os.getenv("YOLO_SHARDS", "0"))
+
+# 진행 상태 저장
+# - PROGRESS_PERSIST       : 1 이면 progress.json 에 재시작 복구용으로 저장 (0 = 메모리만)
+# - PROGRESS_SAVE_INTERVAL : 파일 저장 최소 간격 (초). 상태 변경 / 10% 이상 변화는 바로 저장
+PROGRESS_PERSIST = os.getenv("PROGRESS_PERSIST", "1") == "1"
+PROGRESS_SAVE_INTERVAL = float(os.getenv("PROGRESS_SAVE_INTERVAL", "2.0"))
+
+# 영구 작업 큐 (SQLite) - 분석 / export 작업을 DB 에 기록해 서버 재시작 후에도 이어서 실행
+# - JOB_QUEUE              : 1 이면 작업을 큐에 넣고 작업 워커가 실행 (0 = 예전처럼 웹 프로세스 스레드)
+# - JOB_WORKER_EMBEDDED    : 1 이면 웹 프로세스 안에서도 작업 워커 스레드 실행 (서버당 1개, Dockerfile)
+#                            0 (기본) 이면 별도 프로세스 `python worker.py` 필요 (Procfile 의 worker:)
+# - JOB_*_CONCURRENCY      : 타입별 동시 실행 수 (모든 워커 합계)
+# - JOB_MAX_ATTEMPTS       : 실패 시 최대 시도 횟수 (재시도 간격 JOB_RETRY_BACKOFF_SEC * 2^n)
+# - JOB_STALE_SEC          : heartbeat 가 이 시간 이상 끊긴 running 작업은 다시 대기열로
+JOB_QUEUE = os.getenv("JOB_QUEUE", "1") == "1"
+JOB_WORKER_EMBEDDED = os.getenv("JOB_WORKER_EMBEDDED", "0") == "1"
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", str(BASE_DIR / "jobs.db")))
+JOB_YOLO_CONCURRENCY = int(os.getenv("JOB_YOLO_CONCURRENCY", "1"))
+JOB_EXPORT_CONCURRENCY = int(os.getenv("JOB_EXPORT_CONCURRENCY", "2"))
+JOB_HLS_CONCURRENCY = int(os.getenv("JOB_HLS_CONCURRENCY", "1"))
+JOB_SPRITE_CONCURRENCY = int(os.getenv("JOB_SPRITE_CONCURRENCY", "1"))
+# - UPLOAD_WORKERS         : 업로드 파일 변환 + R2 업로드 동시 처리 수
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SEC = float(os.getenv("JOB_RETRY_BACKOFF_SEC", "5"))
+JOB_STALE_SEC = float(os.getenv("JOB_STALE_SEC", "60"))
+# - JOB_FEED_POLL_SEC      : SSE 스트림용, 다른 프로세스가 실행 중인 작업의 상태 변화를 확인하는 간격
+#                            (프로세스당 스레드 1개, 이 프로세스에서 실행 중인 작업은 바로 알림)
+JOB_FEED_POLL_SEC = float(os.getenv("JOB_FEED_POLL_SEC", "2.0"))
+
+# 프레임별 검출 결과(npz) 저장 디렉터리 - 분석 결과 레코드에는 파일 참조만 저장
+FRAMES_STORE_DIR = Path(os.getenv("FRAMES_STORE_DIR", str(BASE_DIR / "utils" / "frames")))
+
+# 분석 영상 입력 방식
+# - YOLO_INGEST        : stream = R2 서명 URL 을 바로 디코딩 (다운로드 대기 / 디스크 사용 없음)
+#                        download = 전체 다운로드 후 분석 (예전 방식)
+# - R2_PRESIGN_EXPIRES : 분석용 서명 URL 유효 시간 (초) - 긴 영상 분석 중 만료되지 않도록 넉넉히
+YOLO_INGEST = os.getenv("YOLO_INGEST", "stream")
+R2_PRESIGN_EXPIRES = int(os.getenv("R2_PRESIGN_EXPIRES", str(12 * 3600)))
+
+# R2 다운로드 로컬 캐시 (골대 선택 / 분석 / export 공용, 키 + ETag 기준)
+# - R2_CACHE_MAX_GB : 캐시 최대 크기, 넘으면 오래 안 쓴 영상부터 삭제
+R2_CACHE_DIR = Path(os.getenv("R2_CACHE_DIR", str(TMP_DIR / "r2_cache")))
+R2_CACHE_MAX_GB = float(os.getenv("R2_CACHE_MAX_GB", "20"))
+
+# 골대 선택용 프레임 JPEG 캐시 (영상 + ETag + 시각별, static 으로 바로 서빙)
+THUMB_CACHE_DIR = BASE_DIR / "static" / "frames" / "thumbs"
+# 타임라인 미리보기 스프라이트 캐시 (영상 + ETag 별 시트 JPEG + index.json + thumbs.vtt)
+# - SPRITE_INTERVAL_SEC : 썸네일 간격 (초)
+# - SPRITE_WIDTH        : 썸네일 1장 폭 (px, 높이는 영상 비율대로)
+# - SPRITE_COLS / ROWS  : 시트 1장에 담는 칸 수 (기본 10x10 = 시트 1장에 100장)
+# - SPRITE_MAX_FAILURES / SPRITE_RETRY_AFTER_SEC : 같은 영상 (ETag) 생성이 이만큼 실패하면
+#                        이 시간 동안은 다시 만들지 않고 오류로 응답 (깨진 영상에 ffmpeg 무한 반복 방지)
+SPRITE_CACHE_DIR = BASE_DIR / "static" / "frames" / "sprites"
+SPRITE_INTERVAL_SEC = int(os.getenv("SPRITE_INTERVAL_SEC", "5"))
+SPRITE_WIDTH = int(os.getenv("SPRITE_WIDTH", "160"))
+SPRITE_COLS = int(os.getenv("SPRITE_COLS", "10"))
+SPRITE_ROWS = int(os.getenv("SPRITE_ROWS", "10"))
+SPRITE_MAX_FAILURES = int(os.getenv("SPRITE_MAX_FAILURES", "3"))
+SPRITE_RETRY_AFTER_SEC = int(os.getenv("SPRITE_RETRY_AFTER_SEC", "3600"))
+
+# R2 객체 목록 캐시 (영상 목록 / 스트리밍 존재 확인 / ETag)
+# - R2_INDEX_TTL   : 목록을 다시 읽는 간격 (초). 우리 쪽 업로드 / 삭제는 바로 반영
+# - R2_INDEX_STAMP : 업로드 / 삭제 시 mtime 을 갱신해 같은 서버의 다른 프로세스에도 알리는 파일
+R2_INDEX_TTL = float(os.getenv("R2_INDEX_TTL", "60"))
+R2_INDEX_STAMP = Path(os.getenv("R2_INDEX_STAMP", str(BASE_DIR / "r2_index.stamp")))
+
+# /videos/<파일> 스트리밍 프록시
+# - R2_MAX_POOL          : boto3 연결 풀 크기 (gunicorn 스레드 수 이상 권장)
+# - STREAM_CHUNK_KB      : R2 응답을 이 크기씩 읽어서 바로 전달 (요청당 메모리 상한)
+# - VIDEO_CACHE_MAX_AGE  : 브라우저 캐시 시간 (초, 이후에는 ETag 로 재검증)
+R2_MAX_POOL = int(os.getenv("R2_MAX_POOL", "64"))
+STREAM_CHUNK_KB = int(os.getenv("STREAM_CHUNK_KB", "256"))
+VIDEO_CACHE_MAX_AGE = int(os.getenv("VIDEO_CACHE_MAX_AGE", "3600"))
+# 재생 방식
+# - VIDEO_PLAYBACK     : redirect = R2 서명 URL 로 302 (영상 바이트가 Flask 워커를 거치지 않음)
+#                        proxy    = 위 스트리밍 프록시로 직접 전달 (서명 URL 을 못 쓰는 환경용)
+#                        (/videos/<파일>?mode=redirect|json|proxy 로 요청별 지정 가능)
+# - VIDEO_URL_EXPIRES  : 재생용 서명 URL 유효 시간 (초)
+# - VIDEO_URL_MARGIN   : 만료까지 이 시간보다 적게 남으면 새 URL 발급 (긴 영상 재생 중 만료 방지)
+VIDEO_PLAYBACK = os.getenv("VIDEO_PLAYBACK", "redirect")
+VIDEO_URL_EXPIRES = int(os.getenv("VIDEO_URL_EXPIRES", "21600"))
+VIDEO_URL_MARGIN = int(os.getenv("VIDEO_URL_MARGIN", "7200"))
+
+# 업로드 영상 변환 (ffprobe 로 확인 후 필요한 만큼만)
+# - TRANSCODE_MODE          : auto = H.264(yuv420p)/AAC 면 remux, 음성만 다르면 음성만 재인코딩
+#                             full = 항상 전체 재인코딩 (예전 방식)
+# - TRANSCODE_PRESET / CRF  : 전체 재인코딩 시 libx264 설정
+# - TRANSCODE_THREADS       : ffmpeg 인코딩 스레드 수 (0 = 자동)
+TRANSCODE_MODE = os.getenv("TRANSCODE_MODE", "auto")
+TRANSCODE_PRESET = os.getenv("TRANSCODE_PRESET", "fast")
+TRANSCODE_CRF = int(os.getenv("TRANSCODE_CRF", "23"))
+TRANSCODE_THREADS = int(os.getenv("TRANSCODE_THREADS", "0"))
+TRANSCODE_AUDIO_BITRATE = os.getenv("TRANSCODE_AUDIO_BITRATE", "128k")
+# 분석용 프록시 (저해상도 / 고정 fps, 음성 없음) - 업로드 때 같이 만들어 R2 에 PROXY_PREFIX + 영상 이름으로 저장
+# - ANALYSIS_PROXY  : 1 이면 업로드 시 프록시 생성
+# - YOLO_USE_PROXY  : 1 이면 프록시가 있는 영상은 프록시로 분석 (좌표는 원본 해상도로 환산)
+# - PROXY_HEIGHT / PROXY_FPS (0 = 원본 fps 유지) / PROXY_CRF
+#   (fps 를 너무 낮추면 림 아래로 떨어지는 공을 놓칠 수 있어 기본 30: 60fps 영상만 절반으로)
+ANALYSIS_PROXY = os.getenv("ANALYSIS_PROXY", "1") == "1"
+YOLO_USE_PROXY = os.getenv("YOLO_USE_PROXY", "1") == "1"
+PROXY_PREFIX = os.getenv("PROXY_PREFIX", "proxy/")
+PROXY_HEIGHT = int(os.getenv("PROXY_HEIGHT", "480"))
+PROXY_FPS = float(os.getenv("PROXY_FPS", "30"))
+PROXY_CRF = int(os.getenv("PROXY_CRF", "28"))
+# HLS 재생 (업로드 후 선택 단계) - 세그먼트 / playlist 를 R2 에 HLS_PREFIX + 영상 이름 + "/" 아래 저장
+# - HLS_PACKAGE        : 1 이면 업로드 때 HLS 로 패키징 (기존 영상은 POST /hls_package 로)
+# - HLS_SEGMENT_SEC    : 세그먼트 길이 (초, 원본 렌디션은 키프레임 기준이라 대략)
+# - HLS_LOW_RENDITION  : 1 이면 저화질 렌디션도 추가 (HLS_LOW_HEIGHT p / HLS_LOW_KBPS kbps, 재인코딩)
+# - HLS_UPLOAD_WORKERS : 세그먼트 동시 업로드 수
+# - HLS_SEGMENT_CORS   : 1 이면 redirect 모드에서 세그먼트를 R2 서명 URL 로 직접 받게 함
+#                        hls.js 는 세그먼트를 XHR 로 받으므로 버킷에 이 사이트 origin 의 GET CORS 규칙이 있어야 함
+#                        예) [{"AllowedOrigins": ["https://<site>"], "AllowedMethods": ["GET", "HEAD"],
+#                              "AllowedHeaders": ["Range"], "MaxAgeSeconds": 3600}]
+#                        0 (기본) 이면 redirect 모드여도 세그먼트는 /hls/... 프록시로 전달
+# - HLS_JS_PATH        : hls.js 파일 (static/ 기준, Dockerfile 빌드 때 고정 버전을 받아 둠 / 없으면 mp4 재생)
+HLS_PACKAGE = os.getenv("HLS_PACKAGE", "0") == "1"
+HLS_PREFIX = os.getenv("HLS_PREFIX", "hls/")
+HLS_SEGMENT_SEC = int(os.getenv("HLS_SEGMENT_SEC", "4"))
+HLS_LOW_RENDITION = os.getenv("HLS_LOW_RENDITION", "0") == "1"
+HLS_LOW_HEIGHT = int(os.getenv("HLS_LOW_HEIGHT", "360"))
+HLS_LOW_KBPS = int(os.getenv("HLS_LOW_KBPS", "800"))
+HLS_UPLOAD_WORKERS = int(os.getenv("HLS_UPLOAD_WORKERS", "8"))
+HLS_SEGMENT_CORS = os.getenv("HLS_SEGMENT_CORS", "0") == "1"
+HLS_JS_PATH = os.getenv("HLS_JS_PATH", "vendor/hls.js/hls.min.js")
+
+# 하이라이트 export (ffmpeg 1번 실행으로 클립 추출 + 병합)
+# - EXPORT_MODE           : copy = 재인코딩 없이 (빠름, 시작점이 직전 키프레임으로 당겨짐)
+#                           accurate = libx264 재인코딩 (프레임 단위로 정확)
+# - EXPORT_PRESET / CRF   : accurate 모드 libx264 설정
+EXPORT_MODE = os.getenv("EXPORT_MODE", "copy")
+EXPORT_PRESET = os.getenv("EXPORT_PRESET", "veryfast")
+EXPORT_CRF = int(os.getenv("EXPORT_CRF", "20"))
+# - EXPORT_CACHE_MAX_AGE_H / MAX_GB : results/highlight_*.mp4 결과 캐시 보관 기간 / 최대 크기
+#   (같은 영상 + 같은 클립 + 같은 모드면 이미 만든 파일을 바로 돌려줌)
+EXPORT_CACHE_MAX_AGE_H = float(os.getenv("EXPORT_CACHE_MAX_AGE_H", "72"))
+EXPORT_CACHE_MAX_GB = float(os.getenv("EXPORT_CACHE_MAX_GB", "5"))
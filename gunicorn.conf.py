@@ -0,0 +1,34 @@
+# gunicorn 설정 (gunicorn 이 실행 디렉터리의 gunicorn.conf.py 를 자동으로 읽음)
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+
+import config
+
+
+def on_starting(server):
+    # 🔥 master 에서 YOLO 가중치만 미리 로딩 (warm-up 추론은 하지 않음)
+    #    → fork 된 워커들은 가중치 메모리를 copy-on-write 로 공유하고 다시 로딩하지 않음
+    #    master 에서 추론을 돌리면 torch 의 OpenMP 스레드 풀 (+ CUDA 컨텍스트) 이 fork 전에 만들어져서
+    #    워커에서 첫 추론이 멈추거나 CUDA 초기화가 실패할 수 있음 → 추론은 워커에서만
+    if config.MODEL_PRELOAD:
+        from services.model_registry import registry, memory_stats
+        registry.preload([config.YOLO_MODEL_PATH], config.YOLO_BACKEND, config.YOLO_INT8, warmup=False)
+        print(f"📦 master 모델 로딩 완료 ({os.getpid()}): {memory_stats()}")
+
+
+def post_fork(server, worker):
+    # 🔥 내장 작업 워커 (JOB_WORKER_EMBEDDED=1) - gunicorn 워커가 여러 개여도 서버당 1개만
+    if config.JOB_QUEUE and config.JOB_WORKER_EMBEDDED:
+        from worker import start_embedded_worker
+        start_embedded_worker()
+
+    # 🔥 워커마다 fork 직후 warm-up (첫 요청 지연 제거)
+    #    효과 확인: GET /debug/models 의 memory_mb → 워커의 shared 가 가중치 크기만큼 크고
+    #    private 가 MODEL_PRELOAD=0 일 때보다 그만큼 작으면 공유되고 있는 것
+    #    (warm-up 중 만들어지는 activation / 스레드 버퍼는 워커마다 private)
+    if config.MODEL_PRELOAD and config.MODEL_WARMUP:
+        from services.model_registry import registry, memory_stats
+        registry.warmup_loaded()
+        print(f"🔥 워커 warm-up 완료 ({os.getpid()}): {memory_stats()}")
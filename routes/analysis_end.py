@@ -1,6 +1,13 @@
 from flask import Blueprint, jsonify
 import os, json, shutil
-from services.r2_service import s3, R2_BUCKET
+from pathlib import Path
+import config
+from services.r2_service import r2_delete
+from routes.yolo import progress, load_yolo_state
+from services.store_service import clear_store
+from services.video_meta_service import get_video_meta, delete_video_meta
+from services.hls_service import delete_hls
+from services.export_service import is_part_file
 
 bp = Blueprint("analysis_end", __name__)
 
@@ -8,33 +15,46 @@ UPLOAD_DIR = "upload"
 RESULT_DIR = "results"
 FRAMES_DIR = "static/frames"
 TMP_DIR = "tmp"
-STORE_FILE = "utils/analysis_store.json"
-PROGRESS_FILE = "progress.json"
 FULL_PROGRESS_FILE = "full_progress.json"
 
 
+# 분석 종료 때 비우지 않는 공용 캐시 (다른 작업이 읽는 중일 수 있음, 영상 + ETag 기준이라 계속 유효)
+KEEP_DIRS = (config.R2_CACHE_DIR, config.THUMB_CACHE_DIR, config.SPRITE_CACHE_DIR)
+
+
+def clear_dir(path, keep=KEEP_DIRS):
+    """ path 안의 파일 / 폴더 삭제 - keep 폴더 (와 그 상위 폴더) 는 남김 """
+    root = Path(path)
+    root.mkdir(parents=True, exist_ok=True)
+    keep = [Path(k).resolve() for k in keep]
+    for child in root.iterdir():
+        resolved = child.resolve()
+        if resolved in keep:
+            continue
+        if any(resolved in k.parents for k in keep):
+            clear_dir(child, keep)
+            continue
+        if child.is_dir() and not child.is_symlink():
+            shutil.rmtree(child, ignore_errors=True)
+        else:
+            try:
+                child.unlink()
+            except OSError:
+                pass
+
+
 def delete_r2_file(filename):
     """Cloudflare R2에서 파일 삭제"""
-    try:
-        s3.delete_object(Bucket=R2_BUCKET, Key=filename)
+    if r2_delete(filename):
         print(f"🗑 R2 삭제 완료: {filename}")
-    except Exception as e:
-        print(f"⚠ R2 삭제 실패: {filename}", e)
 
 
 @bp.route("/end_analysis", methods=["POST"])
 def end_analysis():
     print("🔚 분석 종료: 모든 데이터 초기화 시작")
 
-    # progress.json에서 영상 이름 가져오기 (있으면)
-    uploaded_video = None
-    try:
-        if os.path.exists(PROGRESS_FILE):
-            with open(PROGRESS_FILE, "r") as f:
-                p = json.load(f)
-                uploaded_video = p.get("video")
-    except:
-        pass
+    # 최근 분석 작업에서 영상 이름 가져오기 (있으면)
+    uploaded_video = load_yolo_state().get("video")
 
     # 1) 업로드된 원본 영상 삭제 (로컬)
     if uploaded_video and os.path.exists(UPLOAD_DIR):
@@ -46,12 +66,20 @@ def end_analysis():
             except:
                 pass
 
-        # R2에서도 원본 삭제
+        # R2에서도 원본 (+ 분석용 프록시, HLS) 삭제
         delete_r2_file(uploaded_video)
+        proxy = (get_video_meta(uploaded_video) or {}).get("proxy")
+        if proxy:
+            delete_r2_file(proxy["key"])
+        delete_hls(uploaded_video)
+        delete_video_meta(uploaded_video)
 
     # 2) 결과 영상/하이라이트 파일 삭제 (로컬+R2)
+    #    진행 중인 export 가 쓰는 part 파일 (.xxx.part.mp4) 은 남김 → 끝나면 export 가 rename
     if os.path.exists(RESULT_DIR):
         for f in os.listdir(RESULT_DIR):
+            if is_part_file(f):
+                continue
             if f.endswith(".mp4") or f.endswith(".txt") or f.startswith("tmp"):
                 file_path = os.path.join(RESULT_DIR, f)
                 try:
@@ -63,21 +91,17 @@ def end_analysis():
                 # R2에서도 삭제 시도
                 delete_r2_file(f)
 
-    # 3) frames 폴더 비우기
-    shutil.rmtree(FRAMES_DIR, ignore_errors=True)
-    os.makedirs(FRAMES_DIR, exist_ok=True)
+    # 3) frames 폴더 비우기 (골대 선택 프레임 / 타임라인 스프라이트 캐시는 남김)
+    clear_dir(FRAMES_DIR)
 
-    # 4) tmp 폴더 비우기
-    shutil.rmtree(TMP_DIR, ignore_errors=True)
-    os.makedirs(TMP_DIR, exist_ok=True)
+    # 4) tmp 폴더 비우기 (R2 다운로드 캐시는 남김)
+    clear_dir(TMP_DIR)
 
-    # 5) analysis_store.json 초기화
-    with open(STORE_FILE, "w") as f:
-        json.dump([], f)
+    # 5) 분석 결과 저장소 (+ 프레임 npz) 초기화
+    clear_store()
 
-    # 6) progress.json 초기화
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump({}, f)
+    # 6) 진행 상태(메모리 + progress.json) 초기화
+    progress.reset()
 
     # 7) full_progress.json 초기화
     with open(FULL_PROGRESS_FILE, "w") as f:
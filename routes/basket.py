@@ -1,11 +1,7 @@
 from flask import Blueprint, request, render_template, jsonify
 from services.coord_service import BasketCoordService
-from services.r2_service import r2_download_temp_frame
+from services.thumbnail_service import extract_frame
 from pathlib import Path
-from config import BASE_DIR
-import cv2
-import uuid
-import os
 
 bp = Blueprint("basket", __name__)
 coords = BasketCoordService(Path("basket_coords.json"))
@@ -15,41 +11,38 @@ coords = BasketCoordService(Path("basket_coords.json"))
 def select_basket():
     video = request.args.get("video")
     next_queue = request.args.get("next", "[]")
-    
-    # 🔥 프레임 추출
-    tmp_video = r2_download_temp_frame(video)
-    if not tmp_video:
-        return "cannot download video", 500
-
-    cap = cv2.VideoCapture(str(tmp_video))
-    ret, frame = cap.read()
-    orig_h, orig_w = frame.shape[:2] if ret else (0, 0)
-    cap.release()
+    t = request.args.get("t", default=0.0, type=float)
 
-    if not ret:
+    # 🔥 프레임 추출 (전체 다운로드 없이 t 초 프레임 1장만, JPEG 캐시)
+    frame = extract_frame(video, t)
+    if not frame:
         return "frame error", 500
 
-    # 프레임 저장
-    frames_dir = BASE_DIR / "static" / "frames"
-    frames_dir.mkdir(parents=True, exist_ok=True)
-    
-    filename = f"basket_{uuid.uuid4().hex}.jpg"
-    frame_path = frames_dir / filename
-    cv2.imwrite(str(frame_path), frame)
-    
-    # 임시 파일 삭제
-    tmp_video.unlink(missing_ok=True)
-
     return render_template(
         "select_basket.html",
         video=video,
         next=next_queue,
-        frame_file=filename,
-        orig_w=orig_w,
-        orig_h=orig_h
+        frame_file=frame["file"],
+        orig_w=frame["w"],
+        orig_h=frame["h"],
+        duration=frame.get("duration") or 0,
+        t=frame["t"],
     )
 
 
+# 🔥 다른 시점 프레임 (골대가 더 잘 보이는 장면 고르기용)
+@bp.route("/basket_frame")
+def basket_frame():
+    video = request.args.get("video")
+    if not video:
+        return jsonify({"error": "no video"}), 400
+
+    frame = extract_frame(video, request.args.get("t", default=0.0, type=float))
+    if not frame:
+        return jsonify({"error": "frame error"}), 500
+    return jsonify(frame)
+
+
 # 🔥 좌표 저장 (POST)
 @bp.route("/save_basket", methods=["POST"])
 def save_basket():
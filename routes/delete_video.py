@@ -1,17 +1,17 @@
 from flask import Blueprint, request, jsonify
 import os
-from services.r2_service import s3, R2_BUCKET
+from services.r2_service import r2_delete
+from services.video_meta_service import get_video_meta, delete_video_meta
+from services.hls_service import delete_hls
+from services.thumbnail_service import delete_sprites
 
 bp = Blueprint("delete_video", __name__)
 
 UPLOAD_DIR = "upload"
 
 def delete_r2(key):
-    try:
-        s3.delete_object(Bucket=R2_BUCKET, Key=key)
+    if r2_delete(key):
         print("🗑 R2 삭제:", key)
-    except Exception as e:
-        print("R2 삭제 실패:", e)
 
 @bp.route("/delete_video", methods=["POST"])
 def delete_video():
@@ -30,4 +30,12 @@ def delete_video():
     # R2 삭제
     delete_r2(filename)
 
+    # 분석용 프록시 / HLS 세그먼트도 같이 삭제
+    proxy = (get_video_meta(filename) or {}).get("proxy")
+    if proxy:
+        delete_r2(proxy["key"])
+    delete_hls(filename)
+    delete_video_meta(filename)
+    delete_sprites(filename)
+
     return jsonify({"status": "ok"})
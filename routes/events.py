@@ -0,0 +1,102 @@
+from flask import Blueprint, Response, request, stream_with_context
+import json
+import time
+from routes.yolo import progress, job_queue, load_yolo_state, YOLO_JOB_TYPES
+from routes.export import export_manager, load_export_state
+from utils.change_feed import BOOT_ID
+
+bp = Blueprint("events", __name__)
+
+HEARTBEAT_SEC = 15       # 연결 유지용 주석 라인 간격
+MAX_STREAM_SEC = 300     # 스트림 최대 유지 시간 (이후 브라우저가 Last-Event-ID 로 재접속)
+RETRY_MS = 3000
+
+
+def _last_version():
+    """
+    Last-Event-ID = "<BOOT_ID>-<버전>".
+    다른 서버 프로세스(재시작 전)의 id 면 -1 → 현재 상태를 바로 보냄.
+    """
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    if not last_id:
+        return -1
+    boot, _, version = last_id.partition("-")
+    if boot != BOOT_ID or not version.isdigit():
+        return -1
+    return int(version)
+
+
+def _event_stream(feed, key, snapshot, is_final):
+    """
+    key 의 상태가 바뀔 때만 snapshot() 을 push.
+    변화가 없으면 HEARTBEAT_SEC 마다 주석 라인만 보냄.
+    """
+    after = _last_version()
+
+    @stream_with_context
+    def generate():
+        nonlocal after
+        yield f"retry: {RETRY_MS}\n\n"
+
+        deadline = time.time() + MAX_STREAM_SEC
+        while time.time() < deadline:
+            version = feed.wait(key, after, HEARTBEAT_SEC)
+            if version <= after:
+                yield ": heartbeat\n\n"
+                continue
+
+            after = version
+            data = snapshot()
+            yield f"id: {BOOT_ID}-{version}\nevent: progress\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+            if is_final(data):
+                yield "event: end\ndata: {}\n\n"
+                return
+
+    resp = Response(generate(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"    # 프록시 버퍼링 끄기
+    return resp
+
+
+# =======================================
+# 🔥 YOLO 분석 진행률 (/progress_multi 와 같은 데이터)
+# =======================================
+@bp.route("/events/yolo")
+def yolo_events():
+    if job_queue:
+        job_id = job_queue.resolve(request.args.get("job_id"), YOLO_JOB_TYPES)
+        feed = job_queue.feed
+    else:
+        job_id = progress.resolve(request.args.get("job_id"))
+        feed = progress.feed
+
+    def snapshot():
+        return load_yolo_state(job_id)
+
+    def is_final(data):
+        status = data.get("status") or ""
+        # 단일 영상 작업은 "done" 으로 끝남 (다중 작업은 영상마다 done 이 지나가므로 done_all 까지)
+        if status == "done" and "videos" not in data:
+            return True
+        return status in ("done_all", "stopped") or status.startswith("error")
+
+    return _event_stream(feed, job_id, snapshot, is_final)
+
+
+# =======================================
+# 🔥 하이라이트 export 진행률 (/export_progress 와 같은 데이터)
+# =======================================
+@bp.route("/events/export")
+def export_events():
+    job_id = request.args.get("job_id")
+
+    feed = job_queue.feed if job_queue else export_manager.feed
+
+    def snapshot():
+        return load_export_state(job_id)
+
+    def is_final(data):
+        return data is None or data.get("status") in ("done", "error", "stopped")
+
+    return _event_stream(feed, job_id, snapshot, is_final)
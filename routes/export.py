@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, send_from_directory
 from pathlib import Path
-from services.export_service import ExportManager
-import threading
+from services.export_service import ExportManager, export_cache_key, prune_results
+from services.r2_index_service import r2_index
+from routes.yolo import job_queue
+import os
 import config
 
 bp = Blueprint("export", __name__)
@@ -17,33 +19,62 @@ def export_video():
     data = request.get_json()
     video = data["video"]
     clips = data["clips"]
+    # copy = 빠름 (키프레임 단위로 잘림) / accurate = 재인코딩 (프레임 단위) / 없으면 EXPORT_MODE
+    mode = data.get("mode") or config.EXPORT_MODE
+    if mode not in ("copy", "accurate"):
+        return jsonify({"error": f"unknown mode: {mode}"}), 400
 
-    job_id = export_manager.create_job(video, clips)
+    head = r2_index.head(video)
+    if head is None:
+        return jsonify({"error": "video not found"}), 404
+    etag = head["etag"]
 
-    out_path = RESULT_DIR / f"highlight_{job_id}.mp4"
+    # 🔥 결과 캐시: 같은 영상(ETag) + 같은 클립 + 같은 모드면 파일 이름이 같음
+    key = export_cache_key(video, etag, clips, mode)
+    name = f"highlight_{key}.mp4"
+    out_path = RESULT_DIR / name
 
-    threading.Thread(
-        target=export_manager.worker,
-        args=(job_id, video, out_path),
-        daemon=True
-    ).start()
+    if out_path.exists():
+        os.utime(out_path)      # 마지막 사용 시각 갱신 (정리 순서용)
+        return jsonify({"job_id": None, "file": f"/results/{name}", "cached": True})
 
-    return jsonify({
-        "job_id": job_id,
-        "file": f"/results/highlight_{job_id}.mp4"
-    })
+    prune_results(RESULT_DIR, config.EXPORT_CACHE_MAX_AGE_H * 3600,
+                  int(config.EXPORT_CACHE_MAX_GB * 1024 ** 3))
+
+    # 같은 결과를 만드는 작업이 이미 진행 중이면 그 작업을 같이 기다림 (dedupe_key)
+    # JOB_QUEUE 모드: 작업 워커가 실행 (재시작 후에도 이어서 실행)
+    if job_queue:
+        job_id = job_queue.enqueue(
+            "export", {"video": video, "clips": clips, "mode": mode, "output": str(out_path)},
+            state={"status": "pending", "video": video, "clips": clips, "error": None},
+            max_attempts=config.JOB_MAX_ATTEMPTS, dedupe_key=key,
+        )
+        return jsonify({"job_id": job_id, "file": f"/results/{name}"})
+
+    job_id = export_manager.submit(video, clips, out_path, mode=mode, dedupe_key=key)
+    return jsonify({"job_id": job_id, "file": f"/results/{name}"})
 
 
 @bp.route("/export_progress")
 def export_progress():
     job_id = request.args.get("job_id")
-    return jsonify(export_manager.jobs.get(job_id))
+    return jsonify(load_export_state(job_id))
+
+
+def load_export_state(job_id):
+    """ /export_progress, /events/export 공용 (없는 job 이면 None) """
+    if job_queue:
+        return job_queue.load(job_id) or None
+    return export_manager.jobs.get(job_id)
 
 
 @bp.route("/export_stop", methods=["POST"])
 def export_stop():
     job_id = request.json.get("job_id")
-    export_manager.stop(job_id)
+    if job_queue:
+        job_queue.request_stop(job_id)
+    else:
+        export_manager.stop(job_id)
     return jsonify({"message": "stopping"})
 
 
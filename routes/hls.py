@@ -0,0 +1,89 @@
+from flask import Blueprint, request, abort, jsonify, Response
+import threading
+from services.hls_service import read_playlist, rewrite_playlist, package_video
+from services.video_stream_service import stream_r2_object, playback_urls
+from services.r2_index_service import r2_index
+from routes.upload import upload_progress
+from routes.yolo import job_queue
+import config
+
+bp = Blueprint("hls", __name__)
+
+
+def _sign(key):
+    try:
+        return playback_urls.get(key)[0]
+    except Exception as e:
+        print("⚠ 세그먼트 서명 URL 생성 실패 → 프록시로 재생:", key, e)
+        return None
+
+
+# 🔥 HLS playlist / 세그먼트
+# - .m3u8 : R2 에서 읽어 (ETag 캐시) 세그먼트 줄을 서명 URL 로 바꿔서 응답
+#           (redirect 모드 + HLS_SEGMENT_CORS=1 일 때만 - hls.js 의 XHR 은 버킷 CORS 가 필요)
+#           그 외에는 상대 경로 그대로 → 세그먼트도 이 라우트로
+# - .ts   : /videos 와 같은 스트리밍 프록시 (Range / ETag)
+@bp.route(f"/{config.HLS_PREFIX}<path:name>", methods=["GET", "HEAD"])
+def serve_hls(name):
+    key = config.HLS_PREFIX + name
+    mode = request.args.get("mode") or config.VIDEO_PLAYBACK
+
+    if key.endswith(".m3u8"):
+        try:
+            text = read_playlist(key)
+        except Exception as e:
+            print("❌ HLS playlist 읽기 실패:", key, e)
+            abort(502)
+        if text is None:
+            abort(404)
+
+        prefix = key.rsplit("/", 1)[0] + "/"
+        query = f"?mode={mode}" if request.args.get("mode") else ""
+        direct = mode == "redirect" and config.HLS_SEGMENT_CORS
+        text = rewrite_playlist(text, prefix, _sign if direct else None, query)
+        resp = Response(text, mimetype="application/vnd.apple.mpegurl")
+        # 서명 URL 은 최소 VIDEO_URL_MARGIN 초 유효 → playlist 는 짧게만 재사용
+        resp.headers["Cache-Control"] = "private, max-age=60"
+        return resp
+
+    if not key.endswith(".ts"):
+        abort(404)
+    try:
+        resp = stream_r2_object(key, request)
+    except Exception as e:
+        print("❌ HLS 세그먼트 전달 실패:", key, e)
+        abort(502)
+    if resp is None:
+        abort(404)
+    return resp
+
+
+def _run_local(video, job_id):
+    job = upload_progress.job(job_id)
+    try:
+        package_video(video, job)
+    except Exception as e:
+        print("❌ HLS 패키징 실패:", e)
+        job.set(status="error", error=str(e))
+
+
+# 🔥 이미 올라가 있는 영상을 HLS 로 패키징 (진행 상태는 /upload_status?job_id=...)
+@bp.route("/hls_package", methods=["POST"])
+def hls_package():
+    video = (request.json or {}).get("video")
+    if not video:
+        return jsonify({"error": "No video"}), 400
+    if not r2_index.exists(video):
+        return jsonify({"error": f"not found: {video}"}), 404
+
+    if job_queue:
+        job_id = job_queue.enqueue(
+            "hls", {"video": video},
+            state={"video": video}, max_attempts=config.JOB_MAX_ATTEMPTS,
+            dedupe_key=f"hls:{video}",
+        )
+    else:
+        job_id = upload_progress.new_job(status="queued", video=video)
+        threading.Thread(target=_run_local, args=(video, job_id), daemon=True).start()
+
+    return jsonify({"job_id": job_id, "video": video})
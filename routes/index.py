@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, jsonify, request
-from services.store_service import load_store, add_item, delete_item
+from services.store_service import list_items, add_item, delete_item, get_item
+from services.frame_store_service import load_frames
 from services.r2_service import r2_list_videos
 from uuid import uuid4
 
@@ -12,7 +13,16 @@ def index():
 
 @bp.route("/saved", methods=["GET"])
 def saved_get():
-    return jsonify(load_store())
+    # 요약 목록 (프레임 데이터 제외), 최근 저장 순
+    # ?page=&per_page= 페이지, ?video= 특정 영상만 / 전체 개수는 X-Total-Count 헤더
+    page = max(request.args.get("page", default=1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", default=50, type=int), 1), 500)
+    video = request.args.get("video")
+
+    items, total = list_items((page - 1) * per_page, per_page, video)
+    resp = jsonify(items)
+    resp.headers["X-Total-Count"] = str(total)
+    return resp
 
 @bp.route("/saved", methods=["POST"])
 def saved_post():
@@ -30,3 +40,18 @@ def saved_post():
 def saved_delete(item_id):
     delete_item(item_id)
     return jsonify({"status": "deleted"})
+
+@bp.route("/saved/<item_id>/frames", methods=["GET"])
+def saved_frames(item_id):
+    # ?start=&end= (초) 구간의 프레임별 검출 결과만 반환
+    item = get_item(item_id)
+    if not item:
+        return jsonify({"error": "not found"}), 404
+
+    start = request.args.get("start", type=float)
+    end = request.args.get("end", type=float)
+    return jsonify({
+        "id": item_id,
+        "fps": item.get("fps"),
+        "frames": load_frames(item, start, end),
+    })
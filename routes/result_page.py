@@ -1,5 +1,7 @@
 from flask import Blueprint, request, render_template
 import json
+from services.hls_service import hls_master_url
+import config
 
 bp = Blueprint("result_page", __name__)
 
@@ -22,5 +24,7 @@ def result_page():
     return render_template(
         "result_page.html",
         video=video,
-        clips=clips
+        clips=clips,
+        hls_url=hls_master_url(video) if video else None,
+        hls_js_path=config.HLS_JS_PATH
     )
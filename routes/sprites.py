@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify, Response
+import threading
+from services.thumbnail_service import load_sprites, build_sprites, sprite_vtt, sprite_failure
+from services.r2_index_service import r2_index
+from routes.yolo import job_queue
+import config
+
+bp = Blueprint("sprites", __name__)
+
+# JOB_QUEUE=0 일 때: 영상별로 스레드 1개만
+_building = set()
+_building_lock = threading.Lock()
+
+
+def _run_local(video):
+    try:
+        build_sprites(video)
+    except Exception as e:
+        print("❌ 스프라이트 생성 실패:", video, e)
+    finally:
+        with _building_lock:
+            _building.discard(video)
+
+
+def _start_build(video):
+    if job_queue:
+        return job_queue.enqueue(
+            "sprites", {"video": video},
+            state={"video": video}, max_attempts=config.JOB_MAX_ATTEMPTS,
+            dedupe_key=f"sprites:{video}",
+        )
+    with _building_lock:
+        if video in _building:
+            return None
+        _building.add(video)
+    threading.Thread(target=_run_local, args=(video,), daemon=True).start()
+    return None
+
+
+# 🔥 타임라인 미리보기 스프라이트
+# - 만들어져 있으면 index JSON (?format=vtt 면 WebVTT 썸네일 트랙)
+# - 없으면 백그라운드 작업을 걸고 202 → 플레이어가 잠시 후 다시 요청
+# - 생성이 계속 실패한 영상이면 (SPRITE_MAX_FAILURES) 다시 걸지 않고 500 + 오류
+@bp.route("/sprites/<path:video>")
+def sprites(video):
+    if not r2_index.exists(video):
+        return jsonify({"error": f"not found: {video}"}), 404
+
+    index = load_sprites(video)
+    if index is None:
+        failure = sprite_failure(video)
+        if failure:
+            return jsonify({"status": "error", "error": failure.get("error"),
+                            "failures": failure.get("failures")}), 500
+        job_id = _start_build(video)
+        return jsonify({"status": "building", "job_id": job_id}), 202
+
+    if request.args.get("format") == "vtt":
+        return Response(sprite_vtt(index), mimetype="text/vtt")
+    resp = jsonify(index)
+    # 시트 URL 에 ETag 가 들어 있어 영상이 바뀌면 URL 도 바뀜
+    resp.headers["Cache-Control"] = "private, max-age=300"
+    return resp
@@ -1,47 +1,73 @@
-from services.r2_service import r2_upload_bytes, r2_list_videos
+from services.r2_service import r2_list_videos
 from flask import Blueprint, request, jsonify
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
-from services.video_convert_service import convert_to_h264
+from services.upload_service import process_upload
+from utils.progress import ProgressManager
+from routes.yolo import job_queue
+import config
 
 bp = Blueprint("upload", __name__)
 
 UPLOAD_TMP = "tmp_upload"
 os.makedirs(UPLOAD_TMP, exist_ok=True)
 
+# JOB_QUEUE=0 일 때: 웹 프로세스 안의 스레드 풀에서 변환 / 업로드, 상태는 메모리
+upload_progress = ProgressManager()
+upload_pool = None if job_queue else ThreadPoolExecutor(max_workers=config.UPLOAD_WORKERS)
+
+
+def _run_local(tmp_path, name, job_id):
+    job = upload_progress.job(job_id)
+    try:
+        process_upload(tmp_path, name, job)
+    except Exception as e:
+        print("❌ 업로드 처리 실패:", e)
+        job.set(status="error", error=str(e))
+
+
 @bp.route("/upload_video", methods=["POST"])
 def upload_video():
+    """
+    요청 본문은 파일로만 받고 (werkzeug 가 청크 단위로 디스크에 저장) 바로 job_id 반환.
+    H.264 변환 + R2 multipart 업로드는 백그라운드에서 파일별로 진행 → /upload_status
+    """
     files = request.files.getlist("files")
-    results = []
+    jobs = []
 
     for f in files:
         original_name = secure_filename(f.filename)
 
-        # 1) 임시 저장
-        tmp_path = os.path.join(UPLOAD_TMP, original_name)
+        # 1) 임시 저장 (같은 이름 동시 업로드 충돌 방지)
+        tmp_path = os.path.join(UPLOAD_TMP, f"{uuid.uuid4().hex}_{original_name}")
         f.save(tmp_path)
 
-        # 2) H.264로 변환
-        converted_path = convert_to_h264(tmp_path)
-        if not converted_path:
-            return jsonify({"error": f"H.264 변환 실패: {original_name}"}), 500
-
-        # 3) 변환된 파일을 바이너리로 읽기
-        with open(converted_path, "rb") as fp:
-            file_bytes = fp.read()
+        # 2) 변환 + 업로드는 백그라운드
+        payload = {"tmp_path": tmp_path, "name": original_name}
+        if job_queue:
+            job_id = job_queue.enqueue(
+                "upload", payload,
+                state={"video": original_name}, max_attempts=config.JOB_MAX_ATTEMPTS,
+            )
+        else:
+            job_id = upload_progress.new_job(status="queued", video=original_name)
+            upload_pool.submit(_run_local, tmp_path, original_name, job_id)
 
-        # 4) R2 업로드
-        r2_upload_bytes(original_name, file_bytes)
+        jobs.append({"job_id": job_id, "file": original_name})
 
-        # 5) 임시 파일 삭제
-        try: os.remove(tmp_path)
-        except: pass
-        try: os.remove(converted_path)
-        except: pass
+    return jsonify({"jobs": jobs, "uploaded": [j["file"] for j in jobs]})
 
-        results.append(original_name)
 
-    return jsonify({"uploaded": results})
+@bp.route("/upload_status")
+def upload_status():
+    # ?job_id=a&job_id=b → {job_id: {status, progress, video, error}}
+    out = {}
+    for job_id in request.args.getlist("job_id"):
+        state = job_queue.load(job_id) if job_queue else upload_progress.load(job_id)
+        out[job_id] = state or None
+    return jsonify(out)
 
 
 @bp.route("/videos_list")
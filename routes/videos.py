@@ -1,67 +1,49 @@
-from flask import Blueprint, Response, request, abort
-from services.r2_service import s3, R2_BUCKET
-import mimetypes
+from flask import Blueprint, request, abort, redirect, jsonify
+from services.video_stream_service import stream_r2_object, playback_urls
+from services.r2_index_service import r2_index
+import config
 
 bp = Blueprint("videos", __name__)
 
+PLAYBACK_MODES = ("redirect", "json", "proxy")
 
-@bp.route("/videos/<path:filename>")
-def serve_video(filename):
-    try:
-        # 파일 전체 메타 정보 얻기
-        head = s3.head_object(Bucket=R2_BUCKET, Key=filename)
-        file_size = head["ContentLength"]
-
-        # MIME 타입 결정
-        mime, _ = mimetypes.guess_type(filename)
-        mime = mime or "video/mp4"
-
-        range_header = request.headers.get("Range")
-        
-        if range_header:
-            # "bytes=1000-2000" 형태
-            bytes_range = range_header.replace("bytes=", "").split("-")
-            start = int(bytes_range[0])
-            end = int(bytes_range[1]) if bytes_range[1] else file_size - 1
-
-            length = end - start + 1
-
-            # R2에서 부분 범위만 가져오기
-            obj = s3.get_object(
-                Bucket=R2_BUCKET,
-                Key=filename,
-                Range=f"bytes={start}-{end}"
-            )
 
-            data = obj["Body"].read()
-
-            # 206 Partial Content 응답
-            rv = Response(
-                data,
-                status=206,
-                mimetype=mime,
-                direct_passthrough=True
-            )
-            rv.headers.add("Content-Range", f"bytes {start}-{end}/{file_size}")
-            rv.headers.add("Accept-Ranges", "bytes")
-            rv.headers.add("Content-Length", str(length))
-            return rv
-
-        else:
-            # Range 요청 없음 → 전체 파일 제공
-            obj = s3.get_object(Bucket=R2_BUCKET, Key=filename)
-            data = obj["Body"].read()
-
-            rv = Response(
-                data,
-                status=200,
-                mimetype=mime,
-                direct_passthrough=True
-            )
-            rv.headers.add("Content-Length", str(file_size))
-            rv.headers.add("Accept-Ranges", "bytes")
-            return rv
+# 🔥 R2 영상 재생
+# - redirect : 서명 URL 로 302 → 브라우저가 R2 에서 직접 Range 요청 (Flask 워커를 거치지 않음)
+# - json     : {"url", "expires_in"} (플레이어가 직접 src 로 지정할 때)
+# - proxy    : 이 서버가 R2 에서 청크 단위로 받아 바로 전달 (Range / 여러 구간 / ETag 조건부 요청)
+@bp.route("/videos/<path:filename>", methods=["GET", "HEAD"])
+def serve_video(filename):
+    mode = request.args.get("mode") or config.VIDEO_PLAYBACK
+    if mode not in PLAYBACK_MODES:
+        return jsonify({"error": f"unknown mode: {mode}"}), 400
+
+    if mode in ("redirect", "json"):
+        if not r2_index.exists(filename):
+            print("❌ File not found in R2:", filename)
+            abort(404)
+        try:
+            url, expires_in = playback_urls.get(filename)
+        except Exception as e:
+            # 서명 실패 시 프록시로 대신 전달
+            print("⚠ 서명 URL 생성 실패 → 프록시로 재생:", filename, e)
+            url = None
+
+        if url and mode == "json":
+            return jsonify({"url": url, "expires_in": expires_in})
+        if url:
+            resp = redirect(url, code=302)
+            # 같은 URL 을 쓰는 동안은 브라우저가 리다이렉트 결과를 재사용해도 됨
+            resp.headers["Cache-Control"] = f"private, max-age={max(0, expires_in - config.VIDEO_URL_MARGIN)}"
+            return resp
 
+    try:
+        resp = stream_r2_object(filename, request)
     except Exception as e:
-        print("❌ Failed to load video from R2:", filename, e)
+        print("❌ Failed to stream video from R2:", filename, e)
+        abort(502)
+
+    if resp is None:
+        print("❌ File not found in R2:", filename)
         abort(404)
+    return resp
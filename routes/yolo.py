@@ -1,19 +1,53 @@
 from flask import Blueprint, request, jsonify
-from services.yolo_service import YoloHighlighter
+from services.yolo_service import YoloHighlighter, highlighter_options
 from utils.progress import ProgressManager
 from services.coord_service import BasketCoordService
-from services.r2_service import download_to_path
+from services.video_source_service import VideoSource
+from services.yolo_pool_service import YoloPoolScheduler
+from services.job_queue import get_job_queue
 import threading
-import json
-import time
 from pathlib import Path
-import tempfile
+import config
 
 bp = Blueprint("yolo", __name__)
 
-progress = ProgressManager(Path("progress.json"))
+# 진행 상태는 메모리에 두고, progress.json 은 재시작 복구용으로만 가끔 저장
+progress = ProgressManager(
+    config.PROGRESS_PATH if config.PROGRESS_PERSIST else None,
+    min_interval=config.PROGRESS_SAVE_INTERVAL,
+)
 coords = BasketCoordService(Path("basket_coords.json"))
 
+# JOB_QUEUE 모드: 작업은 SQLite 큐에 넣고 작업 워커가 실행 → 상태도 DB 에서 읽음
+job_queue = get_job_queue() if config.JOB_QUEUE else None
+YOLO_JOB_TYPES = ("yolo", "yolo_multi")
+
+
+def _make_highlighter(job_progress):
+    return YoloHighlighter(config.YOLO_MODEL_PATH, job_progress, coords, **highlighter_options())
+
+
+def load_yolo_state(job_id=None):
+    """ /progress_multi, /events/yolo 공용 - job_id 가 없으면 가장 최근 작업 """
+    if job_queue:
+        data = job_queue.load(job_id, YOLO_JOB_TYPES)
+    else:
+        data = progress.load(job_id)
+
+    # index.html은 current_video를 기대함 → 필드 맞춰줌
+    if "current_video" not in data:
+        data["current_video"] = data.get("video")
+    return data
+
+
+# 다중 분석용 프로세스 풀 (워커별 모델 1회 로딩, 첫 요청 때 생성)
+scheduler = YoloPoolScheduler(
+    config.YOLO_MODEL_PATH, highlighter_options(), progress,
+    workers=config.YOLO_WORKERS,
+    torch_threads=config.YOLO_TORCH_THREADS,
+    shards=config.YOLO_SHARDS,
+)
+
 # =======================================
 # 🔥 단일
 # =======================================
@@ -23,17 +57,40 @@ def process_yolo():
     if not video:
         return "no video", 400
 
-    # R2 → temp 영상 다운로드
-    tmp_path = Path(tempfile.gettempdir()) / f"yolo_{video}"
-    download_to_path(video, tmp_path)
+    # shards > 1 : 영상 1개를 시간 구간으로 나눠 프로세스 풀에서 병렬 분석
+    shards = request.args.get("shards", default=config.YOLO_SHARDS, type=int)
+
+    if job_queue:
+        job_id = job_queue.enqueue(
+            "yolo", {"video": video, "shards": shards},
+            state={"video": video}, max_attempts=config.JOB_MAX_ATTEMPTS,
+        )
+        return jsonify({"message": "YOLO queued", "job_id": job_id, "shards": shards})
 
-    progress.set(0, "running", video)
+    job_id = progress.new_job(status="running", video=video)
+    if shards > 1:
+        threading.Thread(target=scheduler.run_sharded, args=(video, shards, job_id), daemon=True).start()
+        return jsonify({"message": "YOLO started", "job_id": job_id, "shards": shards})
 
-    yolo = YoloHighlighter("mixup100epo.pt", progress, coords)
-    # 🔥 수정: video_name 인자 추가
-    threading.Thread(target=yolo.run, args=(tmp_path, video), daemon=True).start()
+    threading.Thread(target=_run_single, args=(video, job_id), daemon=True).start()
 
-    return jsonify({"message": "YOLO started"})
+    return jsonify({"message": "YOLO started", "job_id": job_id})
+
+
+def _run_single(video, job_id):
+    # R2 영상을 stream(서명 URL) 또는 temp 다운로드로 열어서 분석
+    with VideoSource(video) as source:
+        if not source.path:
+            progress.set(0, "error_download", video, job_id=job_id)
+            return
+
+        progress.set(0, "running", video, job_id=job_id)
+        yolo = _make_highlighter(progress.job(job_id))
+        try:
+            yolo.run(source.path, video, ingest=source.stats, scale=source.scale)
+        except Exception:
+            # progress 에는 run() 이 이미 error 로 기록함
+            pass
 
 
 # =======================================
@@ -47,82 +104,44 @@ def process_yolo_multi():
     if not videos:
         return jsonify({"error": "no videos"}), 400
 
-    progress.set(
-        0, "multi_running",
-        video=None,
+    if job_queue:
+        job_id = job_queue.enqueue(
+            "yolo_multi", {"videos": videos},
+            state={"videos": videos, "index": 0, "total": len(videos)},
+            max_attempts=config.JOB_MAX_ATTEMPTS,
+        )
+        return jsonify({"message": "multi queued", "job_id": job_id})
+
+    job_id = progress.new_job(
+        status="multi_running",
         videos=videos,
         index=0,
         total=len(videos)
     )
 
-    threading.Thread(target=_multi_worker, daemon=True).start()
-    return jsonify({"message": "multi started"})
-
-
-def _multi_worker():
-    while True:
-        p = progress.load()
-        videos = p["videos"]
-        idx = p["index"]
-        total = p["total"]
-
-        if idx >= total:
-            progress.set(100, "done_all", videos=videos, index=idx, total=total)
-            return
-
-        video_name = videos[idx]
-        tmp_path = Path(tempfile.gettempdir()) / f"yolo_{video_name}"
-
-        download_to_path(video_name, tmp_path)
-
-        progress.set(0, "running", video_name, videos=videos, index=idx, total=total)
-
-        yolo = YoloHighlighter("mixup100epo.pt", progress, coords)
-        # 🔥 수정: video_name 인자 추가
-        yolo.run(tmp_path, video_name)
-
-        p = progress.load()
-        if p["status"] == "stopped":
-            return
-
-        progress.set(0, "multi_running", videos=videos, index=idx+1, total=total)
-        time.sleep(0.2)
+    threading.Thread(target=scheduler.run, args=(videos, job_id), daemon=True).start()
+    return jsonify({"message": "multi started", "job_id": job_id})
 
 
 @bp.route("/progress_multi")
 def progress_multi():
-    data = progress.load()
-
-    # index.html은 current_video를 기대함 → 필드 맞춰줌
-    if "current_video" not in data:
-        # progress.json 안에 video 필드가 이미 있음
-        data["current_video"] = data.get("video")
-
-    return jsonify(data)
+    # job_id 가 없으면 가장 최근 작업 (예전 클라이언트 호환)
+    return jsonify(load_yolo_state(request.args.get("job_id")))
 
 
 @bp.route("/stop", methods=["POST"])
 def stop():
-    job_id = request.json.get("job_id")
-
-    # progress.json 읽기
-    try:
-        with open("progress.json", "r") as f:
-            p = json.load(f)
-    except:
-        p = {}
-
-    # 기본값 안전하게 설정
-    progress = p.get("progress", 0)
-    status = p.get("status", "stopped")
-    video = p.get("video", None)
-
-    # 업데이트 처리
-    update_progress(
-        job_id,
-        progress,
-        "stopped",
-        video=video
-    )
+    # sendBeacon 요청은 JSON body 가 없음
+    body = request.get_json(silent=True) or {}
+    job_id = body.get("job_id") or request.args.get("job_id")
+
+    # 분석 루프 / 프로세스 풀 스케줄러가 stopped 상태를 보고 중단함
+    if job_queue:
+        job_id = job_queue.resolve(job_id, YOLO_JOB_TYPES)
+        if job_id:
+            job_queue.request_stop(job_id)
+        return jsonify({"status": "stopped", "job_id": job_id})
+
+    progress.stop(job_id)
 
-    return jsonify({"status": "stopped"})
\ No newline at end of file
+    return jsonify({"status": "stopped", "job_id": progress.resolve(job_id)})
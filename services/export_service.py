@@ -1,149 +1,327 @@
 import uuid
+import hashlib
+import json
+import shutil
+import time
 import subprocess
 import tempfile
 from pathlib import Path
+import threading
 from threading import Lock
-from services.r2_service import download_to_path
+from services.r2_cache_service import r2_cache
+from services.video_convert_service import probe_video
+from services.video_meta_service import get_video_meta
+from utils.change_feed import ChangeFeed
+import config
 import os
 
 class ExportManager:
-    def __init__(self):
+    def __init__(self, store=None):
         self.jobs = {}
         self.locker = Lock()
+        self.feed = ChangeFeed()    # SSE 스트림용 변경 알림
+        self.store = store          # JobQueue 면 상태를 DB 에도 기록 (작업 워커용)
 
     # ---------------------------------------
     # 🔥 1) 작업 생성
     # ---------------------------------------
-    def create_job(self, video, clips):
-        job_id = str(uuid.uuid4())
+    def create_job(self, video, clips, job_id=None, mode=None, dedupe_key=None):
+        """ mode : "copy" (빠름, 키프레임 단위) / "accurate" (재인코딩, 프레임 단위) / None = EXPORT_MODE """
+        job_id = job_id or str(uuid.uuid4())
         self.jobs[job_id] = {
             "status": "pending",
             "progress": 0,
             "video": video,
             "clips": clips,
+            "mode": mode,
+            "dedupe_key": dedupe_key,
             "error": None
         }
+        self.feed.touch(job_id)
         return job_id
 
+    def submit(self, video, clips, output_path, mode=None, dedupe_key=None):
+        """
+        작업 생성 + 백그라운드 스레드 실행 → job_id.
+        같은 dedupe_key 로 진행 중인 작업이 있으면 새로 만들지 않고 그 job_id 반환
+        """
+        with self.locker:
+            if dedupe_key:
+                for jid, job in self.jobs.items():
+                    if job.get("dedupe_key") == dedupe_key and job["status"] in ("pending", "running"):
+                        return jid
+            job_id = self.create_job(video, clips, mode=mode, dedupe_key=dedupe_key)
+
+        threading.Thread(
+            target=self.worker,
+            args=(job_id, video, output_path),
+            daemon=True
+        ).start()
+        return job_id
+
+    def update(self, job_id, **fields):
+        """ job 상태 변경 (+ SSE 구독자에게 알림) - 중지된 작업은 pending / running 으로 되돌리지 않음 """
+        with self.locker:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            if job["status"] == "stopped" and fields.get("status") not in (None, "stopped", "done", "error"):
+                fields.pop("status")
+            job.update(fields)
+        if self.store:
+            self.store.set_state(job_id, **{k: v for k, v in fields.items() if k != "retryable"})
+        self.feed.touch(job_id)
+
     # ---------------------------------------
     # 🔥 2) 중지 요청
     # ---------------------------------------
     def stop(self, job_id):
+        self.update(job_id, status="stopped")
+
+    def is_stopped(self, job_id):
+        if self.store and self.store.is_stopped(job_id):
+            return True
         job = self.jobs.get(job_id)
-        if job:
-            job["status"] = "stopped"
+        return bool(job) and job["status"] == "stopped"
 
     # ---------------------------------------
-    # 🔥 3) ffmpeg 실행기
+    # 🔥 3) ffmpeg 실행기 (클립 추출 + 병합을 ffmpeg 1번으로)
     # ---------------------------------------
     def worker(self, job_id, video_name, output_path):
         job = self.jobs.get(job_id)
         if not job:
             return
 
+        temp_dir = Path(tempfile.gettempdir()) / f"exp_{job_id}"
+        # 같은 결과 파일을 만드는 작업이 겹쳐도 서로의 임시 파일을 건드리지 않도록 job_id 포함
+        part_path = output_path.with_name(f".{output_path.stem}.{job_id}.part.mp4")
+        lease = None
         try:
             # ---------------------------------------
-            # ① R2 → temp 영상 다운로드
+            # ① R2 → 로컬 캐시 (같은 영상을 여러 번 export 해도 1번만 다운로드)
             # ---------------------------------------
-            tmp_video_path = Path(tempfile.gettempdir()) / f"exp_{uuid.uuid4().hex}.mp4"
-            download_to_path(video_name, tmp_video_path)
+            # (lease 를 닫기 전까지는 캐시 정리에서 지워지지 않음)
+            tmp_video_path, lease = r2_cache.acquire(video_name)
 
-            if not tmp_video_path.exists():
-                job["status"] = "error"
-                job["error"] = "Cannot download video from R2"
+            if not tmp_video_path:
+                self.update(job_id, status="error", error="Cannot download video from R2")
                 return
 
-            clips = job["clips"]
+            # 입력 / ffmpeg 실패는 다시 해도 같음 → retryable=False (작업 큐가 재시도하지 않음)
+            try:
+                clips = normalize_clips(job["clips"])
+            except (KeyError, TypeError, ValueError) as e:
+                self.update(job_id, status="error", error=f"Invalid clips: {e}", retryable=False)
+                return
             if not clips:
-                job["status"] = "error"
-                job["error"] = "No clips provided"
+                self.update(job_id, status="error", error="No clips provided", retryable=False)
                 return
 
             # ---------------------------------------
-            # ② 개별 클립 추출 → temp 파일 생성
+            # ② ffmpeg 명령 1개 구성
+            #    copy     : concat demuxer inpoint/outpoint, 재인코딩 없음 (시작점이 키프레임으로 당겨짐)
+            #    accurate : 클립마다 -ss/-t 입력 + concat 필터, libx264 재인코딩 (프레임 단위 정확)
             # ---------------------------------------
-            temp_dir = Path(tempfile.gettempdir()) / f"exp_{job_id}"
+            mode = job.get("mode") or config.EXPORT_MODE
             temp_dir.mkdir(exist_ok=True)
+            if mode == "accurate":
+                cmd = accurate_cmd(tmp_video_path, clips, part_path, _has_audio(video_name, tmp_video_path))
+            else:
+                mode = "copy"
+                cmd = copy_cmd(tmp_video_path, clips, part_path, temp_dir / "list.txt")
 
-            clip_files = []
-            total = len(clips)
+            # 다운로드하는 동안 /export_stop 이 왔으면 ffmpeg 을 돌리지 않음
+            if self.is_stopped(job_id):
+                return
+            self.update(job_id, status="running", mode=mode)
 
-            for idx, c in enumerate(clips):
-                if job["status"] == "stopped":
-                    return
+            # ---------------------------------------
+            # ③ 실행 + -progress 출력으로 진행률 (출력 시간 / 전체 클립 길이)
+            # ---------------------------------------
+            total_sec = sum(end - start for start, end in clips)
+            last = [-1]
 
-                start = c["start"]
-                end = c["end"]
-                duration = max(0.01, end - start)
+            def on_progress(out_sec):
+                pct = min(99, int(out_sec * 100 / total_sec))
+                if pct != last[0]:
+                    last[0] = pct
+                    self.update(job_id, progress=pct)
 
-                clip_path = temp_dir / f"clip_{idx}.mp4"
-                clip_files.append(clip_path)
+            ok, err = run_ffmpeg(cmd, on_progress, lambda: self.is_stopped(job_id),
+                                 temp_dir / "ffmpeg.log")
+            if self.is_stopped(job_id):
+                return
+            if not ok or not part_path.exists():
+                self.update(job_id, status="error", error=err or "Failed to create result file",
+                            retryable=False)
+                return
 
-                # ffmpeg extract
-                cmd = [
-                    "ffmpeg", "-y",
-                    "-ss", str(start),
-                    "-i", str(tmp_video_path),
-                    "-t", str(duration),
-                    "-c", "copy",
-                    str(clip_path)
-                ]
-                subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            os.replace(part_path, output_path)
+            self.update(job_id, progress=100, status="done")
 
-                job["progress"] = int(((idx + 1) / total) * 50)
+        except Exception as e:
+            self.update(job_id, status="error", error=str(e))
 
-            # ---------------------------------------
-            # ③ 병합 리스트 파일 생성
-            # ---------------------------------------
-            list_path = temp_dir / "list.txt"
-            with open(list_path, "w", encoding="utf-8") as f:
-                for clip in clip_files:
-                    f.write(f"file '{clip.as_posix()}'\n")
+        finally:
+            # ❗ temp 파일 정리 (원본 영상은 캐시에 남겨둠)
+            if lease:
+                lease.close()
+            part_path.unlink(missing_ok=True)
+            shutil.rmtree(temp_dir, ignore_errors=True)
 
-            # ---------------------------------------
-            # ④ concat 병합
-            # ---------------------------------------
-            job["progress"] = 80
-
-            cmd = [
-                "ffmpeg", "-y",
-                "-f", "concat",
-                "-safe", "0",
-                "-i", str(list_path),
-                "-c", "copy",
-                str(output_path)
-            ]
-            subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-            # ---------------------------------------
-            # 완료
-            # ---------------------------------------
-            if not output_path.exists():
-                job["status"] = "error"
-                job["error"] = "Failed to create result file"
-                return
+# ---------------------------------------
+# 결과 캐시 (같은 영상 + 같은 클립 + 같은 모드 → 같은 파일)
+# ---------------------------------------
+def export_cache_key(video, etag, clips, mode):
+    """ 영상 키 + ETag (내용 바뀌면 다른 키) + 정규화한 클립 목록 + export 모드 → 결과 파일 이름용 해시 """
+    body = json.dumps({
+        "video": video,
+        "etag": etag,
+        "clips": [[round(start, 3), round(end, 3)] for start, end in normalize_clips(clips)],
+        "mode": mode,
+    }, sort_keys=True)
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()[:24]
 
-            job["progress"] = 100
-            job["status"] = "done"
 
-        except Exception as e:
-            job["status"] = "error"
-            job["error"] = str(e)
+def is_part_file(name):
+    """ export 가 쓰는 중인 파일 (.{stem}.{job_id}.part.mp4) 인지 - 정리할 때 건드리면 안 됨 """
+    return name.startswith(".") or name.endswith(".part.mp4")
+
+
+def prune_results(result_dir, max_age_sec, max_bytes):
+    """
+    results/highlight_*.mp4 정리: max_age_sec 보다 오래 안 쓴 파일 삭제 후
+    전체 크기가 max_bytes 를 넘으면 가장 오래 안 쓴 파일부터 삭제 (mtime = 마지막 사용 시각).
+    만드는 중인 파일 (.{stem}.{job_id}.part.mp4) 은 대상 아님.
+    """
+    now = time.time()
+    entries = []
+    for p in Path(result_dir).glob("highlight_*.mp4"):
+        # glob 패턴상 "." 으로 시작하는 part 파일은 안 걸리지만 명시적으로 제외
+        if is_part_file(p.name):
+            continue
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, p in sorted(entries):
+        if now - mtime <= max_age_sec and total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    if removed:
+        print(f"🧹 export 결과 {removed}개 정리 (남은 크기 {total / 1e6:.1f}MB)")
+    return removed
+
+
+# ---------------------------------------
+# ffmpeg 명령 / 실행
+# ---------------------------------------
+def normalize_clips(clips):
+    """ [{"start", "end"}] → [(start, end)] (길이 0 이하 구간 제외) """
+    out = []
+    for c in clips or []:
+        start = max(0.0, float(c["start"]))
+        end = float(c["end"])
+        if end - start >= 0.01:
+            out.append((start, end))
+    return out
+
+
+def _has_audio(video_name, local_path):
+    meta = get_video_meta(video_name)
+    probe = meta.get("probe") if meta else None
+    if not probe:
+        probe = probe_video(str(local_path))
+    # 확인이 안 되면 음성 있다고 보고 처리 (없으면 ffmpeg 가 실패 → 에러로 보고)
+    return probe is None or probe.get("audio") is not None
+
+
+def copy_cmd(src, clips, output_path, list_path):
+    def q(path):
+        return "'" + Path(path).as_posix().replace("'", "'\\''") + "'"
 
+    with open(list_path, "w", encoding="utf-8") as f:
+        for start, end in clips:
+            f.write(f"file {q(src)}\ninpoint {start:.3f}\noutpoint {end:.3f}\n")
+
+    return [
+        "ffmpeg", "-y", "-hide_banner", "-nostats",
+        "-f", "concat", "-safe", "0",
+        "-i", str(list_path),
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        "-progress", "pipe:1",
+        str(output_path),
+    ]
+
+
+def accurate_cmd(src, clips, output_path, has_audio=True):
+    # 입력 앞 -ss 는 가까운 키프레임부터 디코딩 후 정확한 시각까지 버림 → 클립 근처만 디코딩
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats"]
+    for start, end in clips:
+        cmd += ["-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", str(src)]
+
+    streams = "".join(
+        f"[{i}:v:0][{i}:a:0]" if has_audio else f"[{i}:v:0]" for i in range(len(clips))
+    )
+    graph = f"{streams}concat=n={len(clips)}:v=1:a={1 if has_audio else 0}[v]" + ("[a]" if has_audio else "")
+
+    cmd += ["-filter_complex", graph, "-map", "[v]"]
+    if has_audio:
+        cmd += ["-map", "[a]", "-c:a", "aac", "-b:a", config.TRANSCODE_AUDIO_BITRATE]
+    cmd += [
+        "-c:v", "libx264",
+        "-preset", config.EXPORT_PRESET,
+        "-crf", str(config.EXPORT_CRF),
+        "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+        "-progress", "pipe:1",
+        str(output_path),
+    ]
+    return cmd
+
+
+def run_ffmpeg(cmd, on_progress, should_stop, log_path):
+    """
+    -progress pipe:1 출력 (key=value 줄) 을 읽으면서 on_progress(출력된 초) 호출.
+    should_stop() 이 True 면 ffmpeg 종료.
+    return : (성공 여부, 실패 시 stderr 마지막 부분)
+    """
+    stopped = False
+    with open(log_path, "wb") as log:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log, stdin=subprocess.DEVNULL)
+        try:
+            for raw in proc.stdout:
+                key, _, value = raw.decode("utf-8", "ignore").strip().partition("=")
+                # out_time_us / out_time_ms 모두 마이크로초 (ffmpeg 버전에 따라 하나만 있음)
+                if key in ("out_time_us", "out_time_ms") and value.isdigit():
+                    on_progress(int(value) / 1e6)
+                elif key == "progress" and should_stop():
+                    stopped = True
+                    proc.terminate()
+                    break
+            proc.wait()
         finally:
-            # ❗ temp 파일 정리
-            try:
-                if tmp_video_path.exists():
-                    os.remove(tmp_video_path)
-            except:
-                pass
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
 
-            try:
-                for f in list(temp_dir.glob("*")):
-                    try:
-                        f.unlink()
-                    except:
-                        pass
-                temp_dir.rmdir()
-            except:
-                pass
+    if stopped:
+        return False, "stopped"
+    if proc.returncode == 0:
+        return True, None
+    try:
+        tail = Path(log_path).read_bytes()[-500:].decode("utf-8", "ignore")
+    except OSError:
+        tail = ""
+    print("❌ export ffmpeg 실패:", tail)
+    return False, tail.strip().splitlines()[-1] if tail.strip() else f"ffmpeg exit {proc.returncode}"
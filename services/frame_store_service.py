@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+
+import config
+
+# 프레임별 검출 결과 (열 단위 배열, 분석 1건당 npz 파일 1개)
+#   t       : float64  프레임 시각 (초, 오름차순)
+#   found   : bool     공 검출 여부
+#   cx, cy  : float32  공 중심 (없으면 NaN)
+#   persons : int16    사람 수
+COLUMNS = ("t", "found", "cx", "cy", "persons")
+
+
+def _path(ref):
+    return config.FRAMES_STORE_DIR / ref
+
+
+def save_frames(item_id, frames):
+    """
+    frames_info(dict 리스트) → 압축 npz 저장.
+    return : store 레코드에 넣을 참조 (FRAMES_STORE_DIR 기준 파일명)
+    """
+    n = len(frames)
+    t = np.empty(n, dtype=np.float64)
+    found = np.zeros(n, dtype=bool)
+    cx = np.full(n, np.nan, dtype=np.float32)
+    cy = np.full(n, np.nan, dtype=np.float32)
+    persons = np.zeros(n, dtype=np.int16)
+
+    for i, f in enumerate(frames):
+        ball = f.get("ball") or {}
+        t[i] = f["t"]
+        found[i] = bool(ball.get("found"))
+        if ball.get("cx") is not None:
+            cx[i] = ball["cx"]
+            cy[i] = ball["cy"]
+        persons[i] = f.get("persons") or 0
+
+    ref = f"{item_id}.npz"
+    path = _path(ref)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 쓰는 도중 죽어도 깨진 파일이 남지 않도록 tmp → replace
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp, t=t, found=found, cx=cx, cy=cy, persons=persons)
+    os.replace(tmp, path)
+    return ref
+
+
+def delete_frames(ref):
+    try:
+        _path(ref).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def load_columns(ref, start=None, end=None, columns=COLUMNS):
+    """
+    start ~ end 초 구간만 열 단위 배열로 반환 (None = 처음 / 끝까지).
+    npz 는 열마다 따로 압축돼 있어서 요청한 열만 풀린다.
+    """
+    with np.load(_path(ref)) as data:
+        t = data["t"]
+        lo = 0 if start is None else int(np.searchsorted(t, start, side="left"))
+        hi = len(t) if end is None else int(np.searchsorted(t, end, side="right"))
+        return {c: (t if c == "t" else data[c])[lo:hi] for c in columns}
+
+
+def to_frame_dicts(cols):
+    """ 열 단위 배열 → 예전 frames_info 형식 """
+    frames = []
+    for t, found, cx, cy, persons in zip(cols["t"], cols["found"], cols["cx"], cols["cy"], cols["persons"]):
+        has_ball = not np.isnan(cx)
+        frames.append({
+            "t": float(t),
+            "ball": {
+                "found": bool(found),
+                "cx": float(cx) if has_ball else None,
+                "cy": float(cy) if has_ball else None,
+            },
+            "persons": int(persons),
+        })
+    return frames
+
+
+def load_frames(item, start=None, end=None):
+    """
+    store 레코드의 start ~ end 초 구간 frames_info.
+    frames_ref 가 없는 예전 레코드는 안에 든 frames 를 그대로 잘라서 반환.
+    """
+    ref = item.get("frames_ref")
+    if ref:
+        return to_frame_dicts(load_columns(ref, start, end))
+
+    return [
+        f for f in item.get("frames") or []
+        if (start is None or f["t"] >= start) and (end is None or f["t"] <= end)
+    ]
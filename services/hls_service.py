@@ -0,0 +1,206 @@
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import config
+from services.r2_service import s3, R2_BUCKET, r2_upload_file, r2_delete_prefix
+from services.r2_index_service import r2_index
+from services.video_convert_service import probe_video, display_size
+from services.video_meta_service import get_video_meta, update_video_meta
+
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+def hls_prefix(name):
+    """ 영상 name 의 HLS 파일들이 올라가는 R2 prefix (URL 도 /hls/<name>/... 로 같은 모양) """
+    return f"{config.HLS_PREFIX}{name}/"
+
+
+def hls_master_url(name):
+    """ 플레이어용 master playlist URL (패키징 안 된 영상이면 None) """
+    meta = get_video_meta(name) or {}
+    if not meta.get("hls"):
+        return None
+    return f"/{config.HLS_PREFIX}{name}/master.m3u8"
+
+
+# -----------------------------------------
+# 🔥 1) 패키징 (ffmpeg 1번 → 원본 copy 렌디션 + 선택적 저화질 렌디션)
+# -----------------------------------------
+def _rendition_args(out_dir, label, codec_args):
+    return [
+        "-map", "0:v:0", "-map", "0:a:0?",
+        *codec_args,
+        "-f", "hls",
+        "-hls_time", str(config.HLS_SEGMENT_SEC),
+        "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", str(out_dir / f"{label}_%05d.ts"),
+        str(out_dir / f"{label}.m3u8"),
+    ]
+
+
+def _master_playlist(renditions):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for r in renditions:
+        inf = f"#EXT-X-STREAM-INF:BANDWIDTH={r['bandwidth']}"
+        if r.get("width") and r.get("height"):
+            inf += f",RESOLUTION={r['width']}x{r['height']}"
+        lines += [inf, f"{r['label']}.m3u8"]
+    return "\n".join(lines) + "\n"
+
+
+def package_hls(local_path, name, probe=None, progress=None):
+    """
+    로컬 H.264 mp4 → HLS (playlist + .ts 세그먼트) → R2 hls_prefix(name) 아래 업로드 → 영상 메타에 기록.
+    - src : 재인코딩 없이 세그먼트로 자르기만 (키프레임 기준이라 세그먼트 길이는 대략 HLS_SEGMENT_SEC)
+    - low : HLS_LOW_RENDITION=1 이면 HLS_LOW_HEIGHT / HLS_LOW_KBPS 저화질 렌디션 추가 (느린 회선 / 빠른 스크럽용)
+    return : 메타에 저장한 hls dict / 실패 시 None
+    """
+    probe = probe or probe_video(str(local_path))
+    out_dir = Path(tempfile.mkdtemp(prefix="hls_", dir=config.TMP_DIR))
+    t0 = time.time()
+    try:
+        renditions = []
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-i", str(local_path)]
+        cmd += _rendition_args(out_dir, "src", ["-c", "copy"])
+
+        width, height = display_size(probe) if probe else (None, None)
+        bitrate = (probe or {}).get("bit_rate") or 8_000_000
+        renditions.append({"label": "src", "width": width, "height": height, "bandwidth": int(bitrate * 1.1)})
+
+        if config.HLS_LOW_RENDITION and (not height or height > config.HLS_LOW_HEIGHT):
+            cmd += _rendition_args(out_dir, "low", [
+                "-vf", f"scale=-2:{config.HLS_LOW_HEIGHT}",
+                "-c:v", "libx264", "-preset", "veryfast",
+                "-b:v", f"{config.HLS_LOW_KBPS}k", "-maxrate", f"{config.HLS_LOW_KBPS}k",
+                "-bufsize", f"{config.HLS_LOW_KBPS * 2}k",
+                # 세그먼트 경계마다 키프레임 (fps 와 상관없이 세그먼트 길이가 일정)
+                "-force_key_frames", f"expr:gte(t,n_forced*{config.HLS_SEGMENT_SEC})",
+                "-sc_threshold", "0",
+                "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", "96k",
+            ])
+            low_w = int(round(width * config.HLS_LOW_HEIGHT / height / 2) * 2) if width and height else None
+            renditions.append({"label": "low", "width": low_w, "height": config.HLS_LOW_HEIGHT,
+                               "bandwidth": (config.HLS_LOW_KBPS + 96) * 1000})
+
+        if progress:
+            progress.set(status="packaging")
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except (OSError, subprocess.CalledProcessError) as e:
+            err = getattr(e, "stderr", None) or b""
+            print("❌ HLS 패키징 실패:", name, e, err[-300:].decode("utf-8", "ignore"))
+            return None
+
+        # 낮은 화질을 먼저 (플레이어가 처음엔 빠르게 시작)
+        renditions.sort(key=lambda r: r["bandwidth"])
+        (out_dir / "master.m3u8").write_text(_master_playlist(renditions), encoding="utf-8")
+
+        # 예전 패키징 결과가 남아 있으면 지우고 새로 올림
+        prefix = hls_prefix(name)
+        r2_delete_prefix(prefix)
+        files = sorted(out_dir.iterdir())
+
+        # 세그먼트마다 인덱스를 갱신하면 (stamp 파일) 모든 프로세스가 버킷 목록을 계속 다시 읽음
+        # → 다 올린 뒤 1번만 (이전에 없던 playlist 로 기억된 404 도 같이 지워짐)
+        def upload(path):
+            if not r2_upload_file(path, prefix + path.name,
+                                  content_type=CONTENT_TYPES.get(path.suffix, "application/octet-stream"),
+                                  invalidate=False):
+                raise RuntimeError(f"HLS 업로드 실패: {path.name}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=config.HLS_UPLOAD_WORKERS) as pool:
+                list(pool.map(upload, files))
+        finally:
+            r2_index.invalidate()
+
+        hls = {
+            "prefix": prefix,
+            "renditions": renditions,
+            "segment_sec": config.HLS_SEGMENT_SEC,
+            "segments": sum(1 for f in files if f.suffix == ".ts"),
+            "sec": round(time.time() - t0, 2),
+        }
+        update_video_meta(name, hls=hls)
+        print(f"📺 HLS 패키징 완료: {name} ({hls['segments']}개 세그먼트, {hls['sec']}s)")
+        return hls
+    except Exception as e:
+        print("❌ HLS 패키징 실패:", name, e)
+        return None
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def package_video(name, progress=None):
+    """ 이미 R2 에 있는 영상 → 로컬 캐시로 받아 패키징 (기존 영상 일괄 처리용) """
+    from services.r2_cache_service import r2_cache
+
+    with r2_cache.lease(name) as local:
+        if not local:
+            raise RuntimeError(f"R2 다운로드 실패: {name}")
+        meta = get_video_meta(name) or {}
+        hls = package_hls(local, name, meta.get("probe"), progress)
+    if not hls:
+        raise RuntimeError(f"HLS 패키징 실패: {name}")
+    if progress:
+        progress.set(100, "done", name)
+    return hls
+
+
+def delete_hls(name):
+    """ 영상 삭제 시 HLS 파일들도 삭제 """
+    if (get_video_meta(name) or {}).get("hls"):
+        r2_delete_prefix(hls_prefix(name))
+
+
+# -----------------------------------------
+# 🔥 2) 재생 (playlist 는 서버가, 세그먼트는 서명 URL 또는 프록시)
+# -----------------------------------------
+_playlists = {}     # key → (etag, text)
+_playlists_lock = threading.Lock()
+
+
+def read_playlist(key):
+    """ R2 의 playlist 텍스트 (ETag 가 같으면 메모리 캐시) / 없으면 None """
+    head = r2_index.head(key)
+    if head is None:
+        return None
+    with _playlists_lock:
+        hit = _playlists.get(key)
+    if hit and hit[0] == head["etag"]:
+        return hit[1]
+
+    text = s3.get_object(Bucket=R2_BUCKET, Key=key)["Body"].read().decode("utf-8")
+    with _playlists_lock:
+        if len(_playlists) > 512:
+            _playlists.clear()
+        _playlists[key] = (head["etag"], text)
+    return text
+
+
+def rewrite_playlist(text, prefix, sign, query=""):
+    """
+    세그먼트 줄 (.ts) → sign(R2 키) 가 돌려주는 URL (redirect 모드: 서명 URL 로 R2 에서 직접)
+    sign 이 None 이면 상대 경로 그대로 (이 서버의 /hls/... 로 요청)
+    하위 playlist (.m3u8) 줄에는 query (?mode=...) 를 붙여서 같은 재생 방식 유지
+    """
+    out = []
+    for line in text.splitlines():
+        s = line.strip()
+        if s and not s.startswith("#"):
+            if s.endswith(".ts") and sign:
+                line = sign(prefix + s) or s
+            elif s.endswith(".m3u8") and query:
+                line = s + query
+        out.append(line)
+    return "\n".join(out) + "\n"
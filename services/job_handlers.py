@@ -0,0 +1,137 @@
+from pathlib import Path
+
+import config
+from services.coord_service import BasketCoordService
+from services.export_service import ExportManager
+from services.job_queue import PermanentJobError
+from services.hls_service import package_video
+from services.thumbnail_service import build_sprites
+from services.upload_service import process_upload
+from services.video_source_service import VideoSource
+from services.yolo_pool_service import YoloPoolScheduler
+from services.yolo_service import YoloHighlighter, highlighter_options
+
+MODEL_PATH = config.YOLO_MODEL_PATH
+
+
+def build_handlers(queue):
+    """
+    JobWorker 가 실행할 작업 타입별 handler(job_id, payload, progress).
+    - 예외를 던지면 JobQueue 가 backoff 후 재시도
+    - progress 는 QueuedJobProgress (DB 에 상태 기록)
+    """
+    coords = BasketCoordService(Path("basket_coords.json"))
+    scheduler = YoloPoolScheduler(
+        MODEL_PATH, highlighter_options(), queue,
+        workers=config.YOLO_WORKERS,
+        torch_threads=config.YOLO_TORCH_THREADS,
+        shards=config.YOLO_SHARDS,
+    )
+    exporter = ExportManager(store=queue)
+
+    # ---------------------------------------
+    # 🔥 단일 영상 분석
+    # ---------------------------------------
+    def run_yolo(job_id, payload, progress):
+        video = payload["video"]
+        shards = payload.get("shards") or 0
+
+        if shards > 1:
+            item = scheduler.run_sharded(video, shards, job_id)
+        else:
+            with VideoSource(video) as source:
+                if not source.path:
+                    raise RuntimeError(f"Cannot download video from R2: {video}")
+
+                progress.set(0, "running", video)
+                yolo = YoloHighlighter(MODEL_PATH, progress, coords, **highlighter_options())
+                item = yolo.run(source.path, video, ingest=source.stats, scale=source.scale)
+
+        # 영상 열기 실패 등은 progress 에 error_* 만 남기고 None → 예외로 바꿔야 작업 큐가 재시도
+        if item is None and not progress.is_stopped():
+            raise RuntimeError(f"YOLO 분석 실패 (영상 열기 / 다운로드): {video}")
+
+    # ---------------------------------------
+    # 🔥 다중 영상 분석 (재시작 시 이미 끝난 영상은 건너뜀)
+    # ---------------------------------------
+    def run_yolo_multi(job_id, payload, progress):
+        videos = payload["videos"]
+        per_video = progress.load().get("per_video") or {}
+        done = {v for v, st in per_video.items() if st.get("status") == "done"}
+        todo = [v for v in videos if v not in done]
+
+        if done:
+            print(f"↪ 이어서 분석: {len(done)}개 완료, {len(todo)}개 남음")
+        if not todo:
+            return
+        scheduler.run(todo, job_id)
+
+        # 프로세스 풀 실패 (error_pool) / 영상별 error_* 는 예외로 바꿔야 작업 큐가 재시도
+        # (재시도 때는 이미 done 인 영상은 건너뜀)
+        if progress.is_stopped():
+            return
+        per_video = progress.load().get("per_video") or {}
+        failed = [v for v in todo if (per_video.get(v) or {}).get("status") != "done"]
+        if failed:
+            raise RuntimeError(f"YOLO 다중 분석 실패 {len(failed)}/{len(todo)}개: {', '.join(failed)}")
+
+    # ---------------------------------------
+    # 🔥 하이라이트 export
+    # ---------------------------------------
+    def run_export(job_id, payload, progress):
+        exporter.create_job(payload["video"], payload["clips"], job_id=job_id, mode=payload.get("mode"))
+        try:
+            exporter.worker(job_id, payload["video"], Path(payload["output"]))
+            job = exporter.jobs.get(job_id) or {}
+        finally:
+            exporter.jobs.pop(job_id, None)
+
+        if job.get("status") == "error":
+            if job.get("retryable", True):
+                raise RuntimeError(job.get("error") or "export failed")
+            raise PermanentJobError(job.get("error") or "export failed")
+
+    # ---------------------------------------
+    # 🔥 업로드 (H.264 변환 → R2 multipart 업로드)
+    # ---------------------------------------
+    def run_upload(job_id, payload, progress):
+        process_upload(payload["tmp_path"], payload["name"], progress)
+
+    # ---------------------------------------
+    # 🔥 HLS 패키징 (이미 올라가 있는 영상)
+    # ---------------------------------------
+    def run_hls(job_id, payload, progress):
+        progress.set(0, "running", payload["video"])
+        package_video(payload["video"], progress)
+
+    # ---------------------------------------
+    # 🔥 타임라인 미리보기 스프라이트
+    # ---------------------------------------
+    def run_sprites(job_id, payload, progress):
+        build_sprites(payload["video"], progress)
+
+    return {
+        "yolo": run_yolo,
+        "yolo_multi": run_yolo_multi,
+        "export": run_export,
+        "upload": run_upload,
+        "hls": run_hls,
+        "sprites": run_sprites,
+    }
+
+
+def job_limit_groups():
+    """ 실행 수를 합쳐서 세는 타입들 - 단일 / 다중 분석은 같은 CPU 상한 (JOB_YOLO_CONCURRENCY) 을 나눠 씀 """
+    return {"yolo": "yolo", "yolo_multi": "yolo"}
+
+
+def job_limits():
+    """ 타입별 동시 실행 수 (모든 워커 프로세스 합계, job_limit_groups 로 묶인 타입은 그룹 합계) """
+    return {
+        "yolo": config.JOB_YOLO_CONCURRENCY,
+        "yolo_multi": config.JOB_YOLO_CONCURRENCY,
+        "export": config.JOB_EXPORT_CONCURRENCY,
+        "upload": config.UPLOAD_WORKERS,
+        "hls": config.JOB_HLS_CONCURRENCY,
+        "sprites": config.JOB_SPRITE_CONCURRENCY,
+    }
@@ -0,0 +1,545 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+
+import config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id             TEXT PRIMARY KEY,
+    type           TEXT NOT NULL,
+    payload        TEXT NOT NULL,
+    status         TEXT NOT NULL,              -- queued / running / done / error / stopped
+    state          TEXT NOT NULL DEFAULT '{}', -- 화면에 보여줄 진행 상태 (progress, status, clips ...)
+    stop_requested INTEGER NOT NULL DEFAULT 0,
+    attempts       INTEGER NOT NULL DEFAULT 0,
+    max_attempts   INTEGER NOT NULL DEFAULT 3,
+    run_after      REAL NOT NULL DEFAULT 0,
+    worker         TEXT,
+    heartbeat      REAL,
+    version        INTEGER NOT NULL DEFAULT 0,
+    error          TEXT,
+    created        REAL NOT NULL,
+    updated        REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, type, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_latest ON jobs (type, created);
+"""
+
+FINAL_STATUSES = ("done", "error", "stopped")
+
+
+class PermanentJobError(Exception):
+    """ 다시 실행해도 같은 결과인 실패 (잘못된 입력 등) → 재시도 없이 바로 error """
+
+
+class QueuedJobProgress:
+    """
+    JobQueue 에 묶인 progress (ProgressManager.job() 과 같은 load / set / is_stopped 모양).
+    set() 은 값이 바뀌었을 때만, 상태 변경이 아니면 min_interval 초에 한 번만 DB 에 씀.
+    """
+
+    def __init__(self, queue, job_id, min_interval=0.5):
+        self.queue = queue
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._pending = {}
+        self._last_write = 0.0
+        self._last_status = None
+
+    def load(self):
+        return self.queue.load(self.job_id)
+
+    def set(self, percent=None, status=None, video=None, **kwargs):
+        fields = dict(kwargs)
+        if percent is not None:
+            fields["progress"] = percent
+        if status is not None:
+            fields["status"] = status
+        if video is not None:
+            fields["video"] = video
+        self._pending.update(fields)
+
+        status_changed = status is not None and status != self._last_status
+        if status_changed or time.time() - self._last_write >= self.min_interval:
+            self.flush()
+            self._last_status = self._pending.get("status", self._last_status)
+
+    def flush(self):
+        if self._pending:
+            self.queue.set_state(self.job_id, **self._pending)
+            if "status" in self._pending:
+                self._last_status = self._pending["status"]
+            self._pending = {}
+        self._last_write = time.time()
+
+    def is_stopped(self):
+        return self.queue.is_stopped(self.job_id)
+
+
+class DbChangeFeed:
+    """
+    ChangeFeed 와 같은 모양 (version / wait), 버전은 DB 의 version 컬럼.
+    - 이 프로세스에서 바꾼 상태 (set_state / finish / fail ...) 는 JobQueue 가 touch() → 기다리던 스트림이 바로 깨어남
+    - 다른 프로세스 (별도 worker.py / 다른 gunicorn 워커의 작업 워커) 가 실행 중인 작업만
+      프로세스당 스레드 1개가 poll_sec 마다 한 번의 SELECT 로 확인 (연결마다 polling 하지 않음)
+    - 기다리는 스트림이 없으면 DB 를 읽지 않음
+    """
+
+    def __init__(self, queue, poll_sec=2.0):
+        self.queue = queue
+        self.poll_sec = poll_sec
+        self.cond = threading.Condition()
+        self.versions = {}      # key → 마지막으로 본 DB version
+        self.waiters = {}       # key → 기다리는 스트림 수
+        self.poller = None
+
+    def version(self, key):
+        return self.queue.version(key)
+
+    def _update(self, key, version):
+        with self.cond:
+            if version > self.versions.get(key, 0):
+                self.versions[key] = version
+                self.cond.notify_all()
+
+    def touch(self, key):
+        """ 이 프로세스에서 상태를 바꾼 뒤 호출 (기다리는 스트림이 있을 때만 DB version 을 읽음) """
+        with self.cond:
+            if key not in self.waiters:
+                return
+        self._update(key, self.queue.version(key))
+
+    def wait(self, key, after, timeout):
+        """ key 버전이 after 보다 커지거나 timeout 까지 대기 → 현재 버전 """
+        with self.cond:
+            first = key not in self.versions
+            self.waiters[key] = self.waiters.get(key, 0) + 1
+            if self.poller is None:
+                self.poller = threading.Thread(target=self._poll_loop, daemon=True)
+                self.poller.start()
+        try:
+            if first:
+                self._update(key, self.queue.version(key))
+            with self.cond:
+                self.cond.wait_for(lambda: self.versions.get(key, 0) > after, timeout)
+                return self.versions.get(key, 0)
+        finally:
+            with self.cond:
+                self.waiters[key] -= 1
+                if not self.waiters[key]:
+                    del self.waiters[key]
+                    self.versions.pop(key, None)
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_sec)
+            with self.cond:
+                keys = list(self.waiters)
+            if not keys:
+                continue
+            try:
+                for key, version in self.queue.remote_versions(keys):
+                    self._update(key, version)
+            except Exception as e:
+                print("❌ 작업 상태 확인 오류:", e)
+
+
+class JobQueue:
+    """
+    SQLite 기반 영구 작업 큐.
+    - 웹 워커들은 enqueue / load / request_stop 만 하고
+    - 작업 실행은 JobWorker (별도 프로세스 또는 웹 프로세스 안의 스레드) 가 claim 해서 처리
+    - 실행 중 서버가 죽으면 heartbeat 가 끊긴 작업을 다시 queued 로 돌려 재실행
+    """
+
+    def __init__(self, db_path: Path, stale_sec=60, backoff_sec=5):
+        self.db_path = Path(db_path)
+        self.stale_sec = stale_sec
+        self.backoff_sec = backoff_sec
+        self._local = threading.local()
+        self.local_workers = set()     # 이 프로세스 안의 JobWorker id (그 작업들은 touch 로 알림)
+        self.feed = DbChangeFeed(self, poll_sec=config.JOB_FEED_POLL_SEC)
+
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------------------------------
+    # 🔥 웹 쪽
+    # ---------------------------------------
+    def enqueue(self, job_type, payload, state=None, max_attempts=3, job_id=None, dedupe_key=None):
+        """
+        dedupe_key : 같은 키로 대기 / 실행 중인 (중지 요청 안 된) 작업이 있으면 새로 넣지 않고 그 job_id 반환
+                     (payload["dedupe_key"] 로 저장)
+        """
+        job_id = job_id or str(uuid.uuid4())
+        now = time.time()
+        state = dict(state or {})
+        state.setdefault("status", "queued")
+        state.setdefault("progress", 0)
+        state["job_id"] = job_id
+        if dedupe_key:
+            payload = dict(payload, dedupe_key=dedupe_key)
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if dedupe_key:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE type = ? AND status IN ('queued', 'running') "
+                    "AND stop_requested = 0 AND json_extract(payload, '$.dedupe_key') = ? "
+                    "ORDER BY created LIMIT 1",
+                    (job_type, dedupe_key),
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row["id"]
+
+            conn.execute(
+                "INSERT INTO jobs (id, type, payload, status, state, max_attempts, version, created, updated) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, 1, ?, ?)",
+                (job_id, job_type, json.dumps(payload, ensure_ascii=False),
+                 json.dumps(state, ensure_ascii=False), max_attempts, now, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def latest(self, types):
+        marks = ",".join("?" for _ in types)
+        row = self._conn().execute(
+            f"SELECT id FROM jobs WHERE type IN ({marks}) ORDER BY created DESC LIMIT 1",
+            tuple(types),
+        ).fetchone()
+        return row["id"] if row else None
+
+    def resolve(self, job_id=None, types=None):
+        """ job_id 가 없으면 types 중 가장 최근 작업 """
+        if job_id or not types:
+            return job_id
+        return self.latest(types)
+
+    def load(self, job_id=None, types=None):
+        """ 화면용 진행 상태 dict (없으면 {}) """
+        job_id = self.resolve(job_id, types)
+        if not job_id:
+            return {}
+        row = self._conn().execute(
+            "SELECT state, stop_requested, status, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if not row:
+            return {}
+
+        state = json.loads(row["state"])
+        if row["stop_requested"] and state.get("status") not in FINAL_STATUSES:
+            state["status"] = "stopped"
+        elif row["status"] not in FINAL_STATUSES and (state.get("status") or "").startswith("error"):
+            # handler 가 써 둔 에러 상태는 fail() 이 재시도 여부를 정하기 전까지 최종 상태가 아님
+            # (화면 / SSE 가 여기서 끝났다고 판단하지 않도록)
+            state["status"] = "running"
+        if row["error"] and not state.get("error"):
+            state["error"] = row["error"]
+        return state
+
+    def version(self, job_id):
+        row = self._conn().execute("SELECT version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["version"] if row else 0
+
+    def remote_versions(self, job_ids):
+        """ job_ids 중 다른 프로세스가 실행 중이거나 대기 중인 작업의 (id, version) """
+        marks = ",".join("?" for _ in job_ids)
+        workers = tuple(self.local_workers) or ("",)
+        wmarks = ",".join("?" for _ in workers)
+        rows = self._conn().execute(
+            f"SELECT id, version FROM jobs WHERE id IN ({marks}) "
+            f"AND (worker IS NULL OR worker NOT IN ({wmarks}))",
+            (*job_ids, *workers),
+        ).fetchall()
+        return [(row["id"], row["version"]) for row in rows]
+
+    def request_stop(self, job_id):
+        """ 대기 중이면 바로 stopped, 실행 중이면 워커가 보고 멈춤 """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row and row["status"] not in FINAL_STATUSES:
+                state = json.loads(row["state"])
+                state["status"] = "stopped"
+                queue_status = "stopped" if row["status"] == "queued" else row["status"]
+                conn.execute(
+                    "UPDATE jobs SET stop_requested = 1, status = ?, state = ?, "
+                    "version = version + 1, updated = ? WHERE id = ?",
+                    (queue_status, json.dumps(state, ensure_ascii=False), time.time(), job_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.feed.touch(job_id)
+
+    def is_stopped(self, job_id):
+        row = self._conn().execute(
+            "SELECT stop_requested FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row["stop_requested"])
+
+    def job(self, job_id):
+        return QueuedJobProgress(self, job_id)
+
+    # ---------------------------------------
+    # 🔥 워커 쪽
+    # ---------------------------------------
+    def set_state(self, job_id, **fields):
+        """ 화면용 상태 필드 병합 (중지 요청된 작업은 running 으로 되돌리지 않음) """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT state, stop_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return
+            state = json.loads(row["state"])
+            if row["stop_requested"] and fields.get("status") in ("running", "multi_running"):
+                fields.pop("status")
+            state.update(fields)
+            conn.execute(
+                "UPDATE jobs SET state = ?, version = version + 1, updated = ? WHERE id = ?",
+                (json.dumps(state, ensure_ascii=False), time.time(), job_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.feed.touch(job_id)
+
+    def claim(self, worker_id, limits, groups=None):
+        """
+        실행할 작업 1개를 running 으로 바꾸고 돌려줌.
+        limits = {type: 동시 실행 최대 수} - 모든 워커 프로세스 합계 기준.
+        groups = {type: 그룹 이름} - 같은 그룹의 타입들은 실행 수를 합쳐서 limits 와 비교
+                 (예: yolo / yolo_multi 가 CPU 상한 1개를 나눠 씀)
+        """
+        groups = groups or {}
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            running = {}
+            for t, n in conn.execute(
+                "SELECT type, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY type"
+            ).fetchall():
+                running[groups.get(t, t)] = running.get(groups.get(t, t), 0) + n
+            types = [t for t, limit in limits.items() if running.get(groups.get(t, t), 0) < limit]
+            if not types:
+                conn.execute("COMMIT")
+                return None
+
+            marks = ",".join("?" for _ in types)
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? "
+                f"AND type IN ({marks}) ORDER BY created LIMIT 1",
+                (now, *types),
+            ).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker_id, now, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return {
+            "id": row["id"],
+            "type": row["type"],
+            "payload": json.loads(row["payload"]),
+            "attempts": row["attempts"] + 1,
+        }
+
+    def heartbeat(self, job_ids):
+        if not job_ids:
+            return
+        marks = ",".join("?" for _ in job_ids)
+        self._conn().execute(
+            f"UPDATE jobs SET heartbeat = ? WHERE id IN ({marks}) AND status = 'running'",
+            (time.time(), *job_ids),
+        )
+
+    def finish(self, job_id):
+        """ 정상 종료 → done (중지 요청이 있었으면 stopped) """
+        self._conn().execute(
+            "UPDATE jobs SET status = CASE WHEN stop_requested = 1 THEN 'stopped' ELSE 'done' END, "
+            "worker = NULL, error = NULL, version = version + 1, updated = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+        self.feed.touch(job_id)
+
+    def fail(self, job_id, error, retry=True):
+        """
+        실패 → 재시도 횟수가 남았으면 backoff 후 다시 queued, 아니면 error.
+        retry=False (PermanentJobError) 면 횟수와 상관없이 바로 error. 최종 상태는 여기서만 기록.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, stop_requested, state FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return
+
+            state = json.loads(row["state"])
+            if row["stop_requested"]:
+                status = "stopped"
+                run_after = 0
+            elif retry and row["attempts"] < row["max_attempts"]:
+                status = "queued"
+                run_after = now + self.backoff_sec * (2 ** (row["attempts"] - 1))
+                state["status"] = "retrying"
+            else:
+                status = "error"
+                run_after = 0
+                state["status"] = "error"
+            state["error"] = error
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, run_after = ?, error = ?, state = ?, worker = NULL, "
+                "version = version + 1, updated = ? WHERE id = ?",
+                (status, run_after, error, json.dumps(state, ensure_ascii=False), now, job_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.feed.touch(job_id)
+
+    def requeue_stale(self):
+        """ heartbeat 가 끊긴 running 작업(서버 재시작 / 워커 죽음) → 다시 queued """
+        cutoff = time.time() - self.stale_sec
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = CASE WHEN stop_requested = 1 THEN 'stopped' ELSE 'queued' END, "
+            "worker = NULL, version = version + 1, updated = ? "
+            "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+            (time.time(), cutoff),
+        )
+        if cur.rowcount:
+            print(f"♻ 중단된 작업 {cur.rowcount}개를 다시 대기열에 넣었습니다.")
+
+
+class JobWorker:
+    """
+    JobQueue 에서 작업을 꺼내 handlers[type](job_id, payload, progress) 로 실행.
+    - 타입별 동시 실행 수는 limits (DB 기준이라 여러 프로세스 합계로 적용, groups 로 묶은 타입은 합계로)
+    - 실행 중인 작업은 heartbeat_sec 마다 heartbeat 갱신
+    """
+
+    def __init__(self, queue, handlers, limits, groups=None, poll_sec=1.0, heartbeat_sec=10):
+        self.queue = queue
+        self.handlers = handlers
+        self.limits = {t: limits.get(t, 1) for t in handlers}
+        self.groups = dict(groups or {})
+        self.poll_sec = poll_sec
+        self.heartbeat_sec = heartbeat_sec
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        queue.local_workers.add(self.worker_id)
+
+        self.running = {}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def _execute(self, job):
+        job_id = job["id"]
+        progress = self.queue.job(job_id)
+        try:
+            print(f"▶ 작업 시작: {job['type']} {job_id} (시도 {job['attempts']})")
+            self.handlers[job["type"]](job_id, job["payload"], progress)
+            progress.flush()
+            self.queue.finish(job_id)
+            print(f"✅ 작업 완료: {job['type']} {job_id}")
+        except PermanentJobError as e:
+            print(f"❌ 작업 실패 (재시도 안 함): {job['type']} {job_id}: {e}")
+            progress.flush()
+            self.queue.fail(job_id, str(e), retry=False)
+        except Exception as e:
+            traceback.print_exc()
+            progress.flush()
+            self.queue.fail(job_id, str(e))
+        finally:
+            with self.lock:
+                self.running.pop(job_id, None)
+
+    def _heartbeat_loop(self):
+        while not self.stopping.wait(self.heartbeat_sec):
+            with self.lock:
+                ids = list(self.running)
+            try:
+                self.queue.heartbeat(ids)
+                self.queue.requeue_stale()
+            except Exception as e:
+                print("❌ heartbeat 오류:", e)
+
+    def run_forever(self):
+        print("🛠 작업 워커 시작:", self.worker_id, self.limits)
+        self.queue.requeue_stale()
+        threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+
+        while not self.stopping.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, self.limits, self.groups)
+            except Exception as e:
+                print("❌ 작업 claim 오류:", e)
+                job = None
+
+            if job is None:
+                self.stopping.wait(self.poll_sec)
+                continue
+
+            with self.lock:
+                self.running[job["id"]] = job
+            threading.Thread(target=self._execute, args=(job,), daemon=True).start()
+
+    def start_background(self):
+        threading.Thread(target=self.run_forever, daemon=True).start()
+        return self
+
+
+_queue = None
+
+
+def get_job_queue():
+    """ 프로세스당 JobQueue 1개 (config.JOB_DB_PATH) """
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(config.JOB_DB_PATH, stale_sec=config.JOB_STALE_SEC,
+                          backoff_sec=config.JOB_RETRY_BACKOFF_SEC)
+    return _queue
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+import config
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def _fresh(target: Path, source: Path):
+    """ target 이 있고 source 보다 나중에 만들어졌으면 다시 변환하지 않음 """
+    return target.exists() and target.stat().st_mtime >= source.stat().st_mtime
+
+
+def _export_lock(weights: Path):
+    """ 여러 프로세스가 동시에 변환하지 않도록 파일 lock (fcntl 없는 OS 는 lock 없이 진행) """
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    f = open(weights.with_suffix(".export.lock"), "w")
+    fcntl.flock(f, fcntl.LOCK_EX)
+    return f
+
+
+def export_model(weights, backend, int8=False, imgsz=640, int8_data=None):
+    """
+    .pt → ONNX / OpenVINO IR 변환 결과 경로 (가중치 파일 옆에 캐시).
+    - onnx     : <stem>.onnx, int8 이면 onnxruntime 동적 양자화 <stem>.int8.onnx
+    - openvino : <stem>_openvino_model/, int8 이면 NNCF 양자화 <stem>_int8_openvino_model/
+                 (int8_data = 보정용 데이터셋 yaml, 없으면 ultralytics 기본값)
+    """
+    weights = Path(weights)
+    if backend == "torch":
+        return weights
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown YOLO backend: {backend}")
+
+    if backend == "onnx":
+        target = weights.with_suffix(".onnx")
+        final = weights.with_name(f"{weights.stem}.int8.onnx") if int8 else target
+    else:
+        suffix = "_int8_openvino_model" if int8 else "_openvino_model"
+        target = final = weights.with_name(weights.stem + suffix)
+
+    if _fresh(final, weights):
+        return final
+
+    lock = _export_lock(weights)
+    try:
+        if not _fresh(target, weights):
+            from ultralytics import YOLO
+
+            print(f"🔄 YOLO {backend} 변환 중:", weights)
+            kwargs = dict(format=backend, imgsz=imgsz, dynamic=True)
+            if backend == "openvino" and int8:
+                kwargs["int8"] = True
+                if int8_data:
+                    kwargs["data"] = int8_data
+            exported = Path(YOLO(str(weights)).export(**kwargs))
+            if exported != target:
+                os.replace(exported, target)
+
+        if final != target and not _fresh(final, target):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print("🔄 ONNX INT8 양자화 중:", target)
+            quantize_dynamic(str(target), str(final), weight_type=QuantType.QUInt8)
+    finally:
+        if lock:
+            lock.close()
+
+    return final
+
+
+class SharedModel:
+    """
+    프로세스 안에서 공유하는 YOLO 모델 1개.
+    ultralytics predictor 는 호출 중 내부 상태를 바꾸므로 추론은 lock 으로 한 번에 하나씩.
+    """
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self.names = model.names
+        self.lock = threading.Lock()
+
+        self.calls = 0
+        self.infer_sec = 0.0
+
+    def __call__(self, frames, **kwargs):
+        with self.lock:
+            t0 = time.perf_counter()
+            results = self.model(frames, **kwargs)
+            self.infer_sec += time.perf_counter() - t0
+            self.calls += 1
+        return results
+
+
+class ModelRegistry:
+    """
+    (모델 경로, 백엔드)별로 프로세스당 1번만 로딩 + warm-up 추론.
+    - get()     : 없으면 로딩 (동시에 여러 스레드가 불러도 로딩은 1번)
+    - preload() : gunicorn master 에서 미리 올려 두면 fork 된 워커가 가중치를 copy-on-write 로 공유
+                  (master 에서는 warm-up 추론을 하지 않음 - 아래 warmup_loaded 참고)
+    - warmup_loaded() : fork 된 워커에서 warm-up 추론 (gunicorn post_fork)
+    - stats()   : 로딩 시간 / 첫 추론(warm-up) 시간 / 누적 추론 시간
+    """
+
+    def __init__(self, warmup=True, warmup_size=640):
+        self.warmup = warmup
+        self.warmup_size = warmup_size
+        self.models = {}
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.path_locks = {}
+
+    @staticmethod
+    def _resolve(model_path):
+        model_path = Path(model_path)
+        if not model_path.is_absolute():
+            model_path = BASE_DIR / model_path
+        return str(model_path)
+
+    def get(self, model_path, backend="torch", int8=False, warmup=None):
+        path = self._resolve(model_path)
+        int8 = bool(int8) and backend != "torch"
+        key = f"{path}|{backend}" + ("|int8" if int8 else "")
+        model = self.models.get(key)
+        if model:
+            return model
+
+        with self.lock:
+            path_lock = self.path_locks.setdefault(key, threading.Lock())
+
+        # 같은 경로는 1번만 로딩, 다른 경로끼리는 막지 않음
+        with path_lock:
+            if key not in self.models:
+                self.models[key] = self._load(key, path, backend, int8,
+                                              self.warmup if warmup is None else warmup)
+        return self.models[key]
+
+    def _warmup(self, model):
+        blank = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+        t0 = time.perf_counter()
+        model.model(blank, verbose=False)
+        return time.perf_counter() - t0
+
+    def _load(self, key, path, backend, int8, warmup):
+        from ultralytics import YOLO
+
+        t0 = time.perf_counter()
+        artifact = export_model(path, backend, int8, self.warmup_size, config.YOLO_INT8_DATA)
+        export_sec = time.perf_counter() - t0
+
+        print("YOLO 모델 로딩:", artifact)
+        t0 = time.perf_counter()
+        model = SharedModel(YOLO(str(artifact), task="detect"), str(artifact))
+        load_sec = time.perf_counter() - t0
+
+        warmup_sec = self._warmup(model) if warmup else None
+
+        self.metrics[key] = {
+            "backend": backend,
+            "int8": int8,
+            "artifact": str(artifact),
+            "export_sec": round(export_sec, 3),
+            "load_sec": round(load_sec, 3),
+            "first_infer_sec": round(warmup_sec, 3) if warmup_sec is not None else None,
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        print(f"✅ 모델 준비 완료: {key} (로딩 {load_sec:.2f}s, warm-up {warmup_sec or 0:.2f}s)")
+        return model
+
+    def preload(self, paths, backend="torch", int8=False, warmup=None):
+        for path in paths:
+            self.get(path, backend, int8, warmup)
+
+    def warmup_loaded(self):
+        """ 로딩만 하고 warm-up 하지 않은 모델들을 지금 warm-up (fork 된 워커에서 호출) """
+        if not self.warmup:
+            return
+        for key, model in list(self.models.items()):
+            if self.metrics[key]["first_infer_sec"] is None:
+                sec = self._warmup(model)
+                self.metrics[key]["first_infer_sec"] = round(sec, 3)
+                print(f"🔥 warm-up ({os.getpid()}): {key} {sec:.2f}s")
+
+    def stats(self):
+        out = {}
+        for key, metrics in self.metrics.items():
+            model = self.models.get(key)
+            out[key] = dict(metrics)
+            if model:
+                out[key]["calls"] = model.calls
+                out[key]["infer_sec"] = round(model.infer_sec, 3)
+        return out
+
+
+def memory_stats():
+    """
+    이 프로세스 메모리 (MB, Linux /proc/self/smaps_rollup).
+    preload 효과 확인용: 워커의 shared (master 와 copy-on-write 공유) 가 가중치 크기만큼 크고
+    private 가 그만큼 작으면 공유되고 있는 것 / 없으면 {}
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    out = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    kb = int(rest.split()[0])
+                    out[fields[name]] = out.get(fields[name], 0) + kb
+    except (OSError, ValueError, IndexError):
+        return {}
+    return {k: round(v / 1024, 1) for k, v in out.items()}
+
+
+registry = ModelRegistry(warmup=config.MODEL_WARMUP)
+
+
+def get_model(model_path, backend="torch", int8=False):
+    return registry.get(model_path, backend, int8)
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import config
+from services.r2_service import s3, R2_BUCKET
+from services.r2_index_service import r2_index
+
+_STALE = object()
+
+
+class R2Cache:
+    """
+    R2 객체 로컬 디스크 캐시 (키 + ETag 기준).
+    - 파일명 = sha1(key) + ETag → 같은 키라도 내용이 바뀌면 다른 파일
+    - 완성된 파일만 rename 으로 넣기 때문에 읽는 쪽은 lock 없이 바로 열면 됨
+    - 같은 객체를 동시에 요청하면 다운로드는 1번 (프로세스 안: Event, 프로세스 간: 파일 lock)
+    - 전체 크기가 max_bytes 를 넘으면 가장 오래 안 쓴 파일부터 삭제 (mtime = 마지막 사용 시각)
+    - 쓰는 쪽은 lease(key) / acquire(key) 로 항목 lock 파일에 공유 lock 을 잡고 있음
+      → 정리할 때 lock 을 못 잡는 (쓰는 중인) 항목은 건너뜀
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.lock = threading.Lock()
+        self.inflight = {}      # 파일명 → threading.Event
+        self.counters = {"hits": 0, "misses": 0, "bytes_saved": 0, "bytes_downloaded": 0, "evictions": 0}
+
+    def _entry(self, key, etag):
+        ext = os.path.splitext(key)[1]
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        return self.root / f"{digest}_{etag}{ext}"
+
+    def _count(self, **deltas):
+        with self.lock:
+            for k, v in deltas.items():
+                self.counters[k] += v
+
+    def acquire(self, key):
+        """
+        (로컬 캐시 경로, lease) / 실패 시 (None, None).
+        lease.close() 전까지는 LRU 정리에서 지워지지 않음 (돌려받은 파일은 지우지 말 것)
+        크기 / ETag 는 R2 객체 인덱스에서 (요청마다 head_object 하지 않음)
+        """
+        for _ in range(2):
+            head = r2_index.head(key)
+            if head is None:
+                print("❌ R2 객체 없음:", key)
+                return None, None
+            result = self._acquire(key, head)
+            if result is not _STALE:
+                return result
+            # 인덱스의 ETag 가 오래됨 (다른 곳에서 덮어씀) → 다시 읽은 목록으로 한 번 더
+            r2_index.invalidate()
+        return None, None
+
+    def _acquire(self, key, head):
+        size = head["size"]
+        path = self._entry(key, head["etag"].replace("-", "_"))
+        downloaded = False
+
+        while True:
+            if path.exists():
+                lease = self._file_lock(path, shared=True)
+                # lock 을 잡기 직전에 정리됐을 수 있음 → 다시 받기
+                if path.exists():
+                    os.utime(path)      # LRU: 마지막 사용 시각 갱신
+                    if not downloaded:
+                        self._count(hits=1, bytes_saved=size)
+                    return path, _Lease(lease)
+                if lease:
+                    lease.close()
+
+            with self.lock:
+                event = self.inflight.get(path.name)
+                leader = event is None
+                if leader:
+                    event = self.inflight[path.name] = threading.Event()
+
+            if not leader:
+                # 다른 스레드가 받는 중 → 끝나면 다시 확인 (실패했으면 이번엔 직접 받음)
+                event.wait()
+                continue
+
+            try:
+                result = self._download(key, path, size, head["etag"])
+                if result is None:
+                    return None, None
+                if result is _STALE:
+                    return _STALE
+                downloaded = True
+            finally:
+                with self.lock:
+                    self.inflight.pop(path.name, None)
+                event.set()
+            # 받은 파일도 위에서 공유 lock 을 잡고 돌려줌
+
+    @contextmanager
+    def lease(self, key):
+        """ with r2_cache.lease(key) as path: ... (path 는 실패 시 None) """
+        path, lease = self.acquire(key)
+        try:
+            yield path
+        finally:
+            if lease:
+                lease.close()
+
+    def _download(self, key, path, size, etag):
+        """ 경로 / 실패 시 None / R2 의 ETag 가 etag 와 다르면 _STALE (다른 내용을 이 파일명으로 저장하지 않게) """
+        lock = self._file_lock(path)
+        try:
+            # 다른 프로세스가 lock 을 잡고 먼저 받았을 수 있음
+            if path.exists():
+                return path
+
+            self._evict(size)
+
+            tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+            t0 = time.time()
+            try:
+                # IfMatch: 인덱스의 ETag 와 같은 내용만 받음 (download_file 은 IfMatch 를 못 넘김)
+                body = s3.get_object(Bucket=R2_BUCKET, Key=key, IfMatch=etag)["Body"]
+                try:
+                    with open(tmp, "wb") as f:
+                        for chunk in body.iter_chunks(chunk_size=1024 * 1024):
+                            f.write(chunk)
+                finally:
+                    body.close()
+                os.replace(tmp, path)
+            except Exception as e:
+                tmp.unlink(missing_ok=True)
+                code = getattr(e, "response", {}).get("Error", {}).get("Code")
+                if code in ("PreconditionFailed", "412"):
+                    print("⚠ R2 객체가 바뀜 → 인덱스 갱신:", key)
+                    return _STALE
+                print("❌ R2 캐시 다운로드 실패:", key, e)
+                return None
+
+            self._count(misses=1, bytes_downloaded=size)
+            print(f"📥 R2 캐시 저장: {key} ({size / 1e6:.1f}MB, {time.time() - t0:.1f}s)")
+            return path
+        finally:
+            if lock:
+                lock.close()
+
+    def _file_lock(self, path, shared=False, wait=True):
+        """ 항목별 lock 파일 flock → 파일 객체 / fcntl 이 없으면 (Windows) None / wait=False 인데 사용 중이면 False """
+        try:
+            import fcntl
+        except ImportError:
+            return None
+        f = open(path.with_name(f".{path.name}.lock"), "a")
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not wait:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(f, flags)
+        except BlockingIOError:
+            f.close()
+            return False
+        return f
+
+    def _evict(self, incoming):
+        """ incoming 바이트를 넣어도 max_bytes 이하가 되도록 오래된 파일 삭제 """
+        entries = []
+        for p in self.root.iterdir():
+            if p.name.startswith("."):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+
+        total = sum(size for _, size, _ in entries) + incoming
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            lock = self._file_lock(p, wait=False)
+            if lock is False:
+                continue        # 누가 쓰는 중 (lease) → 건너뜀
+            try:
+                p.unlink()
+                (p.with_name(f".{p.name}.lock")).unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+            finally:
+                if lock:
+                    lock.close()
+            total -= size
+            self._count(evictions=1)
+
+    def stats(self):
+        with self.lock:
+            out = dict(self.counters)
+        out["max_bytes"] = self.max_bytes
+        out["bytes_on_disk"] = 0
+        for p in self.root.iterdir():
+            if p.name.startswith("."):
+                continue
+            try:
+                out["bytes_on_disk"] += p.stat().st_size
+            except FileNotFoundError:
+                pass
+        return out
+
+
+class _Lease:
+    """ acquire() 가 돌려주는 공유 lock (close() 로 해제, fcntl 이 없으면 아무것도 안 함) """
+
+    def __init__(self, lock_file):
+        self.lock_file = lock_file
+
+    def close(self):
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+r2_cache = R2Cache(config.R2_CACHE_DIR, int(config.R2_CACHE_MAX_GB * 1024 ** 3))
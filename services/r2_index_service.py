@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+
+import config
+from services.r2_service import s3, R2_BUCKET, r2_list_objects
+
+
+class R2ObjectIndex:
+    """
+    R2 버킷 객체 목록 메모리 캐시 (key → size / ETag / last_modified).
+    - list_objects_v2 를 페이지 끝까지 (1000개 넘어도) 읽어서 ttl 초 동안 재사용
+    - 우리 쪽 업로드 / 삭제 (r2_upload_file, r2_delete ...) 는 invalidate() → 다음 조회 때 다시 읽음
+    - 같은 서버의 다른 프로세스 (작업 워커 등) 에 알리기 위해 stamp 파일 mtime 도 갱신
+    - 목록에 없는 키는 head_object 로 한 번 더 확인 (다른 곳에서 방금 올린 파일)
+      그래도 없으면 (404) ttl 초 동안 "없음" 으로 기억 → 없는 키를 반복 요청해도 head_object 는 1번
+    - exclude_prefixes (HLS 세그먼트 / 분석용 프록시) 는 목록에서 빼고 실제로 조회된 키만 head_object 로 채움
+    """
+
+    def __init__(self, ttl, stamp_path, exclude_prefixes=()):
+        self.ttl = ttl
+        self.stamp_path = stamp_path
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+        self.lock = threading.Lock()
+        self.entries = None     # key → {"size", "etag", "last_modified"}
+        self.loaded_at = 0.0
+        self.loaded_stamp = None
+        self.missing = {}       # 없는 key → 확인한 시각
+        self.counters = {"hits": 0, "misses": 0, "lists": 0, "heads": 0, "negative_hits": 0}
+
+    def _stamp(self):
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _fresh(self):
+        return (
+            self.entries is not None
+            and time.time() - self.loaded_at < self.ttl
+            and self._stamp() == self.loaded_stamp
+        )
+
+    def _load(self):
+        """ 만료됐으면 다시 목록 조회 (동시에 여러 요청이 와도 1번만) """
+        if self._fresh():
+            return self.entries
+
+        with self.lock:
+            if self._fresh():
+                return self.entries
+
+            stamp = self._stamp()
+            try:
+                objects = r2_list_objects()
+            except Exception as e:
+                print("❌ R2 목록 조회 실패:", e)
+                # 실패하면 예전 목록이라도 사용
+                return self.entries or {}
+
+            self.entries = {
+                obj["Key"]: {
+                    "size": obj["Size"],
+                    "etag": obj["ETag"].strip('"'),
+                    "last_modified": obj["LastModified"],
+                }
+                for obj in objects
+                if not (self.exclude_prefixes and obj["Key"].startswith(self.exclude_prefixes))
+            }
+            self.missing = {}
+            self.loaded_at = time.time()
+            self.loaded_stamp = stamp
+            self.counters["lists"] += 1
+            return self.entries
+
+    def keys(self):
+        return list(self._load().keys())
+
+    def head(self, key):
+        """ {"size", "etag", "last_modified"} / 없으면 None """
+        entry = self._load().get(key)
+        if entry:
+            self.counters["hits"] += 1
+            return entry
+
+        checked = self.missing.get(key)
+        if checked is not None and time.time() - checked < self.ttl:
+            self.counters["negative_hits"] += 1
+            return None
+
+        self.counters["misses"] += 1
+        try:
+            head = s3.head_object(Bucket=R2_BUCKET, Key=key)
+        except s3.exceptions.ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("404", "NoSuchKey", "NotFound"):
+                with self.lock:
+                    if len(self.missing) > 10000:
+                        self.missing.clear()
+                    self.missing[key] = time.time()
+            return None
+        except Exception:
+            return None
+        finally:
+            self.counters["heads"] += 1
+
+        entry = {
+            "size": head["ContentLength"],
+            "etag": head["ETag"].strip('"'),
+            "last_modified": head["LastModified"],
+        }
+        with self.lock:
+            if self.entries is not None:
+                self.entries[key] = entry
+        return entry
+
+    def exists(self, key):
+        return self.head(key) is not None
+
+    def invalidate(self):
+        with self.lock:
+            self.entries = None
+            self.missing = {}
+        try:
+            self.stamp_path.parent.mkdir(parents=True, exist_ok=True)
+            self.stamp_path.touch()
+        except OSError as e:
+            print("⚠ R2 인덱스 stamp 갱신 실패:", e)
+
+    def stats(self):
+        with self.lock:
+            out = dict(self.counters)
+            out["objects"] = len(self.entries) if self.entries is not None else None
+            out["missing"] = len(self.missing)
+            out["age_sec"] = round(time.time() - self.loaded_at, 1) if self.entries is not None else None
+        out["ttl"] = self.ttl
+        return out
+
+
+r2_index = R2ObjectIndex(config.R2_INDEX_TTL, config.R2_INDEX_STAMP,
+                         exclude_prefixes=(config.PROXY_PREFIX, config.HLS_PREFIX))
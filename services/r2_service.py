@@ -1,125 +1,80 @@
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 import os
-import uuid
-from flask import Response
 from pathlib import Path
-import tempfile
-import mimetypes
+import config
 
 # R2 API 환경변수
 R2_ACCESS_KEY = os.getenv("R2_ACCESS_KEY")
 R2_SECRET_KEY = os.getenv("R2_SECRET_KEY")
 
-# Cloudflare R2 S3 Endpoint
-R2_ENDPOINT = "https://bf1e90f22c8c93d804483db67dd5b40a.r2.cloudflarestorage.com"
+# Cloudflare R2 S3 Endpoint (R2_ENDPOINT 로 바꾸면 로컬 S3 호환 서버 - minio / moto 등 - 로 테스트 가능)
+R2_ENDPOINT = os.getenv("R2_ENDPOINT", "https://bf1e90f22c8c93d804483db67dd5b40a.r2.cloudflarestorage.com")
 
 # 버킷명
-R2_BUCKET = "basket"
+R2_BUCKET = os.getenv("R2_BUCKET_NAME", "basket")
 
-# boto3 클라이언트
+# boto3 클라이언트 (스레드 공용)
+# - 기본 연결 풀 10개는 gunicorn 스레드 수보다 작아서 스트리밍 요청이 몰리면 매번 새 TLS 연결
+#   → R2_MAX_POOL 만큼 keep-alive 연결을 재사용
 s3 = boto3.client(
     "s3",
     endpoint_url=R2_ENDPOINT,
     aws_access_key_id=R2_ACCESS_KEY,
     aws_secret_access_key=R2_SECRET_KEY,
+    region_name=os.getenv("R2_REGION", "auto"),
+    config=Config(
+        signature_version="s3v4",   # R2 는 SigV4 서명 URL 만 받음
+        max_pool_connections=config.R2_MAX_POOL,
+        tcp_keepalive=True,
+        connect_timeout=5,
+        read_timeout=60,
+        retries={"max_attempts": 3, "mode": "standard"},
+    ),
 )
 
-# -----------------------------------------
-# 🔥 1) R2 → temp 파일 다운로드
-# -----------------------------------------
-def download_to_path(key: str, dest_path: Path):
-    """
-    Cloudflare R2 파일을 dest_path 로 다운로드
-    """
-    try:
-        s3.download_file(R2_BUCKET, key, str(dest_path))
-        return True
-    except Exception as e:
-        print("❌ download_to_path ERROR:", e)
-        return False
-
+# 파일 업로드: 8MB 넘으면 multipart, 파트 여러 개를 동시에 전송
+# (파일에서 파트 단위로 읽으므로 메모리 ≈ 파트 크기 × 동시 전송 수)
+UPLOAD_TRANSFER = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=int(os.getenv("R2_UPLOAD_PART_MB", "16")) * 1024 * 1024,
+    max_concurrency=int(os.getenv("R2_UPLOAD_CONCURRENCY", "8")),
+)
 
 # -----------------------------------------
-# 🔥 2) R2 → 임시 파일 다운로드 (basket.py에서 사용)
+# 🔥 1) 서명된 GET URL (다운로드 없이 ffmpeg / 브라우저가 직접 Range 요청)
 # -----------------------------------------
-def r2_download_temp_frame(video_name: str):
-    try:
-        ext = os.path.splitext(video_name)[1]
-        tmp_path = Path(tempfile.gettempdir()) / f"{uuid.uuid4().hex}{ext}"
-
-        s3.download_file(R2_BUCKET, video_name, str(tmp_path))
-        return tmp_path
-    except Exception as e:
-        print("❌ r2_download_temp_frame ERROR:", e)
-        return None
+def r2_presigned_url(key: str, expires: int = 3600):
+    return s3.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": R2_BUCKET, "Key": key},
+        ExpiresIn=expires,
+    )
 
 
 # -----------------------------------------
-# 🔥 3) R2 영상 스트리밍 (Range 지원)
+# 🔥 2) 업로드용 R2 파일 업로드
 # -----------------------------------------
-def r2_stream_video(filename, request):
-    try:
-        obj = s3.head_object(Bucket=R2_BUCKET, Key=filename)
-        file_size = obj["ContentLength"]
-
-        mime = mimetypes.guess_type(filename)[0] or "video/mp4"
-        range_header = request.headers.get("Range")
-
-        # ---- Range 요청 ----
-        if range_header:
-            byte1, byte2 = 0, None
-            parts = range_header.replace("bytes=", "").split("-")
-            if parts[0]:
-                byte1 = int(parts[0])
-            if len(parts) > 1 and parts[1]:
-                byte2 = int(parts[1])
-
-            byte2 = byte2 or (file_size - 1)
-            length = byte2 - byte1 + 1
-
-            resp = s3.get_object(
-                Bucket=R2_BUCKET,
-                Key=filename,
-                Range=f"bytes={byte1}-{byte2}",
-            )
-
-            def stream():
-                yield from resp["Body"].iter_chunks()
-
-            r = Response(stream(), status=206, mimetype=mime)
-            r.headers.add("Content-Range", f"bytes {byte1}-{byte2}/{file_size}")
-            r.headers.add("Accept-Ranges", "bytes")
-            r.headers.add("Content-Length", str(length))
-            return r
-
-        # ---- 전체 다운로드 ----
-        resp = s3.get_object(Bucket=R2_BUCKET, Key=filename)
-
-        def full_stream():
-            yield from resp["Body"].iter_chunks()
-
-        r = Response(full_stream(), mimetype=mime)
-        r.headers.add("Content-Length", str(file_size))
-        return r
 
-    except Exception as e:
-        print("❌ r2_stream_video ERROR:", e)
-        return None
-
-# -----------------------------------------
-# 🔥 3) 업로드용 R2 파일 업로드
-# -----------------------------------------
-
-def r2_upload_file(local_path: Path, r2_filename: str):
+def r2_upload_file(local_path: Path, r2_filename: str, callback=None, content_type=None, invalidate=True):
     """
     로컬 파일 local_path → R2 bucket/basket/r2_filename 로 업로드
+    (큰 파일은 multipart 병렬 업로드, callback(보낸 바이트) 로 진행률 전달)
+    invalidate=False : 객체 인덱스 갱신은 호출한 쪽이 다 올린 뒤 1번 (HLS 세그먼트 일괄 업로드 등)
     """
     try:
+        extra = {"ContentType": content_type} if content_type else None
         s3.upload_file(
             Filename=str(local_path),
             Bucket=R2_BUCKET,
-            Key=r2_filename
+            Key=r2_filename,
+            ExtraArgs=extra,
+            Callback=callback,
+            Config=UPLOAD_TRANSFER,
         )
+        if invalidate:
+            _invalidate_index()
         return True
     except Exception as e:
         print("❌ r2_upload_file ERROR:", e)
@@ -127,7 +82,7 @@ def r2_upload_file(local_path: Path, r2_filename: str):
 
 
 # -----------------------------------------
-# 🔥 4) 메모리 파일 업로드 (Flask FileStorage 직접 업로드)
+# 🔥 3) 메모리 파일 업로드 (Flask FileStorage 직접 업로드)
 # -----------------------------------------
 
 def r2_upload_bytes(filename, data):
@@ -142,20 +97,69 @@ def r2_upload_bytes(filename, data):
             Body=data,
             ContentType="video/mp4"
         )
+        _invalidate_index()
     except Exception as e:
         print("❌ r2_upload_bytes ERROR:", e)
 
 
 # -----------------------------------------
-# 🔥 5) R2 파일 리스트 조회
+# 🔥 3-1) 삭제
 # -----------------------------------------
 
-def r2_list_videos():
+def r2_delete(key):
+    """ 삭제 성공 여부 (객체 인덱스도 갱신) """
+    try:
+        s3.delete_object(Bucket=R2_BUCKET, Key=key)
+        return True
+    except Exception as e:
+        print("❌ r2_delete ERROR:", key, e)
+        return False
+    finally:
+        _invalidate_index()
+
+
+def r2_delete_prefix(prefix):
+    """ prefix 아래 객체 전부 삭제 (HLS 세그먼트 등, 1000개 단위 일괄 삭제) → 삭제한 개수 """
+    deleted = 0
     try:
-        resp = s3.list_objects_v2(Bucket=R2_BUCKET)
-        items = resp.get("Contents", [])
-        return [obj["Key"] for obj in items if obj["Key"].lower().endswith((".mp4", ".mov", ".avi", ".mkv"))]
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=R2_BUCKET, Prefix=prefix):
+            keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if keys:
+                s3.delete_objects(Bucket=R2_BUCKET, Delete={"Objects": keys, "Quiet": True})
+                deleted += len(keys)
     except Exception as e:
-        print("❌ r2_list_videos ERROR:", e)
-        return []
+        print("❌ r2_delete_prefix ERROR:", prefix, e)
+    finally:
+        if deleted:
+            _invalidate_index()
+    return deleted
+
+
+def _invalidate_index():
+    from services.r2_index_service import r2_index
+    r2_index.invalidate()
+
+
+# -----------------------------------------
+# 🔥 4) R2 파일 리스트 조회
+# -----------------------------------------
+
+def r2_list_objects():
+    """ 버킷 전체 객체 (1000개 단위 페이지를 끝까지) → [{Key, Size, ETag, LastModified}] / 실패 시 예외 """
+    objects = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=R2_BUCKET):
+        objects.extend(page.get("Contents", []))
+    return objects
+
+
+def r2_list_videos():
+    """ 영상 파일 키 목록 (R2 객체 인덱스 캐시에서, services/r2_index_service.py) """
+    from services.r2_index_service import r2_index
+
+    # 분석용 프록시 (PROXY_PREFIX) / HLS 파일 (HLS_PREFIX) 은 목록에서 제외
+    return [
+        key for key in r2_index.keys()
+        if key.lower().endswith((".mp4", ".mov", ".avi", ".mkv"))
+        and not key.startswith((config.PROXY_PREFIX, config.HLS_PREFIX))
+    ]
 
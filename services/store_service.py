@@ -1,23 +1,143 @@
-import json, os
+import json, os, shutil, sqlite3, threading
+import config
+from services.frame_store_service import save_frames, delete_frames
 
-STORE_PATH = "utils/analysis_store.json"
+# 분석 결과 저장소 (SQLite)
+# - 예전 utils/analysis_store.json 은 처음 열 때 한 번만 옮기고 .migrated 로 이름 변경
+# - 프레임별 검출 결과는 npz 파일 (frames_ref) 로 따로 저장
+DB_PATH = config.ANALYSIS_DB_PATH
+LEGACY_STORE_PATH = config.ANALYSIS_STORE_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    id          TEXT NOT NULL UNIQUE,
+    video       TEXT,
+    created     TEXT,
+    fps         REAL,
+    clips       TEXT NOT NULL DEFAULT '[]',
+    stats       TEXT,
+    frames_ref  TEXT,
+    frame_count INTEGER,
+    extra       TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_video ON analyses (video);
+"""
+
+COLUMNS = ("id", "video", "created", "fps", "clips", "stats", "frames_ref", "frame_count")
+SUMMARY = "id, video, created, fps, clips, frame_count"
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+def _conn():
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(DB_PATH), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        _local.conn = conn
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.executescript(SCHEMA)
+                _migrate_json(conn)
+                _initialized = True
+    return conn
+
+def _migrate_json(conn):
+    """ 예전 JSON 리스트 → SQLite (1회) """
+    if not LEGACY_STORE_PATH.exists():
+        return
+    try:
+        with open(LEGACY_STORE_PATH, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except Exception as e:
+        print("⚠ analysis_store.json 읽기 실패, 옮기지 않음:", e)
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for item in items:
+            _insert(conn, item, ignore_existing=True)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    try:
+        os.replace(LEGACY_STORE_PATH, LEGACY_STORE_PATH.with_suffix(".json.migrated"))
+    except FileNotFoundError:
+        return    # 다른 프로세스가 먼저 옮김 (INSERT OR IGNORE 라 중복 없음)
+    print(f"📦 analysis_store.json → SQLite 이전 완료 ({len(items)}건)")
+
+def _insert(conn, item, ignore_existing=False):
+    item = dict(item)
+
+    # 프레임별 검출 결과는 npz 파일로 따로 저장하고 레코드에는 참조만 남김
+    frames = item.pop("frames", None)
+    if frames:
+        item["frames_ref"] = save_frames(item["id"], frames)
+        item["frame_count"] = len(frames)
+
+    extra = {k: v for k, v in item.items() if k not in COLUMNS}
+    verb = "INSERT OR IGNORE" if ignore_existing else "INSERT"
+    conn.execute(
+        f"{verb} INTO analyses (id, video, created, fps, clips, stats, frames_ref, frame_count, extra) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            item["id"], item.get("video"), item.get("created"), item.get("fps"),
+            json.dumps(item.get("clips") or [], ensure_ascii=False),
+            json.dumps(item["stats"], ensure_ascii=False) if item.get("stats") is not None else None,
+            item.get("frames_ref"), item.get("frame_count"),
+            json.dumps(extra, ensure_ascii=False),
+        ),
+    )
+
+def _to_item(row):
+    item = dict(row)
+    item.pop("seq", None)
+    item["clips"] = json.loads(item["clips"])
+    if item.get("stats") is not None:
+        item["stats"] = json.loads(item["stats"])
+    extra = item.pop("extra", None)
+    if extra:
+        item.update(json.loads(extra))
+    return {k: v for k, v in item.items() if v is not None}
 
 def load_store():
-    if not os.path.exists(STORE_PATH):
-        return []
-    with open(STORE_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """ 전체 요약 목록 (프레임 데이터 제외, 저장 순서) """
+    rows = _conn().execute(f"SELECT {SUMMARY} FROM analyses ORDER BY seq").fetchall()
+    return [_to_item(r) for r in rows]
 
-def save_store(data):
-    with open(STORE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def list_items(offset=0, limit=50, video=None):
+    """ 요약 목록 한 페이지 (최근 저장 순) → (items, total) """
+    where, args = ("WHERE video = ?", (video,)) if video else ("", ())
+    conn = _conn()
+    total = conn.execute(f"SELECT COUNT(*) FROM analyses {where}", args).fetchone()[0]
+    rows = conn.execute(
+        f"SELECT {SUMMARY} FROM analyses {where} ORDER BY seq DESC LIMIT ? OFFSET ?",
+        (*args, limit, offset),
+    ).fetchall()
+    return [_to_item(r) for r in rows], total
 
 def add_item(item):
-    data = load_store()
-    data.append(item)
-    save_store(data)
+    _insert(_conn(), item)
+
+def get_item(item_id):
+    row = _conn().execute("SELECT * FROM analyses WHERE id = ?", (item_id,)).fetchone()
+    return _to_item(row) if row else None
 
 def delete_item(item_id):
-    data = load_store()
-    data = [d for d in data if d["id"] != item_id]
-    save_store(data)
+    conn = _conn()
+    row = conn.execute("SELECT frames_ref FROM analyses WHERE id = ?", (item_id,)).fetchone()
+    conn.execute("DELETE FROM analyses WHERE id = ?", (item_id,))
+    if row and row["frames_ref"]:
+        delete_frames(row["frames_ref"])
+
+def clear_store():
+    _conn().execute("DELETE FROM analyses")
+    shutil.rmtree(config.FRAMES_STORE_DIR, ignore_errors=True)
@@ -0,0 +1,353 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+
+import config
+from services.r2_service import r2_presigned_url
+from services.r2_index_service import r2_index
+from services.video_meta_service import get_video_meta
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(name):
+    with _locks_guard:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _parse_duration(stderr):
+    m = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", stderr)
+    if not m:
+        return None
+    h, mnt, sec = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(sec)
+
+
+# 영상 끝에 딱 맞춘 t 는 디코딩할 프레임이 없음 → 끝에서 이만큼 앞으로
+_END_MARGIN = 0.5
+
+
+def _clamp_t(t, duration):
+    if not duration:
+        return t
+    return min(t, max(0.0, duration - _END_MARGIN))
+
+
+def _ffmpeg_frame(url, t, out_path):
+    """
+    ffmpeg -ss (입력 앞) → moov + t 직전 키프레임 근처만 Range 로 읽고 1장만 디코딩.
+    return : (status, 영상 길이(초))
+      status : "ok" / "no_frame" (영상은 읽었는데 t 에 프레임 없음) / "unreadable" (URL 을 아예 못 읽음)
+    """
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner",
+        "-ss", f"{t:.3f}",
+        "-i", url,
+        "-frames:v", "1",
+        "-q:v", "2",
+        str(out_path),
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    except OSError as e:
+        # ffmpeg 자체가 없음
+        print("❌ ffmpeg 실행 실패:", e)
+        return "unreadable", None
+    except subprocess.TimeoutExpired:
+        print("❌ ffmpeg 프레임 추출 시간 초과:", f"{t:.3f}s")
+        return "no_frame", None
+    stderr = proc.stderr.decode("utf-8", "ignore")
+    duration = _parse_duration(stderr)
+    if proc.returncode == 0 and out_path.exists() and out_path.stat().st_size > 0:
+        return "ok", duration
+    print("❌ ffmpeg 프레임 추출 실패:", stderr[-300:])
+    # Duration 줄이 없으면 입력을 열지도 못한 것 (서명 URL 접근 실패 / 네트워크)
+    return ("no_frame" if duration is not None else "unreadable"), duration
+
+
+def _opencv_frame(video, t, out_path):
+    """ 서명 URL 을 ffmpeg 으로 못 읽을 때만: R2 캐시 파일 (전체 다운로드) 에서 OpenCV 로 t 초 프레임 """
+    import cv2
+    from services.r2_cache_service import r2_cache
+
+    with r2_cache.lease(video) as local:
+        if not local:
+            return False
+        cap = cv2.VideoCapture(str(local))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+        cap.set(cv2.CAP_PROP_POS_MSEC, _clamp_t(t, duration) * 1000)
+        ok, frame = cap.read()
+        cap.release()
+    if not ok:
+        return False
+    cv2.imwrite(str(out_path), frame, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    return duration
+
+
+def extract_frame(video, t=0.0):
+    """
+    영상 video 의 t 초 프레임 JPEG (영상 + ETag + 시각 별로 캐시).
+    return : {"file", "url", "w", "h", "t", "duration"} / 실패 시 None
+      file / url : static 아래 JPEG 경로 / 브라우저용 URL
+      w, h       : 원본 해상도 (골대 좌표 환산용)
+    t 는 업로드 때 probe 한 영상 길이 안으로 맞춤 (끝을 넘는 t 로 ffmpeg 이 빈 결과를 내지 않게)
+    """
+    import cv2
+
+    head = r2_index.head(video)
+    if head is None:
+        print("❌ R2 영상 없음:", video)
+        return None
+    etag = head["etag"].replace("-", "_")
+    probe = (get_video_meta(video) or {}).get("probe") or {}
+    t = _clamp_t(max(0.0, float(t or 0.0)), probe.get("duration"))
+
+    digest = hashlib.sha1(video.encode("utf-8")).hexdigest()[:20]
+    name = f"{digest}_{etag}_{int(round(t * 1000))}"
+    jpg = config.THUMB_CACHE_DIR / f"{name}.jpg"
+    meta_path = config.THUMB_CACHE_DIR / f"{name}.json"
+
+    with _lock_for(name):
+        if not meta_path.exists():
+            config.THUMB_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = jpg.with_name(f".{name}.{uuid.uuid4().hex}.jpg")
+            try:
+                url = r2_presigned_url(video)
+                status, duration = _ffmpeg_frame(url, t, tmp)
+                if status == "no_frame" and duration and _clamp_t(t, duration) < t:
+                    # probe 메타가 없던 영상: ffmpeg 이 알려준 길이로 맞춰서 1번만 다시
+                    t = _clamp_t(t, duration)
+                    status, duration = _ffmpeg_frame(url, t, tmp)
+                if status == "unreadable":
+                    duration = _opencv_frame(video, t, tmp)
+                elif status != "ok":
+                    return None
+                if duration is False:
+                    return None
+
+                img = cv2.imread(str(tmp))
+                if img is None:
+                    return None
+                h, w = img.shape[:2]
+                os.replace(tmp, jpg)
+            finally:
+                tmp.unlink(missing_ok=True)
+
+            # lock 은 스레드끼리만 → 다른 gunicorn 워커가 반쯤 쓴 파일을 읽지 않도록 임시 파일 + replace
+            meta_tmp = meta_path.with_name(f".{name}.{uuid.uuid4().hex}.json")
+            try:
+                with open(meta_tmp, "w", encoding="utf-8") as f:
+                    json.dump({"w": w, "h": h, "t": t, "duration": duration}, f)
+                os.replace(meta_tmp, meta_path)
+            finally:
+                meta_tmp.unlink(missing_ok=True)
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+    rel = jpg.relative_to(config.BASE_DIR / "static").as_posix()
+    return dict(meta, file=rel, url=f"/static/{rel}")
+
+
+# -----------------------------------------
+# 🔥 타임라인 미리보기 스프라이트 (ffmpeg 1번 → 썸네일 N초 간격, cols x rows 장씩 1장의 JPEG)
+# -----------------------------------------
+def _sprite_dir(video, etag):
+    digest = hashlib.sha1(video.encode("utf-8")).hexdigest()[:20]
+    return config.SPRITE_CACHE_DIR / f"{digest}_{etag.replace('-', '_')}"
+
+
+def _vtt_time(sec):
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+def sprite_vtt(index):
+    """ index.json → WebVTT (cue 마다 "시트 URL#xywh=x,y,w,h", video.js / Plyr 등 썸네일 트랙 형식) """
+    per_sheet = index["cols"] * index["rows"]
+    step, w, h = index["interval"], index["width"], index["height"]
+    lines = ["WEBVTT", ""]
+    for i in range(index["count"]):
+        sheet, cell = divmod(i, per_sheet)
+        row, col = divmod(cell, index["cols"])
+        start = i * step
+        end = min((i + 1) * step, index["duration"] or (i + 1) * step)
+        lines += [
+            f"{_vtt_time(start)} --> {_vtt_time(end)}",
+            f"{index['sheets'][sheet]}#xywh={col * w},{row * h},{w},{h}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _failure_path(out_dir):
+    return out_dir.with_name(f"{out_dir.name}.failed.json")
+
+
+def _record_failure(out_dir, error):
+    """ 생성 실패 기록 (영상 + ETag 별, 실패 횟수 누적) - 다른 프로세스가 반쯤 쓴 파일을 읽지 않게 replace """
+    path = _failure_path(out_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            failures = json.load(f).get("failures", 0)
+    except (OSError, ValueError):
+        failures = 0
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"failures": failures + 1, "error": str(error)[-300:], "at": time.time()}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print("⚠ 스프라이트 실패 기록 저장 실패:", e)
+        tmp.unlink(missing_ok=True)
+
+
+def sprite_failure(video):
+    """
+    지금 ETag 의 스프라이트 생성이 SPRITE_MAX_FAILURES 번 이상 실패했고
+    마지막 실패가 SPRITE_RETRY_AFTER_SEC 안이면 {"failures", "error", "at"} / 아니면 None (다시 만들어도 됨)
+    """
+    head = r2_index.head(video)
+    if head is None:
+        return None
+    try:
+        with open(_failure_path(_sprite_dir(video, head["etag"])), "r", encoding="utf-8") as f:
+            failure = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if failure.get("failures", 0) < config.SPRITE_MAX_FAILURES:
+        return None
+    if time.time() - failure.get("at", 0) > config.SPRITE_RETRY_AFTER_SEC:
+        return None
+    return failure
+
+
+def load_sprites(video):
+    """ 지금 ETag 기준으로 만들어 둔 스프라이트 index dict / 없으면 None """
+    head = r2_index.head(video)
+    if head is None:
+        return None
+    index_path = _sprite_dir(video, head["etag"]) / "index.json"
+    if not index_path.exists():
+        return None
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_sprites(video, progress=None):
+    """
+    영상 video → 스프라이트 시트 JPEG 들 + index.json (영상 + ETag 별 캐시, 이미 있으면 그대로).
+    - 분석용 프록시가 있으면 프록시로 (저해상도라 디코딩이 훨씬 빠름)
+    - 서명 URL 을 ffmpeg 이 직접 읽음 (다운로드 없음)
+    return : {"interval", "width", "height", "cols", "rows", "count", "duration", "sheets": [URL]}
+    실패하면 예외 (작업 큐가 재시도) + 실패 횟수 기록 (sprite_failure)
+    """
+    head = r2_index.head(video)
+    if head is None:
+        raise RuntimeError(f"R2 영상 없음: {video}")
+    out_dir = _sprite_dir(video, head["etag"])
+    index_path = out_dir / "index.json"
+
+    with _lock_for(str(out_dir)):
+        if index_path.exists():
+            with open(index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        meta = get_video_meta(video) or {}
+        proxy = meta.get("proxy")
+        source = proxy["key"] if proxy and r2_index.exists(proxy["key"]) else video
+
+        tmp_dir = out_dir.with_name(f".{out_dir.name}.{uuid.uuid4().hex}")
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            index, sheets = _build_sprite_sheets(video, source, meta, out_dir, tmp_dir, progress)
+        except Exception as e:
+            # 실패 횟수를 남겨서 /sprites 가 같은 영상으로 작업을 계속 다시 걸지 않게
+            _record_failure(out_dir, e)
+            raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        _failure_path(out_dir).unlink(missing_ok=True)
+
+    print(f"🖼 스프라이트 생성: {video} ({index['count']}장, 시트 {len(sheets)}개)")
+    if progress:
+        progress.set(100, "done", video)
+    return index
+
+
+def _build_sprite_sheets(video, source, meta, out_dir, tmp_dir, progress=None):
+    """ ffmpeg 1번 → tmp_dir 에 시트 + index.json + thumbs.vtt → out_dir 로 rename → (index, 시트 경로들) """
+    import cv2
+
+    cols, rows, step = config.SPRITE_COLS, config.SPRITE_ROWS, config.SPRITE_INTERVAL_SEC
+    if progress:
+        progress.set(0, "running", video)
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner",
+        "-i", r2_presigned_url(source),
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", f"fps=1/{step},scale={config.SPRITE_WIDTH}:-2,tile={cols}x{rows}",
+        "-q:v", "5",
+        str(tmp_dir / "sheet_%03d.jpg"),
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=3600)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"스프라이트 ffmpeg 실패: {e}")
+    stderr = proc.stderr.decode("utf-8", "ignore")
+    sheets = sorted(tmp_dir.glob("sheet_*.jpg"))
+    if proc.returncode != 0 or not sheets:
+        raise RuntimeError(f"스프라이트 ffmpeg 실패: {stderr[-300:]}")
+
+    # 썸네일 1장 크기 = 시트 크기 / 칸 수 (세로 크기는 영상 비율에 따라 ffmpeg 이 정함)
+    img = cv2.imread(str(sheets[0]))
+    if img is None:
+        raise RuntimeError("스프라이트 시트 읽기 실패")
+    sheet_h, sheet_w = img.shape[:2]
+
+    duration = (meta.get("probe") or {}).get("duration") or _parse_duration(stderr) or 0
+    capacity = len(sheets) * cols * rows
+    count = min(capacity, max(1, int(-(-duration // step)))) if duration else capacity
+
+    rel = out_dir.relative_to(config.BASE_DIR / "static").as_posix()
+    index = {
+        "interval": step,
+        "width": sheet_w // cols,
+        "height": sheet_h // rows,
+        "cols": cols,
+        "rows": rows,
+        "count": count,
+        "duration": duration,
+        "sheets": [f"/static/{rel}/{p.name}" for p in sheets],
+    }
+    with open(tmp_dir / "thumbs.vtt", "w", encoding="utf-8") as f:
+        f.write(sprite_vtt(index))
+    with open(tmp_dir / "index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    # 다른 프로세스 (작업 워커 / 웹) 가 먼저 만들었으면 그쪽 결과 사용
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        if not (out_dir / "index.json").exists():
+            raise
+    return index, sheets
+
+
+def delete_sprites(video):
+    """ 영상 삭제 시 스프라이트 캐시도 삭제 (ETag 가 달랐던 예전 것까지) """
+    digest = hashlib.sha1(video.encode("utf-8")).hexdigest()[:20]
+    for d in config.SPRITE_CACHE_DIR.glob(f"{digest}_*"):
+        if d.is_dir():
+            shutil.rmtree(d, ignore_errors=True)
+        else:
+            d.unlink(missing_ok=True)     # 실패 기록 (.failed.json)
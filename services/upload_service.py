@@ -0,0 +1,106 @@
+import os
+import threading
+
+import config
+from services.r2_service import r2_upload_file
+from services.video_convert_service import transcode, probe_video, display_size
+from services.video_meta_service import update_video_meta
+from services.hls_service import package_hls, delete_hls
+
+
+def proxy_key(name):
+    """ 분석용 프록시의 R2 키 (원본 옆, 영상 목록에는 안 보이는 prefix) """
+    return f"{config.PROXY_PREFIX}{name}"
+
+
+def _proxy_meta(name, proxy_path, probe):
+    """ 프록시 파일 → {"key", "width", "height", "fps", "scale": [원본/프록시 x, y]} """
+    proxy_probe = probe_video(proxy_path)
+    if not proxy_probe or not probe:
+        return None
+    ow, oh = display_size(probe)
+    pw, ph = display_size(proxy_probe)
+    return {
+        "key": proxy_key(name),
+        "width": pw,
+        "height": ph,
+        "fps": proxy_probe["video"]["fps"],
+        "scale": [round(ow / pw, 6), round(oh / ph, 6)],
+    }
+
+
+def process_upload(tmp_path, name, progress):
+    """
+    업로드 받은 원본 1개 → H.264 변환 (이미 H.264/AAC 면 remux 만) → R2 multipart 업로드 → temp 삭제.
+    ffprobe 결과 / 변환 방식은 영상별 메타로 저장 (video_meta_service)
+    ANALYSIS_PROXY=1 이면 같은 ffmpeg 실행에서 분석용 저해상도 프록시도 만들어 proxy_key(name) 로 업로드
+    HLS_PACKAGE=1 이면 업로드 후 변환본을 HLS 로 패키징 (hls_service, 실패해도 mp4 재생은 가능)
+    progress : load() / set() 을 가진 진행 상태 (JobQueue / ProgressManager 의 job)
+    실패하면 예외 (작업 큐가 재시도, 원본 temp 는 재시도용으로 남겨둠)
+    """
+    if not os.path.exists(tmp_path):
+        raise RuntimeError(f"업로드 원본 파일 없음: {name}")
+
+    progress.set(0, "transcoding", name)
+    want_proxy = f"{os.path.splitext(tmp_path)[0]}_proxy.mp4" if config.ANALYSIS_PROXY else None
+    result = transcode(tmp_path, proxy_path=want_proxy)
+    if not result:
+        raise RuntimeError(f"H.264 변환 실패: {name}")
+    converted_path = result["path"]
+    proxy_path = result["proxy"]
+
+    try:
+        total = max(os.path.getsize(converted_path), 1)
+        if proxy_path:
+            total += os.path.getsize(proxy_path)
+        sent = 0
+        lock = threading.Lock()
+
+        # boto3 가 파트 전송 스레드들에서 호출
+        def on_bytes(n):
+            nonlocal sent
+            with lock:
+                sent += n
+                progress.set(min(99, int(sent * 100 / total)), "uploading", name)
+
+        progress.set(0, "uploading", name)
+        if not r2_upload_file(converted_path, name, callback=on_bytes, content_type="video/mp4"):
+            raise RuntimeError(f"R2 업로드 실패: {name}")
+
+        # 프록시는 없어도 원본으로 분석 가능 → 실패해도 업로드는 성공 처리
+        proxy = None
+        if proxy_path:
+            proxy = _proxy_meta(name, proxy_path, result["probe"])
+            if proxy and not r2_upload_file(proxy_path, proxy["key"], callback=on_bytes,
+                                            content_type="video/mp4"):
+                print("⚠ 분석용 프록시 업로드 실패 (원본으로 분석):", name)
+                proxy = None
+
+        update_video_meta(
+            name,
+            probe=result["probe"],
+            transcode={"mode": result["mode"], "sec": result["sec"],
+                       "size": os.path.getsize(converted_path)},
+            proxy=proxy,
+        )
+
+        hls = None
+        if config.HLS_PACKAGE:
+            hls = package_hls(converted_path, name, result["probe"], progress)
+            if not hls:
+                print("⚠ HLS 패키징 실패 (mp4 로 재생):", name)
+        if not hls:
+            # 같은 이름으로 다시 올린 영상이면 예전 HLS 는 더 이상 맞지 않음
+            delete_hls(name)
+            update_video_meta(name, hls=None)
+    finally:
+        for p in (converted_path, proxy_path):
+            if not p:
+                continue
+            try: os.remove(p)
+            except OSError: pass
+
+    try: os.remove(tmp_path)
+    except OSError: pass
+
+    progress.set(100, "done", name)
@@ -1,28 +1,220 @@
-import subprocess
+import json
 import os
+import subprocess
+import time
 import uuid
 
-def convert_to_h264(input_path):
+import config
+
+# 브라우저 / OpenCV 에서 그대로 재생 가능한 조합 (이러면 재인코딩 없이 remux 만)
+COPY_VIDEO_CODECS = {"h264"}
+COPY_PIX_FMTS = {"yuv420p", "yuvj420p"}
+COPY_AUDIO_CODECS = {"aac"}
+
+
+# -----------------------------------------
+# 🔥 1) ffprobe 로 코덱 / 해상도 확인
+# -----------------------------------------
+def _fps(rate):
+    try:
+        num, den = rate.split("/")
+        return round(int(num) / int(den), 3) if int(den) else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def probe_video(input_path):
     """
-    input_path: 원본 파일 (mp4)
-    return: 변환된 파일 경로(output)
+    return : {"container", "duration", "size", "bit_rate",
+              "video": {"codec", "profile", "pix_fmt", "width", "height", "fps", "bit_rate"},
+              "audio": {"codec", "channels", "sample_rate", "bit_rate"} 또는 None}
+             ffprobe 실패 시 None
     """
-    output_path = input_path.replace(".mp4", f"_h264_{uuid.uuid4().hex}.mp4")
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        input_path,
+    ]
+    try:
+        proc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        raw = json.loads(proc.stdout.decode("utf-8", "ignore"))
+    except Exception as e:
+        print("❌ ffprobe 실패:", e)
+        return None
+
+    fmt = raw.get("format", {})
+    streams = raw.get("streams", [])
+    v = next((s for s in streams if s.get("codec_type") == "video"), None)
+    a = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    if v is None:
+        print("❌ ffprobe: 비디오 스트림 없음", input_path)
+        return None
+
+    def _int(x):
+        try:
+            return int(x)
+        except (TypeError, ValueError):
+            return None
+
+    # 세로 촬영 폰 영상: 저장은 가로, 재생 시 회전 (tags.rotate 또는 display matrix)
+    rotation = _int(v.get("tags", {}).get("rotate"))
+    for side in v.get("side_data_list", []):
+        if "rotation" in side:
+            rotation = _int(side["rotation"])
+
+    return {
+        "container": fmt.get("format_name"),
+        "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+        "size": _int(fmt.get("size")),
+        "bit_rate": _int(fmt.get("bit_rate")),
+        "video": {
+            "codec": v.get("codec_name"),
+            "profile": v.get("profile"),
+            "pix_fmt": v.get("pix_fmt"),
+            "width": v.get("width"),
+            "height": v.get("height"),
+            "fps": _fps(v.get("avg_frame_rate")) or _fps(v.get("r_frame_rate")),
+            "bit_rate": _int(v.get("bit_rate")),
+            "rotation": (rotation or 0) % 360,
+        },
+        "audio": {
+            "codec": a.get("codec_name"),
+            "channels": a.get("channels"),
+            "sample_rate": _int(a.get("sample_rate")),
+            "bit_rate": _int(a.get("bit_rate")),
+        } if a else None,
+    }
+
+
+def display_size(probe):
+    """ 회전을 반영한 화면상 (폭, 높이) - 골대 좌표 / OpenCV 프레임과 같은 기준 """
+    v = probe["video"]
+    if v.get("rotation") in (90, 270):
+        return v["height"], v["width"]
+    return v["width"], v["height"]
+
+
+def needs_proxy(probe):
+    """ 원본이 이미 프록시 해상도 / fps 이하면 프록시를 만들어도 얻는 게 없음 """
+    if not probe:
+        return False
+    _, h = display_size(probe)
+    fps = probe["video"].get("fps") or 0
+    return h > config.PROXY_HEIGHT or (config.PROXY_FPS > 0 and fps > config.PROXY_FPS)
+
 
+def plan_transcode(probe):
+    """
+    probe 결과 → 변환 방식
+      remux : 영상 / 음성 모두 그대로 복사, mp4 + faststart 로 다시 담기만
+      audio : 영상은 복사, 음성만 AAC 로 재인코딩
+      full  : 영상까지 libx264 재인코딩
+    TRANSCODE_MODE=full 이면 항상 full
+    """
+    if config.TRANSCODE_MODE == "full" or not probe:
+        return "full"
+
+    v = probe["video"]
+    if v["codec"] not in COPY_VIDEO_CODECS or v["pix_fmt"] not in COPY_PIX_FMTS:
+        return "full"
+
+    a = probe["audio"]
+    if a and a["codec"] not in COPY_AUDIO_CODECS:
+        return "audio"
+    return "remux"
+
+
+# -----------------------------------------
+# 🔥 2) 변환 (필요한 만큼만)
+# -----------------------------------------
+def _proxy_args(proxy_path):
+    """ 분석용 저해상도 / 고정 fps 프록시 (음성 없음) - 같은 ffmpeg 실행에서 두 번째 출력으로 """
+    vf = f"scale=-2:{config.PROXY_HEIGHT}"
+    if config.PROXY_FPS > 0:
+        vf += f",fps={config.PROXY_FPS}"
+    return [
+        "-map", "0:v:0",
+        "-vf", vf,
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-crf", str(config.PROXY_CRF),
+        "-pix_fmt", "yuv420p",
+        "-threads", str(config.TRANSCODE_THREADS),
+        "-an",
+        "-movflags", "+faststart",
+        proxy_path,
+    ]
+
+
+def _ffmpeg_cmd(input_path, output_path, mode, proxy_path=None):
+    # 데이터 / 자막 트랙 (폰 영상의 tmcd 등) 은 버림 → mp4 로 copy 할 때 실패 방지
     cmd = [
-        "ffmpeg",
+        "ffmpeg", "-y", "-hide_banner",
         "-i", input_path,
-        "-vcodec", "libx264",
-        "-preset", "fast",
-        "-acodec", "aac",
-        "-movflags", "+faststart",
-        "-y",  # 덮어쓰기
-        output_path
+        "-map", "0:v:0", "-map", "0:a:0?",
     ]
+    if mode == "remux":
+        cmd += ["-c", "copy"]
+    elif mode == "audio":
+        cmd += ["-c:v", "copy", "-c:a", "aac", "-b:a", config.TRANSCODE_AUDIO_BITRATE]
+    else:
+        cmd += [
+            "-c:v", "libx264",
+            "-preset", config.TRANSCODE_PRESET,
+            "-crf", str(config.TRANSCODE_CRF),
+            "-pix_fmt", "yuv420p",
+            "-threads", str(config.TRANSCODE_THREADS),
+            "-c:a", "aac", "-b:a", config.TRANSCODE_AUDIO_BITRATE,
+        ]
+    cmd += ["-movflags", "+faststart", output_path]
+    if proxy_path:
+        cmd += _proxy_args(proxy_path)
+    return cmd
 
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return output_path
-    except subprocess.CalledProcessError as e:
-        print("❌ H.264 변환 실패:", e)
+
+def transcode(input_path, proxy_path=None):
+    """
+    input_path : 업로드 원본 (확장자 상관없음)
+    proxy_path : 주면 분석용 프록시도 같이 생성 (원본이 이미 작으면 생략 → "proxy": None)
+    return : {"path", "mode", "probe", "proxy", "sec"} / 실패 시 None
+    copy 로 다시 담기가 실패하면 (타임스탬프 없는 AVI 등) full 로 한 번 더 시도
+    """
+    probe = probe_video(input_path)
+    mode = plan_transcode(probe)
+    if proxy_path and not needs_proxy(probe):
+        proxy_path = None
+
+    base = os.path.splitext(input_path)[0]
+    output_path = f"{base}_h264_{uuid.uuid4().hex}.mp4"
+
+    t0 = time.time()
+    for attempt in ([mode, "full"] if mode != "full" else [mode]):
+        try:
+            subprocess.run(
+                _ffmpeg_cmd(input_path, output_path, attempt, proxy_path),
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+            mode = attempt
+            break
+        except (OSError, subprocess.CalledProcessError) as e:
+            err = getattr(e, "stderr", None) or b""
+            print(f"❌ 변환 실패 ({attempt}):", e, err[-300:].decode("utf-8", "ignore"))
+            for p in (output_path, proxy_path):
+                if p and os.path.exists(p):
+                    os.remove(p)
+    else:
         return None
+
+    sec = round(time.time() - t0, 2)
+    print(f"🎞 변환 완료 ({mode}, {sec}s): {os.path.basename(input_path)}")
+    return {"path": output_path, "mode": mode, "probe": probe, "proxy": proxy_path, "sec": sec}
+
+
+def convert_to_h264(input_path):
+    """
+    input_path: 원본 파일
+    return: 변환된 파일 경로(output) / 실패 시 None
+    """
+    result = transcode(input_path)
+    return result["path"] if result else None
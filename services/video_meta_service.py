@@ -0,0 +1,50 @@
+import json, sqlite3, threading, time
+import config
+
+# 영상별 메타데이터 (업로드 시 ffprobe 결과 / 변환 방식 등) - 분석 결과와 같은 SQLite 파일
+DB_PATH = config.ANALYSIS_DB_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_meta (
+    video   TEXT PRIMARY KEY,
+    meta    TEXT NOT NULL DEFAULT '{}',
+    updated REAL
+);
+"""
+
+_local = threading.local()
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(DB_PATH), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+def get_video_meta(video):
+    """ 저장된 메타 dict (없으면 None) """
+    row = _conn().execute("SELECT meta FROM video_meta WHERE video = ?", (video,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def update_video_meta(video, **fields):
+    """ 기존 메타에 fields 를 덮어써서 저장 → 합쳐진 메타 반환 """
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT meta FROM video_meta WHERE video = ?", (video,)).fetchone()
+        meta = json.loads(row[0]) if row else {}
+        meta.update(fields)
+        conn.execute(
+            "INSERT OR REPLACE INTO video_meta (video, meta, updated) VALUES (?, ?, ?)",
+            (video, json.dumps(meta, ensure_ascii=False), time.time()),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return meta
+
+def delete_video_meta(video):
+    _conn().execute("DELETE FROM video_meta WHERE video = ?", (video,))
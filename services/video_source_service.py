@@ -0,0 +1,109 @@
+import os
+import time
+
+import config
+from services.r2_cache_service import r2_cache
+from services.r2_service import r2_presigned_url
+from services.r2_index_service import r2_index
+from services.video_meta_service import get_video_meta
+
+# OpenCV(FFmpeg) 가 http 입력을 읽다가 연결이 끊기면 다시 붙도록
+os.environ.setdefault(
+    "OPENCV_FFMPEG_CAPTURE_OPTIONS",
+    "reconnect;1|reconnect_on_network_error;1|reconnect_delay_max;10",
+)
+
+_stream_supported = False   # 이 프로세스의 OpenCV 가 URL 입력을 연 적이 있으면 더 확인하지 않음
+
+
+def _can_stream(url):
+    global _stream_supported
+    if _stream_supported:
+        return True
+
+    import cv2
+    cap = cv2.VideoCapture(url)
+    _stream_supported = cap.isOpened()
+    cap.release()
+    if not _stream_supported:
+        print("⚠ OpenCV 가 URL 입력을 열지 못함 → 다운로드 방식으로 분석합니다.")
+    return _stream_supported
+
+
+class VideoSource:
+    """
+    분석용 영상 입력 (with 블록 안에서만 유효).
+    - stream   : R2 서명 URL 을 그대로 VideoCapture 에 넘김
+                 → FFmpeg 가 필요한 구간만 Range GET, 첫 바이트부터 디코딩 시작, 디스크 사용 없음
+    - download : 전체 다운로드 후 분석 (R2 로컬 캐시 사용, 같은 영상은 다시 받지 않음)
+
+    업로드 때 만든 분석용 프록시 (저해상도 / 고정 fps) 가 있으면 기본으로 프록시를 읽음.
+
+    path  : VideoCapture 에 넘길 경로 / URL (실패 시 None)
+    scale : 프록시 좌표 → 원본 좌표 배율 (sx, sy), 원본이면 (1.0, 1.0)
+    stats : {"ingest", "ingest_sec", "proxy"} - 분석 통계에 합쳐서 time-to-first-frame 계산
+    """
+
+    def __init__(self, key, mode=None, proxy=None):
+        self.key = key
+        self.mode = mode or config.YOLO_INGEST
+        self.proxy = config.YOLO_USE_PROXY if proxy is None else proxy
+        self.path = None
+        self.scale = (1.0, 1.0)
+        self.stats = {}
+        self._lease = None      # download 모드: 분석이 끝날 때까지 캐시 파일이 정리되지 않도록
+
+    def __enter__(self):
+        t0 = time.perf_counter()
+
+        proxy = (get_video_meta(self.key) or {}).get("proxy") if self.proxy else None
+        if proxy and self._exists(proxy["key"]):
+            mode = self._open(proxy["key"])
+            if self.path:
+                self.scale = tuple(proxy["scale"])
+            else:
+                print("⚠ 분석용 프록시를 열지 못함 → 원본으로 분석:", self.key)
+        if not self.path:
+            proxy = None
+            mode = self._open(self.key)
+
+        self.stats = {
+            "ingest": mode,
+            "ingest_sec": round(time.perf_counter() - t0, 3),
+            "proxy": bool(proxy),
+        }
+        return self
+
+    def _exists(self, key):
+        # 서명 URL 은 객체가 없어도 만들어지므로 프록시는 먼저 확인 (지워졌으면 원본으로)
+        if r2_index.exists(key):
+            return True
+        print("⚠ 분석용 프록시 없음 → 원본으로 분석:", key)
+        return False
+
+    def _open(self, key):
+        """ key → self.path (stream URL / 캐시 파일), 실제로 쓴 방식 반환 """
+        mode = self.mode
+
+        if mode == "stream":
+            try:
+                url = r2_presigned_url(key, config.R2_PRESIGN_EXPIRES)
+                if _can_stream(url):
+                    self.path = url
+                else:
+                    mode = "download"
+            except Exception as e:
+                print("❌ 서명 URL 생성 실패 → 다운로드 방식:", e)
+                mode = "download"
+
+        if mode == "download":
+            cached, self._lease = r2_cache.acquire(key)
+            if cached:
+                self.path = str(cached)
+        return mode
+
+    def __exit__(self, *exc):
+        if self._lease:
+            self._lease.close()
+            self._lease = None
+        return False
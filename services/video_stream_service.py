@@ -0,0 +1,276 @@
+import mimetypes
+import threading
+import time
+import uuid
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from flask import Response
+
+import config
+from services.r2_service import s3, R2_BUCKET, r2_presigned_url
+from services.r2_index_service import r2_index
+
+CHUNK = config.STREAM_CHUNK_KB * 1024
+MAX_RANGES = 16     # 이보다 많은 구간을 요청하면 전체 파일로 응답 (잘게 쪼갠 요청으로 부하 주기 방지)
+
+
+# -----------------------------------------
+# Range 헤더 해석
+# -----------------------------------------
+def parse_range(header, size):
+    """
+    "bytes=0-99,200-" → [(0, 99), (200, size - 1)]
+    return : None = Range 무시 (전체 응답), [] = 만족할 수 있는 구간 없음 (416)
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    ranges = []
+    for part in header[len("bytes="):].split(","):
+        part = part.strip()
+        start, sep, end = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if not start:
+                # suffix: 마지막 n 바이트
+                n = int(end)
+                if n <= 0:
+                    continue
+                ranges.append((max(0, size - n), size - 1))
+                continue
+            start = int(start)
+            end = int(end) if end else None
+        except ValueError:
+            return None
+        if end is not None and start > end:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def _http_date(dt):
+    if not dt or not getattr(dt, "tzinfo", None):
+        return None
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def _parse_date(value):
+    """ HTTP 날짜 → UTC aware datetime ("-0000" 같은 값은 naive 로 나오므로 UTC 로 맞춤) / 잘못된 값이면 None """
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _not_modified(request, etag, last_modified):
+    inm = request.headers.get("If-None-Match")
+    if inm:
+        return inm.strip() == "*" or etag in (t.strip() for t in inm.split(","))
+    ims = _parse_date(request.headers.get("If-Modified-Since"))
+    return bool(ims and last_modified and last_modified.replace(microsecond=0) <= ims)
+
+
+def _if_range_ok(request, etag, last_modified):
+    """ If-Range 가 지금 객체와 맞지 않으면 Range 를 무시하고 전체를 보내야 함 """
+    value = request.headers.get("If-Range")
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith("W/"):
+        return value == etag    # 강한 비교만 허용
+    when = _parse_date(value)
+    return bool(when and last_modified and last_modified.replace(microsecond=0) == when)
+
+
+# -----------------------------------------
+# R2 → 응답 (청크 단위로 바로 전달, 버퍼링 없음)
+# -----------------------------------------
+def _get(key, etag, start=None, end=None):
+    """ get_object Body (ETag 가 바뀌었으면 None → 인덱스 갱신) """
+    params = {"Bucket": R2_BUCKET, "Key": key, "IfMatch": etag.strip('"')}
+    if start is not None:
+        params["Range"] = f"bytes={start}-{end}"
+    try:
+        return s3.get_object(**params)["Body"]
+    except s3.exceptions.ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("PreconditionFailed", "412", "NoSuchKey", "404"):
+            print("⚠ R2 객체가 바뀜 / 없음 → 인덱스 갱신:", key, code)
+            r2_index.invalidate()
+            return None
+        raise
+
+
+def _iter_body(body):
+    # 클라이언트가 중간에 끊어도 (GeneratorExit) 연결을 풀에 돌려주도록 close
+    try:
+        for chunk in body.iter_chunks(chunk_size=CHUNK):
+            yield chunk
+    finally:
+        body.close()
+
+
+_STALE = object()
+
+
+def stream_r2_object(key, request):
+    """
+    R2 객체 key → Flask Response (Range / multi-range / If-Range / If-None-Match 지원).
+    크기 / ETag 는 R2 객체 인덱스 캐시에서 (요청마다 head_object 하지 않음).
+    return : Response / 객체가 없으면 None
+    """
+    resp = _respond(key, request)
+    if resp is _STALE:
+        # 인덱스의 ETag 가 오래됨 (다른 곳에서 덮어씀 / 삭제) → 다시 읽은 목록으로 한 번 더
+        resp = _respond(key, request)
+    return None if resp is _STALE else resp
+
+
+def _respond(key, request):
+    head = r2_index.head(key)
+    if head is None:
+        return None
+
+    size = head["size"]
+    etag = f'"{head["etag"]}"'
+    last_modified = head.get("last_modified")
+    mime = mimetypes.guess_type(key)[0] or "video/mp4"
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={config.VIDEO_CACHE_MAX_AGE}",
+    }
+    if _http_date(last_modified):
+        headers["Last-Modified"] = _http_date(last_modified)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if _if_range_ok(request, etag, last_modified):
+        ranges = parse_range(request.headers.get("Range"), size)
+
+    if ranges == []:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    is_head = request.method == "HEAD"
+
+    # ---- 전체 ----
+    if ranges is None:
+        headers["Content-Length"] = str(size)
+        if is_head:
+            return Response(status=200, headers=headers, mimetype=mime)
+        body = _get(key, etag)
+        if body is None:
+            return _STALE
+        return Response(_iter_body(body), status=200, headers=headers, mimetype=mime,
+                        direct_passthrough=True)
+
+    # ---- 구간 1개 ----
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        if is_head:
+            return Response(status=206, headers=headers, mimetype=mime)
+        body = _get(key, etag, start, end)
+        if body is None:
+            return _STALE
+        return Response(_iter_body(body), status=206, headers=headers, mimetype=mime,
+                        direct_passthrough=True)
+
+    # ---- 여러 구간: multipart/byteranges (구간마다 R2 Range GET) ----
+    #      Content-Length 를 먼저 보내므로 헤더를 내보내기 전에 모든 구간을 열어 둠
+    #      (중간 구간에서 ETag 가 바뀌어 본문이 잘리는 일 없이, 바뀌었으면 처음부터 다시)
+    boundary = uuid.uuid4().hex
+    part_heads = [
+        (f"\r\n--{boundary}\r\nContent-Type: {mime}\r\n"
+         f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode("ascii")
+        for start, end in ranges
+    ]
+    tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+    headers["Content-Length"] = str(
+        sum(len(h) for h in part_heads) + sum(end - start + 1 for start, end in ranges) + len(tail)
+    )
+    content_type = f"multipart/byteranges; boundary={boundary}"
+    if is_head:
+        return Response(status=206, headers=headers, content_type=content_type)
+
+    bodies = []
+    try:
+        for start, end in ranges:
+            body = _get(key, etag, start, end)
+            if body is None:
+                break
+            bodies.append(body)
+    finally:
+        if len(bodies) < len(ranges):
+            for body in bodies:
+                body.close()
+    if len(bodies) < len(ranges):
+        return _STALE
+
+    def parts():
+        try:
+            for part_head, body in zip(part_heads, bodies):
+                yield part_head
+                yield from _iter_body(body)
+            yield tail
+        finally:
+            # 클라이언트가 중간에 끊으면 아직 안 보낸 구간도 닫기
+            for body in bodies:
+                body.close()
+
+    return Response(parts(), status=206, headers=headers, content_type=content_type,
+                    direct_passthrough=True)
+
+
+# -----------------------------------------
+# 재생용 서명 URL (redirect / json 모드)
+# -----------------------------------------
+class SignedUrlCache:
+    """
+    재생용 서명 URL 캐시 (키별).
+    만료까지 margin 초 이상 남았으면 같은 URL 을 다시 줌 → 브라우저가 같은 URL 로 보고 캐시를 재사용
+    """
+
+    def __init__(self, expires, margin):
+        self.expires = expires
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.urls = {}      # key → (url, 만료 시각)
+
+    def get(self, key):
+        """ (url, 남은 유효 시간 초) """
+        now = time.time()
+        with self.lock:
+            hit = self.urls.get(key)
+        if hit and hit[1] - now > self.margin:
+            return hit[0], int(hit[1] - now)
+
+        url = r2_presigned_url(key, self.expires)
+        with self.lock:
+            self.urls[key] = (url, now + self.expires)
+            # 오래된 항목 정리
+            if len(self.urls) > 4096:
+                for k in [k for k, (_, exp) in self.urls.items() if exp - now <= self.margin]:
+                    self.urls.pop(k, None)
+        return url, self.expires
+
+    def forget(self, key):
+        with self.lock:
+            self.urls.pop(key, None)
+
+
+playback_urls = SignedUrlCache(config.VIDEO_URL_EXPIRES, config.VIDEO_URL_MARGIN)
@@ -0,0 +1,389 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from services.store_service import add_item
+
+
+# =========================================================
+# 🔥 워커 프로세스 쪽
+# =========================================================
+class QueueProgress:
+    """
+    워커 프로세스용 progress 대체품.
+    - set()  : 진행률을 부모 프로세스로 전달 (progress.json 은 부모만 씀)
+    - load() : 부모가 중지 Event 를 세우면 stopped 로 보임
+    """
+
+    def __init__(self, msg_q, stop_event):
+        self.msg_q = msg_q
+        self.stop_event = stop_event
+
+    def load(self):
+        if self.stop_event.is_set():
+            return {"status": "stopped"}
+        return {}
+
+    def set(self, percent=None, status=None, video=None, **kwargs):
+        self.msg_q.put((video, percent, status))
+
+
+_highlighter = None
+
+
+def _worker_init(model_path, options, torch_threads, msg_q, stop_event):
+    """ 워커 프로세스당 1번: torch 스레드 수 지정 + 모델 로딩 """
+    global _highlighter
+
+    # torch import 전에 지정해야 OpenMP 스레드 풀에 반영됨
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from services.yolo_service import YoloHighlighter
+    from services.coord_service import BasketCoordService
+
+    _highlighter = YoloHighlighter(
+        model_path,
+        QueueProgress(msg_q, stop_event),
+        BasketCoordService(Path("basket_coords.json")),
+        **options,
+    )
+
+
+def _worker_run(video_name):
+    """ R2 영상 (stream / 다운로드) → 분석 → 결과 item 반환 (저장은 부모가 함) """
+    from services.video_source_service import VideoSource
+
+    with VideoSource(video_name) as source:
+        if not source.path:
+            _highlighter.progress.set(0, "error_download", video_name)
+            return None
+
+        _highlighter.progress.set(0, "running", video_name)
+        return _highlighter.run(source.path, video_name, save=False, ingest=source.stats,
+                                scale=source.scale)
+
+
+def _worker_run_shard(video_path, video_name, first, last, warmup, key, scale=(1.0, 1.0)):
+    """ 한 영상의 first ~ last 프레임 구간만 분석 (영상 경로 / URL 은 부모가 준비한 것을 공유) """
+    return _highlighter.analyze_range(
+        video_path, video_name, first, last, warmup, progress_key=key, scale=scale
+    )
+
+
+def plan_shards(total, shards):
+    """ 전체 프레임을 shards 개의 [first, last] 구간(1부터, 양끝 포함)으로 나눔 """
+    shards = max(1, min(int(shards), total))
+    size = total // shards
+    ranges = []
+    first = 1
+    for i in range(shards):
+        last = total if i == shards - 1 else first + size - 1
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def shard_warmup(fps):
+    """
+    구간 앞쪽 warm-up 프레임 수.
+    Attempt 상태는 마지막 upper_zone 이후 fps * 1.0 프레임까지만 의미가 있고
+    prev_cy 는 직전 1프레임만 보므로, 그 2배를 앞에서부터 다시 읽으면
+    구간 시작 시점의 공 상태가 전체 분석과 같아진다.
+    """
+    return 2 * (int(fps) + 2)
+
+
+# =========================================================
+# 🔥 부모 프로세스 쪽 스케줄러
+# =========================================================
+class YoloPoolScheduler:
+    """
+    여러 영상을 프로세스 풀에서 동시에 분석.
+    - 워커마다 모델은 처음 1번만 로딩 (풀은 분석 요청 사이에도 유지)
+    - 영상별 / 전체 진행률을 progress.json 에 모아서 기록
+    - progress status 가 stopped 가 되면 모든 워커에 중지 전달
+    - shards > 1 이면 영상 1개짜리 요청은 시간 구간으로 나눠 워커들이 나눠서 분석
+    """
+
+    def __init__(self, model_path, options, progress, workers=1, torch_threads=0, shards=0):
+        self.model_path = model_path
+        self.options = options
+        self.progress = progress
+        self.workers = max(1, int(workers))
+        self.torch_threads = int(torch_threads) or max(1, (os.cpu_count() or 1) // self.workers)
+        self.shards = int(shards)
+
+        # torch 가 로딩된 프로세스에서 fork 하면 위험하므로 spawn 사용
+        self.ctx = mp.get_context("spawn")
+        self.msg_q = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.pool = None
+
+        # 워커들이 중지 Event 하나를 공유하므로 분석 요청은 한 번에 하나씩
+        self.run_lock = threading.Lock()
+
+    def _ensure_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self.ctx,
+                initializer=_worker_init,
+                initargs=(self.model_path, self.options, self.torch_threads,
+                          self.msg_q, self.stop_event),
+            )
+        return self.pool
+
+    def _reset_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+    def _drain_messages(self, per_video):
+        while True:
+            try:
+                video, percent, status = self.msg_q.get_nowait()
+            except queue.Empty:
+                return
+            st = per_video.get(video)
+            if st is None or st["status"] in ("done", "stopped"):
+                continue
+            if percent is not None:
+                st["progress"] = percent
+            if status:
+                st["status"] = status
+
+    def _write_progress(self, progress, videos, per_video, status):
+        done = sum(1 for v in videos if per_video[v]["status"] in ("done", "stopped")
+                   or per_video[v]["status"].startswith("error"))
+        overall = int(sum(per_video[v]["progress"] for v in videos) / max(len(videos), 1))
+        running = [v for v in videos if per_video[v]["status"] == "running"]
+
+        progress.set(
+            overall, status,
+            video=running[0] if running else videos[-1],
+            videos=videos,
+            index=done,
+            current_index=done,
+            total=len(videos),
+            per_video=per_video,
+        )
+
+    def _wait_all(self, progress, futures, state, on_result, write_progress):
+        """
+        futures 가 모두 끝날 때까지 대기하면서
+        - 워커 진행률 메시지를 state 에 반영
+        - 중지 요청 시 모든 워커에 전달, 대기 중인 작업 취소
+        return : 중지되었으면 True
+        """
+        pending = set(futures)
+        stopped = False
+        last_write = 0.0
+
+        while pending:
+            done, pending = wait(pending, timeout=0.3, return_when=FIRST_COMPLETED)
+            self._drain_messages(state)
+
+            for fut in done:
+                key = futures[fut]
+                if fut.cancelled():
+                    state[key]["status"] = "stopped"
+                    continue
+                try:
+                    result = fut.result()
+                except BrokenProcessPool as e:
+                    print("❌ 워커 프로세스 비정상 종료:", key, e)
+                    state[key]["status"] = "error_worker"
+                    continue
+                except Exception as e:
+                    print("❌ 분석 실패:", key, e)
+                    state[key]["status"] = "error"
+                    continue
+
+                if result is None:
+                    if not state[key]["status"].startswith("error"):
+                        state[key]["status"] = "error"
+                    continue
+
+                on_result(key, result)
+                state[key]["progress"] = 100
+                state[key]["status"] = "stopped" if stopped else "done"
+
+            if not stopped and progress.is_stopped():
+                print("🔴 사용자 중지 요청 감지: 모든 워커 중단")
+                stopped = True
+                self.stop_event.set()
+                for fut in pending:
+                    fut.cancel()
+
+            # 중지 상태는 덮어쓰지 않음
+            if not stopped and time.time() - last_write >= 0.5:
+                write_progress()
+                last_write = time.time()
+
+        if any(st["status"] == "error_worker" for st in state.values()):
+            self._reset_pool()
+
+        return stopped
+
+    def _submit(self, fn, *args):
+        return self._ensure_pool().submit(fn, *args)
+
+    def run(self, videos, job_id=None):
+        """ 모든 영상이 끝날 때까지 블록 (백그라운드 스레드에서 호출) """
+        with self.run_lock:
+            self._run(videos, self.progress.job(job_id))
+
+    def _run(self, videos, progress):
+        if len(videos) == 1 and self.shards > 1:
+            item = self._run_sharded(videos[0], self.shards, progress)
+            if item is not None:
+                progress.set(100, "done_all", video=videos[0], current_video=videos[0],
+                                  videos=videos, index=1, current_index=1, total=1,
+                                  clips=item["clips"])
+            return
+
+        per_video = {v: {"progress": 0, "status": "queued", "clips": []} for v in videos}
+
+        self.stop_event.clear()
+        try:
+            futures = {self._submit(_worker_run, v): v for v in videos}
+        except Exception as e:
+            print("❌ 프로세스 풀 시작 실패:", e)
+            self._reset_pool()
+            progress.set(0, "error_pool", videos=videos)
+            return
+
+        def on_result(video, item):
+            # 저장은 부모 프로세스 한 곳에서만
+            add_item(item)
+            per_video[video]["clips"] = item["clips"]
+
+        stopped = self._wait_all(
+            progress, futures, per_video, on_result,
+            lambda: self._write_progress(progress, videos, per_video, "multi_running"),
+        )
+        if stopped:
+            return
+
+        last = videos[-1]
+        self._write_progress(progress, videos, per_video, "done_all")
+        progress.set(100, "done_all", video=last, current_video=last,
+                          clips=per_video[last]["clips"])
+
+    # ---------------------------------------------------------
+    # 🔥 영상 1개를 시간 구간으로 나눠 병렬 분석
+    # ---------------------------------------------------------
+    def run_sharded(self, video_name, shards, job_id=None):
+        with self.run_lock:
+            return self._run_sharded(video_name, shards, self.progress.job(job_id))
+
+    def _run_sharded(self, video_name, shards, progress):
+        """
+        R2 영상 1개 (stream URL 또는 1번 받은 파일) 를 shards 개 구간으로 나눠 워커들이 동시에 분석하고
+        frames_info / clips 를 이어붙여 저장.
+        return : 저장된 item (중지 / 실패 시 None)
+        """
+        import cv2
+        from services.video_source_service import VideoSource
+        from services.yolo_service import merge_clips, with_ingest_stats
+
+        progress.set(0, "running", video_name)
+        with VideoSource(video_name) as source:
+            if not source.path:
+                progress.set(0, "error_download", video_name)
+                return None
+
+            cap = cv2.VideoCapture(source.path)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+            if total <= 0:
+                progress.set(0, "error_video_open", video_name)
+                return None
+            if not fps or fps <= 0:
+                fps = 30.0
+
+            ranges = plan_shards(total, shards)
+            warmup = shard_warmup(fps)
+            print(f"🧩 구간 분할 분석: {video_name} → {len(ranges)}개 구간, warm-up {warmup}프레임")
+
+            keys = [f"{video_name}#{i}" for i in range(len(ranges))]
+            per_shard = {k: {"progress": 0, "status": "queued"} for k in keys}
+            results = {}
+
+            self.stop_event.clear()
+            started = time.time()
+            try:
+                futures = {
+                    self._submit(_worker_run_shard, source.path, video_name,
+                                 first, last, warmup, key, source.scale): key
+                    for key, (first, last) in zip(keys, ranges)
+                }
+            except Exception as e:
+                print("❌ 프로세스 풀 시작 실패:", e)
+                self._reset_pool()
+                progress.set(0, "error_pool", video_name)
+                return None
+
+            def write_progress():
+                overall = int(sum(st["progress"] for st in per_shard.values()) / len(per_shard))
+                progress.set(overall, "running", video_name, shards=per_shard)
+
+            def on_result(key, result):
+                results[key] = result
+
+            stopped = self._wait_all(progress, futures, per_shard, on_result, write_progress)
+            if stopped:
+                return None
+            if len(results) != len(keys):
+                progress.set(0, "error", video_name, shards=per_shard)
+                return None
+
+            # 구간 순서대로 이어붙이기 (warm-up 구간은 각 워커에서 이미 제외됨)
+            frames, clips = [], []
+            for key in keys:
+                frames.extend(results[key]["frames"])
+                clips.extend(results[key]["clips"])
+            merged = merge_clips(clips)
+
+            elapsed = max(time.time() - started, 1e-6)
+            decoded = sum(results[k]["stats"]["frames_decoded"] for k in keys)
+            stats = {
+                "frames_decoded": decoded,
+                "frames_inferred": sum(results[k]["stats"]["frames_inferred"] for k in keys),
+                "shards": len(keys),
+                "warmup_frames": warmup,
+                "elapsed_sec": round(elapsed, 2),
+                "effective_fps": round(total / elapsed, 2),
+                "shard_stats": [results[k]["stats"] for k in keys],
+            }
+            # 구간 중 가장 빨리 첫 프레임을 낸 워커 기준
+            firsts = [r["stats"]["first_frame_sec"] for r in results.values() if r["stats"].get("first_frame_sec") is not None]
+            stats["first_frame_sec"] = min(firsts) if firsts else None
+            stats = with_ingest_stats(stats, source.stats)
+            print("YOLO 구간 분할 통계:", video_name, {k: v for k, v in stats.items() if k != "shard_stats"})
+
+            item = {
+                "id": str(uuid.uuid4()),
+                "video": video_name,
+                "fps": fps,
+                "frames": frames,
+                "clips": merged,
+                "stats": stats,
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            add_item(item)
+
+            progress.set(100, "done", video_name, clips=merged, stats=stats, shards=per_shard)
+            print("YOLO 분석 완료:", video_name, merged)
+            return item
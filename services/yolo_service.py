@@ -1,9 +1,12 @@
 import cv2
 import time
-from ultralytics import YOLO
+import queue
+import threading
+from services.model_registry import get_model
 from pathlib import Path
 from services.store_service import add_item
 import uuid
+import config
 
 
 def merge_clips(clips):
@@ -23,174 +26,733 @@ def merge_clips(clips):
     return merged
 
 
-class YoloHighlighter:
-    def __init__(self, model_path, progress, coord_service):
-        model_path = Path(model_path)
-        if not model_path.is_absolute():
-            model_path = Path(__file__).resolve().parent.parent / model_path
+def highlighter_options():
+    """ config 의 YOLO_* 설정 → YoloHighlighter 키워드 인자 """
+    return dict(
+        batch_size=config.YOLO_BATCH_SIZE,
+        stride=config.YOLO_STRIDE,
+        pipeline=config.YOLO_PIPELINE,
+        queue_depth=config.YOLO_QUEUE_DEPTH,
+        resize_width=config.YOLO_DECODE_WIDTH,
+        roi=config.YOLO_ROI,
+        roi_margins=(
+            config.YOLO_ROI_MARGIN_X,
+            config.YOLO_ROI_MARGIN_TOP,
+            config.YOLO_ROI_MARGIN_BOTTOM,
+        ),
+        roi_full_every=config.YOLO_ROI_FULL_EVERY,
+        backend=config.YOLO_BACKEND,
+        int8=config.YOLO_INT8,
+    )
+
+
+def with_ingest_stats(stats, ingest):
+    """ 분석 통계 + 입력 방식 / 다운로드 시간 → time_to_first_frame_sec (요청 ~ 첫 프레임) """
+    if not ingest:
+        return stats
+    stats = dict(stats, **ingest)
+    if stats.get("first_frame_sec") is not None:
+        stats["time_to_first_frame_sec"] = round(ingest["ingest_sec"] + stats["first_frame_sec"], 3)
+    return stats
+
+
+class BallTracker:
+    """
+    공 위치 → Attempt / 득점 판정 상태머신.
+    (기존 run 루프 안에 있던 로직을 그대로 분리한 것)
+    """
+
+    def __init__(self, coords, fps, start_pad, end_pad, record_from=0):
+        """ record_from : 이 프레임 번호 이전의 득점은 clips 에 넣지 않음 (구간 분석 warm-up 용) """
+        if not coords:
+            self.bx1 = self.by1 = self.bx2 = self.by2 = None
+        else:
+            self.bx1, self.by1 = coords["x1"], coords["y1"]
+            self.bx2, self.by2 = coords["x2"], coords["y2"]
+            self.basket_width = self.bx2 - self.bx1
+            self.basket_height = self.by2 - self.by1
+
+        self.fps = fps
+        self.start_pad = start_pad
+        self.end_pad = end_pad
+        self.record_from = record_from
+
+        self.clips = []
+        self.ball_status = None
+        self.ball_status_frame = 0
+        self.prev_cy = None
+
+    def is_near(self, cx, cy):
+        """
+        stride 모드에서 '매 프레임 분석'으로 전환할 범위.
+        upper_zone / lower_zone 을 모두 포함하도록 더 넓게 잡는다.
+        """
+        if self.bx1 is None:
+            return False
+        return (
+            (self.bx1 - 3 * self.basket_width <= cx <= self.bx2 + 3 * self.basket_width)
+            and (cy <= self.by2 + self.basket_height * 2)
+        )
+
+    def update(self, frame_idx, now_sec, ball_found, ball_cx, ball_cy):
+        if not ball_found:
+            self.prev_cy = None
+            return
+
+        if self.bx1 is None:
+            upper_zone = False
+        else:
+            upper_zone = (
+                (self.bx1 - 2 * self.basket_width <= ball_cx <= self.bx2 + 2 * self.basket_width)
+                and (ball_cy <= self.by1)
+            )
+
+        if upper_zone:
+            self.ball_status = "Attempt"
+            self.ball_status_frame = frame_idx
+
+        if self.ball_status == "Attempt":
+            if (frame_idx - self.ball_status_frame) > self.fps * 1.0:
+                self.ball_status = None
+
+        if self.prev_cy is not None and self.ball_status == "Attempt":
 
-        print("YOLO 모델 로딩:", model_path)
-        self.model = YOLO(str(model_path))
+            is_downward = ball_cy > self.prev_cy
+
+            lower_zone = (
+                (self.bx1 - 0.3 * self.basket_width <= ball_cx <= self.bx2 + 0.3 * self.basket_width)
+                and (self.by1 <= ball_cy <= self.by2 + self.basket_height * 1.2)
+            )
+
+            if lower_zone and is_downward:
+                start_t = max(0, now_sec - self.start_pad)
+                end_t = now_sec + self.end_pad
+
+                if frame_idx >= self.record_from:
+                    self.clips.append({
+                        "start": round(start_t, 2),
+                        "end": round(end_t, 2)
+                    })
+
+                self.ball_status = None
+
+        self.prev_cy = ball_cy
+
+
+class FrameReader:
+    """
+    VideoCapture 디코딩 담당.
+    - stride   : dense_until 이후 구간은 k 프레임마다 1장만 retrieve (나머지는 grab)
+    - rewind() : 건너뛴 구간을 다시 매 프레임 분석할 때 사용
+    - resize_width : 지정 시 모델 입력 크기에 맞춰 미리 축소
+    - roi      : 골대 주변 (x1, y1, x2, y2) 영역만 잘라서 추론, full_every 프레임마다 전체 프레임 1장
+    - last_frame : 이 프레임 번호까지만 읽음 (구간 분석용)
+    - scale    : 분석용 프록시를 읽을 때 프록시 → 원본 해상도 배율 (sx, sy)
+
+    read() 는 프레임마다 view = (ox, oy, sx, sy, is_roi) 를 함께 돌려준다.
+    검출 좌표 x → 원본 좌표 ox + x * sx
+    """
+
+    def __init__(self, cap, stride=1, resize_width=None, roi=None, full_every=30, last_frame=None,
+                 scale=(1.0, 1.0)):
+        self.cap = cap
+        self.scale = scale
+        self.last_frame = last_frame
+        self.stride = stride
+        self.resize_width = resize_width
+        self.roi = roi
+        self.full_every = max(1, int(full_every))
+
+        self.frame_idx = 0      # 마지막으로 디코딩한 프레임 번호 (1부터)
+        self.dense_until = 0    # 이 프레임 번호까지는 stride 없이 매 프레임
+        self.last_full = None   # ROI 모드에서 마지막 전체 프레임 번호
+
+        self.decoded = 0
+        self.decode_sec = 0.0
+        self.first_frame_at = None  # 첫 프레임 디코딩 완료 시각 (perf_counter)
+
+    def read(self):
+        """ (frame_idx, frame, sampled, view) 또는 EOF 면 None """
+        t0 = time.perf_counter()
+        try:
+            step = self.stride if self.frame_idx >= self.dense_until else 1
+
+            for _ in range(step - 1):
+                if self._at_end() or not self.cap.grab():
+                    return None
+                self.frame_idx += 1
+                self.decoded += 1
+
+            if self._at_end():
+                return None
+            ok, frame = self.cap.read()
+            if not ok:
+                return None
+            self.frame_idx += 1
+            self.decoded += 1
+            if self.first_frame_at is None:
+                self.first_frame_at = time.perf_counter()
+
+            frame, view = self._view(frame)
+            return self.frame_idx, frame, step > 1, view
+        finally:
+            self.decode_sec += time.perf_counter() - t0
+
+    def _at_end(self):
+        return self.last_frame is not None and self.frame_idx >= self.last_frame
+
+    def _view(self, frame):
+        kx, ky = self.scale
+        if self.roi is not None:
+            if self.last_full is None or self.frame_idx - self.last_full >= self.full_every:
+                self.last_full = self.frame_idx
+            else:
+                x1, y1, x2, y2 = self.roi
+                # numpy slice → 복사 없이 view, 모델 입력 픽셀만 줄어듦
+                return frame[y1:y2, x1:x2], (x1 * kx, y1 * ky, kx, ky, True)
+
+        if self.resize_width and frame.shape[1] > self.resize_width:
+            h, w = frame.shape[:2]
+            new_h = int(round(h * self.resize_width / w))
+            frame = cv2.resize(frame, (self.resize_width, new_h), interpolation=cv2.INTER_AREA)
+            return frame, (0, 0, w / self.resize_width * kx, h / new_h * ky, False)
+
+        return frame, (0, 0, kx, ky, False)
+
+    def rewind(self, frame_idx):
+        """ 다음 read() 가 frame_idx + 1 번 프레임을 돌려주도록 되감기 """
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        self.frame_idx = frame_idx
+
+
+def basket_roi(coords, frame_w, frame_h, margin_x=3.0, margin_top=4.0, margin_bottom=2.0):
+    """
+    골대 박스 주변 crop 영역 (x1, y1, x2, y2).
+    margin 은 모두 골대 폭(basket width) 배수.
+    - 좌우   : upper_zone(±2배) / is_near(±3배) 를 덮도록
+    - 위     : 슛 궤적이 림 위로 올라가는 높이
+    - 아래   : lower_zone(림 아래 1.2 × 높이) 를 덮도록
+    """
+    bw = coords["x2"] - coords["x1"]
+    x1 = int(max(0, coords["x1"] - margin_x * bw))
+    x2 = int(min(frame_w, coords["x2"] + margin_x * bw))
+    y1 = int(max(0, coords["y1"] - margin_top * bw))
+    y2 = int(min(frame_h, coords["y2"] + margin_bottom * bw))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+class FramePostProcessor:
+    """
+    검출 결과 → frames_info 기록 + BallTracker 갱신.
+    stride 로 건너뛴 프레임 근처에서 공이 골대에 접근하면 되감기를 요청한다.
+    """
+
+    def __init__(self, tracker, fps, dense_hold, record_from=0):
+        self.tracker = tracker
+        self.record_from = record_from
+        self.fps = fps
+        self.dense_hold = dense_hold
+
+        self.frames_info = []
+        self.last_done = 0      # 상태머신에 반영된 마지막 프레임 번호
+        self.last_persons = 0   # ROI 프레임은 직전 전체 프레임의 사람 수를 이어서 사용
+        self.dense_until = 0
+        self.post_sec = 0.0
+
+    def feed(self, idx, sampled, det):
+        """ True 를 돌려주면 last_done 다음 프레임부터 다시 분석해야 함 """
+        t0 = time.perf_counter()
+        try:
+            ball_found, ball_cx, ball_cy, person_count = det
+            if person_count is None:
+                person_count = self.last_persons
+            near = ball_found and self.tracker.is_near(ball_cx, ball_cy)
+
+            if sampled and self.last_done < self.dense_until:
+                # 디코더가 (배치 / 파이프라인으로 미리 읽느라) 예전 dense_until 로 건너뛴 프레임
+                # → 그 사이 늘어난 dense 구간 안이므로 이 결과는 버리고 last_done 다음 프레임부터 다시 매 프레임
+                #   (dense 구간이 끝난 뒤의 샘플 위치도 stride=1 / 미리 읽기 없는 경우와 같아짐)
+                return True
+
+            if sampled and near:
+                # 건너뛴 프레임에 골대 접근이 있었을 수 있음
+                self.dense_until = idx + self.dense_hold
+                return True
+
+            if idx >= self.record_from:
+                self.frames_info.append({
+                    "t": round(idx / self.fps, 4),
+                    "ball": {
+                        "found": bool(ball_found),
+                        "cx": ball_cx,
+                        "cy": ball_cy
+                    },
+                    "persons": person_count,
+                })
+
+            self.tracker.update(idx, idx / self.fps, ball_found, ball_cx, ball_cy)
+            self.last_persons = person_count
+
+            if near:
+                self.dense_until = max(self.dense_until, idx + self.dense_hold)
+            self.last_done = idx
+            return False
+        finally:
+            self.post_sec += time.perf_counter() - t0
+
+
+class _PipelineControl:
+    """ 디코더 스레드 ↔ 후처리 스레드 사이의 되감기 / 종료 신호 (+ 단계 스레드에서 난 예외) """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.generation = 0
+        self.rewind_to = None
+        self.stopped = False
+        self.error = None
+
+    def request_rewind(self, frame_idx):
+        with self.cond:
+            self.generation += 1
+            self.rewind_to = frame_idx
+            self.cond.notify_all()
+            return self.generation
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def fail(self, error):
+        """ 단계 스레드 오류 → 전체 중단, 메인 스레드가 스레드 정리 후 다시 raise """
+        with self.cond:
+            if self.error is None:
+                self.error = error
+        self.stop()
+
+
+_EOF = "eof"
+
+
+class YoloHighlighter:
+    def __init__(self, model_path, progress, coord_service, batch_size=1, stride=1,
+                 pipeline=False, queue_depth=16, resize_width=None,
+                 roi=False, roi_margins=(3.0, 4.0, 2.0), roi_full_every=30,
+                 backend="torch", int8=False):
+        """
+        batch_size   : model() 한 번에 넣을 프레임 수
+        stride       : 골대 근처에 공이 없을 때 k 프레임마다 1번만 추론 (1 = 매 프레임)
+        pipeline     : True 면 디코딩 / 추론 / 후처리를 별도 스레드로 겹쳐서 실행
+        queue_depth  : pipeline 모드에서 디코딩된 프레임을 쌓아둘 최대 개수 (메모리 상한)
+        resize_width : 디코딩 단계에서 미리 이 폭으로 축소 (None = 원본 그대로)
+        roi          : True 면 저장된 골대 좌표 주변만 crop 해서 추론
+        roi_margins  : crop 여백 (좌우, 위, 아래) - 골대 폭 배수
+        roi_full_every : ROI 모드에서 사람 수 집계용 전체 프레임 추론 간격 (프레임)
+        backend      : "torch" / "onnx" / "openvino" (onnx, openvino 는 처음 1번 변환 후 캐시)
+        int8         : onnx / openvino 백엔드에서 INT8 양자화 모델 사용
+        """
+        # 같은 프로세스에서는 모델을 1번만 로딩해서 공유 (services/model_registry.py)
+        self.model = get_model(model_path, backend, int8)
 
         self.progress = progress
         self.coord_service = coord_service
 
+        self.batch_size = max(1, int(batch_size))
+        self.stride = max(1, int(stride))
+        self.pipeline = bool(pipeline)
+        self.queue_depth = max(1, int(queue_depth))
+        self.resize_width = int(resize_width) if resize_width else None
+        self.roi = bool(roi)
+        self.roi_margins = tuple(roi_margins)
+        self.roi_full_every = max(1, int(roi_full_every))
+
         self.START_PAD = 5   # -5초
         self.END_PAD = 3     # +3초
 
+    # ---------------------------------------------------------
+    # 검출 결과 → (공 발견 여부, cx, cy, 사람 수)
+    # ---------------------------------------------------------
+    def _parse_result(self, result, view=(0, 0, 1.0, 1.0, False)):
+        ox, oy, sx, sy, is_roi = view
+        ball_found = False
+        ball_cx, ball_cy = None, None
+        person_count = 0
+
+        for box in result.boxes:
+            cls = int(box.cls)
+            label = self.model.names[cls]
+
+            if label == "person":
+                conf = float(box.conf)
+                if conf >= 0.25:
+                    person_count += 1
+                continue
+
+            if label != "ball":
+                continue
+
+            conf = float(box.conf)
+            if conf < 0.25:
+                continue
+
+            # 축소 / crop 된 프레임이면 원본 해상도 좌표로 복원
+            x1, y1, x2, y2 = (
+                int(o + v * k)
+                for v, o, k in zip(box.xyxy[0], (ox, oy, ox, oy), (sx, sy, sx, sy))
+            )
+            ball_cx = (x1 + x2) / 2
+            ball_cy = (y1 + y2) / 2
+            ball_found = True
+
+        # ROI 프레임의 사람 수는 crop 안쪽만 센 값이므로 쓰지 않음
+        if is_roi:
+            person_count = None
+
+        return ball_found, ball_cx, ball_cy, person_count
+
+    def _infer(self, batch):
+        results = self.model([b[1] for b in batch], verbose=False)
+        # Results 는 원본 프레임을 물고 있으므로 바로 가벼운 튜플로 변환
+        return [self._parse_result(r, b[3]) for r, b in zip(results, batch)]
+
+    def _stop_requested(self):
+        try:
+            p = self.progress.load()
+            if p and p.get("status") == "stopped":
+                print("🔴 사용자 중지 요청 감지: 분석 중단")
+                return True
+        except Exception as e:
+            print(f"progress 상태 확인 오류: {e}")
+        return False
+
+    def _report_progress(self, frame_idx, total, video_name):
+        progress_val = int((frame_idx / max(total, 1)) * 100)
+        self.progress.set(max(0, min(progress_val, 100)), "running", video_name)
+
     # ---------------------------------------------------------
     # 메인 실행 함수
     # ---------------------------------------------------------
-    def run(self, video_path: Path, video_name: str):
+    def run(self, video_path, video_name: str, save=True, ingest=None, scale=(1.0, 1.0)):
         """
-        video_path : 로컬 temp mp4 경로
+        video_path : 로컬 temp mp4 경로 또는 R2 서명 URL (VideoSource.path, 프록시가 있으면 프록시)
         video_name : R2에 올라간 실제 파일명 (coords / 저장용 키)
+        save       : False 면 저장하지 않고 결과 item 만 반환 (워커 프로세스용)
+        ingest     : VideoSource.stats - 다운로드 시간까지 포함한 time-to-first-frame 계산용
+        scale      : VideoSource.scale - 프록시 좌표 → 원본 좌표 배율
+        """
+        print("YOLO run 시작:", video_name, " (ingest:", (ingest or {}).get("ingest", "local"),
+              ", proxy:", (ingest or {}).get("proxy", False), ")")
+
+        try:
+            result = self.analyze_range(video_path, video_name, scale=scale)
+        except Exception as e:
+            # 일부 프레임만 분석된 결과는 저장하지 않음 → error 로 남기고 호출한 쪽 (작업 큐) 으로
+            print("❌ YOLO 분석 오류:", video_name, e)
+            self.progress.set(0, "error", video_name, error=str(e))
+            raise
+        if result is None:
+            return
+
+        merged = merge_clips(result["clips"])
+        stats = with_ingest_stats(result["stats"], ingest)
+
+        self.progress.set(100, "done", video_name, clips=merged, stats=stats)
+        print("YOLO 분석 완료:", video_name, merged)
+
+        item = {
+            "id": str(uuid.uuid4()),
+            "video": video_name,
+            "fps": result["fps"],
+            "frames": result["frames"],
+            "clips": merged,
+            "stats": stats,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        if save:
+            add_item(item)
+        return item
+
+    # ---------------------------------------------------------
+    # 구간 분석 (run / 시간 분할 분석 공용)
+    # ---------------------------------------------------------
+    def analyze_range(self, video_path, video_name, first=1, last=None, warmup=0, progress_key=None,
+                      scale=(1.0, 1.0)):
+        """
+        first ~ last 번 프레임(1부터, 양끝 포함)을 분석.
+        warmup 프레임만큼 앞에서부터 읽어 공 상태(Attempt / prev_cy)를 이어받되,
+        그 구간의 frames_info / clips 는 결과에 넣지 않는다.
+        scale 이 (1, 1) 이 아니면 video_path 는 프록시 - 검출 좌표는 원본 해상도로 환산되므로
+        골대 좌표 / frames_info 는 모두 원본 기준 그대로.
+
+        return : {"fps", "total", "frames", "clips"(merge 전), "stats"} / 영상 열기 실패 시 None
         """
-        print("YOLO run 시작:", video_path, " (logical name:", video_name, ")")
+        progress_key = progress_key or video_name
 
         # 골대 좌표 불러오기 (video_name 기준)
         coords = self.coord_service.load(video_name)
         if not coords:
             print("⚠ 골대 좌표 없음 → 득점/시도 감지 비활성화하고 분석만 진행합니다.")
-            bx1 = by1 = bx2 = by2 = None
-        else:
-            bx1, by1, bx2, by2 = coords["x1"], coords["y1"], coords["x2"], coords["y2"]
-            basket_width = bx2 - bx1
-            basket_height = by2 - by1
 
+        open_at = time.perf_counter()
         cap = cv2.VideoCapture(str(video_path))
         if not cap.isOpened():
-            self.progress.set(0, "error_video_open", video_name)
-            return
+            self.progress.set(0, "error_video_open", progress_key)
+            return None
 
         total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         fps = cap.get(cv2.CAP_PROP_FPS)
         if not fps or fps <= 0:
             fps = 30.0
 
-        frame_idx = 0
+        frame_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        roi = None
+        if self.roi and coords:
+            # ROI 는 실제로 디코딩하는 (프록시) 프레임 기준 픽셀
+            kx, ky = scale
+            roi = basket_roi(
+                {"x1": coords["x1"] / kx, "y1": coords["y1"] / ky,
+                 "x2": coords["x2"] / kx, "y2": coords["y2"] / ky},
+                frame_w, frame_h, *self.roi_margins,
+            )
+            print("🎯 ROI 추론 영역:", roi, f"(전체 {frame_w}x{frame_h})")
+
+        start_pos = max(0, first - 1 - warmup)   # 처음 읽을 프레임 위치 (0부터)
+        end_frame = last or total
+
+        tracker = BallTracker(coords, fps, self.START_PAD, self.END_PAD, record_from=first)
+        reader = FrameReader(cap, self.stride, self.resize_width, roi, self.roi_full_every,
+                             last_frame=last, scale=scale)
+        if start_pos:
+            reader.rewind(start_pos)
+        # warm-up 구간은 stride 없이 매 프레임
+        reader.dense_until = first - 1
+
+        # 공이 골대 근처에서 마지막으로 보인 뒤 이만큼은 매 프레임 분석
+        # (Attempt 유지 시간 fps * 1.0 보다 길게)
+        post = FramePostProcessor(tracker, fps, int(fps * 1.0) + 1, record_from=first)
+        post.last_done = start_pos
+        post.dense_until = first - 1
+
+        def report(done):
+            self._report_progress(done - start_pos, end_frame - start_pos, progress_key)
+
+        started = time.time()
+        try:
+            if self.pipeline:
+                infer_stats = self._run_pipelined(reader, post, report)
+            else:
+                infer_stats = self._run_sequential(reader, post, report)
+        finally:
+            cap.release()
+
+        elapsed = max(time.time() - started, 1e-6)
+        stats = {
+            "frames_decoded": reader.decoded,
+            "frames_inferred": infer_stats["inferred"],
+            "batch_size": self.batch_size,
+            "stride": self.stride,
+            "pipeline": self.pipeline,
+            "roi": list(roi) if roi else None,
+            "decode_size": [frame_w, frame_h],
+            "scale": list(scale),
+            "elapsed_sec": round(elapsed, 2),
+            "effective_fps": round(reader.decoded / elapsed, 2),
+            # 영상 열기 → 첫 프레임 디코딩까지 (다운로드 시간 제외)
+            "first_frame_sec": round(reader.first_frame_at - open_at, 3) if reader.first_frame_at else None,
+            # 단계별 소요 시간 (어느 단계가 병목인지 확인용)
+            "stages": {
+                "decode_sec": round(reader.decode_sec, 2),
+                "infer_sec": round(infer_stats["infer_sec"], 2),
+                "post_sec": round(post.post_sec, 2),
+                "decode_wait_sec": round(infer_stats.get("decode_wait_sec", 0.0), 2),
+                "infer_wait_sec": round(infer_stats.get("infer_wait_sec", 0.0), 2),
+            },
+        }
+        print("YOLO 처리 통계:", progress_key, stats)
 
-        clips = []
-        ball_status = None
-        ball_status_frame = 0
-        prev_cy = None
-        frames_info = []
-        person_count = 0
+        return {
+            "fps": fps,
+            "total": total,
+            "frames": post.frames_info,
+            "clips": tracker.clips,
+            "stats": stats,
+        }
 
-        while True:
-            try:
-                p = self.progress.load()
-                if p and p.get("status") == "stopped":
-                    print("🔴 사용자 중지 요청 감지: 분석 중단")
-                    break
-            except Exception as e:
-                print(f"progress 상태 확인 오류: {e}")
-                pass
+    # ---------------------------------------------------------
+    # 단일 스레드: 디코딩 → 추론 → 후처리 순서대로
+    # ---------------------------------------------------------
+    def _run_sequential(self, reader, post, report):
+        inferred = 0
+        infer_sec = 0.0
+        eof = False
 
-            ret, frame = cap.read()
-            if not ret:
+        while not eof:
+            if self._stop_requested():
                 break
 
-            frame_idx += 1
-            now_sec = frame_idx / fps
-
-            progress_val = int((frame_idx / total) * 100)
-            self.progress.set(progress_val, "running", video_name)
+            batch = []
+            while len(batch) < self.batch_size:
+                item = reader.read()
+                if item is None:
+                    eof = True
+                    break
+                batch.append(item)
 
-            result = self.model(frame, verbose=False)[0]
+            if not batch:
+                break
 
-            ball_found = False
-            ball_cx, ball_cy = None, None
-            person_count = 0
+            t0 = time.perf_counter()
+            dets = self._infer(batch)
+            infer_sec += time.perf_counter() - t0
+            inferred += len(batch)
 
-            for box in result.boxes:
-                cls = int(box.cls)
-                label = self.model.names[cls]
+            for (idx, _, sampled, _), det in zip(batch, dets):
+                if post.feed(idx, sampled, det):
+                    reader.rewind(post.last_done)
+                    eof = False
+                    break
+            reader.dense_until = post.dense_until
 
-                if label == "person":
-                    conf = float(box.conf)
-                    if conf >= 0.25:
-                        person_count += 1
-                    continue
+            report(post.last_done)
 
-                if label != "ball":
-                    continue
+        return {"inferred": inferred, "infer_sec": infer_sec}
 
-                conf = float(box.conf)
-                if conf < 0.25:
+    # ---------------------------------------------------------
+    # 파이프라인: 디코더 스레드 → [frame 큐] → 추론(현재 스레드) → [결과 큐] → 후처리 스레드
+    # ---------------------------------------------------------
+    def _run_pipelined(self, reader, post, report):
+        ctl = _PipelineControl()
+        frame_q = queue.Queue(maxsize=self.queue_depth)
+        det_q = queue.Queue(maxsize=self.queue_depth)
+        waits = {"decode_wait_sec": 0.0, "infer_wait_sec": 0.0}
+
+        def put(q, msg, wait_key=None):
+            t0 = time.perf_counter()
+            while not ctl.stopped:
+                try:
+                    q.put(msg, timeout=0.1)
+                    break
+                except queue.Full:
                     continue
+            if wait_key:
+                waits[wait_key] += time.perf_counter() - t0
 
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                ball_cx = (x1 + x2) / 2
-                ball_cy = (y1 + y2) / 2
-                ball_found = True
-
-            frames_info.append({
-                "t": round(now_sec, 4),
-                "ball": {
-                    "found": bool(ball_found),
-                    "cx": ball_cx,
-                    "cy": ball_cy
-                },
-                "persons": person_count,
-            })
-
-            if not ball_found:
-                prev_cy = None
-                continue
-
-            if bx1 is None:
-                upper_zone = lower_zone = False
-            else:
-                upper_zone = (
-                    (bx1 - 2 * basket_width <= ball_cx <= bx2 + 2 * basket_width)
-                    and (ball_cy <= by1)
-                )
-
-            if upper_zone:
-                ball_status = "Attempt"
-                ball_status_frame = frame_idx
-
-            if ball_status == "Attempt":
-                if (frame_idx - ball_status_frame) > fps * 1.0:
-                    ball_status = None
-
-            if prev_cy is not None and ball_status == "Attempt":
-
-                is_downward = ball_cy > prev_cy
-
-                lower_zone = (
-                    (bx1 - 0.3 * basket_width <= ball_cx <= bx2 + 0.3 * basket_width)
-                    and (by1 <= ball_cy <= by2 + basket_height * 1.2)
-                )
-
-                if lower_zone and is_downward:
-                    start_t = max(0, now_sec - self.START_PAD)
-                    end_t = now_sec + self.END_PAD
-
-                    clips.append({
-                        "start": round(start_t, 2),
-                        "end": round(end_t, 2)
-                    })
+        def decode_stage():
+            try:
+                while True:
+                    with ctl.cond:
+                        if ctl.stopped:
+                            return
+                        if ctl.rewind_to is not None:
+                            reader.rewind(ctl.rewind_to)
+                            ctl.rewind_to = None
+                        gen = ctl.generation
+                        reader.dense_until = post.dense_until
+
+                    item = reader.read()
+                    if item is not None:
+                        put(frame_q, (gen, item), "decode_wait_sec")
+                        continue
+
+                    put(frame_q, (gen, _EOF), "decode_wait_sec")
+
+                    # EOF 이후에도 후처리 단계에서 되감기 요청이 올 수 있음
+                    with ctl.cond:
+                        ctl.cond.wait_for(lambda: ctl.stopped or ctl.generation != gen)
+            except Exception as e:
+                print("❌ 디코더 스레드 오류:", e)
+                ctl.fail(e)
 
-                    ball_status = None
+        def post_stage():
+            gen = 0
+            try:
+                while True:
+                    msg = det_q.get()
+                    if msg is None:
+                        return
+                    msg_gen, payload = msg
+                    if msg_gen != gen:
+                        continue    # 되감기 이전 세대 결과는 버림
+                    if payload is _EOF:
+                        ctl.stop()
+                        return
+                    for idx, sampled, det in payload:
+                        if post.feed(idx, sampled, det):
+                            gen = ctl.request_rewind(post.last_done)
+                            break
+            except Exception as e:
+                print("❌ 후처리 스레드 오류:", e)
+                ctl.fail(e)
 
-            prev_cy = ball_cy
+        decoder = threading.Thread(target=decode_stage, daemon=True)
+        post_thread = threading.Thread(target=post_stage, daemon=True)
+        decoder.start()
+        post_thread.start()
 
-        cap.release()
+        inferred = 0
+        infer_sec = 0.0
 
-        merged = merge_clips(clips)
+        try:
+            while not ctl.stopped:
+                if self._stop_requested():
+                    break
 
-        self.progress.set(100, "done", video_name, clips=merged)
-        print("YOLO 분석 완료:", video_name, merged)
+                batch = []
+                batch_gen = None
+                eof_gen = None
+
+                while len(batch) < self.batch_size and not ctl.stopped:
+                    t0 = time.perf_counter()
+                    try:
+                        gen, item = frame_q.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    finally:
+                        waits["infer_wait_sec"] += time.perf_counter() - t0
+
+                    if gen != ctl.generation:
+                        continue
+                    if batch and gen != batch_gen:
+                        batch = []
+                    batch_gen = gen
+
+                    if item is _EOF:
+                        eof_gen = gen
+                        break
+                    batch.append(item)
+
+                if batch:
+                    t0 = time.perf_counter()
+                    dets = self._infer(batch)
+                    infer_sec += time.perf_counter() - t0
+                    inferred += len(batch)
+
+                    put(det_q, (batch_gen, [
+                        (idx, sampled, det) for (idx, _, sampled, _), det in zip(batch, dets)
+                    ]))
+
+                if eof_gen is not None:
+                    put(det_q, (eof_gen, _EOF))
+
+                report(post.last_done)
+        finally:
+            ctl.stop()
+            while post_thread.is_alive():
+                try:
+                    det_q.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            decoder.join()
+            post_thread.join()
 
-        item = {
-            "id": str(uuid.uuid4()),
-            "video": video_name,
-            "fps": fps,
-            "frames": frames_info,
-            "clips": merged,
-            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
+        # 중간에 끊긴 결과를 정상 종료로 저장하지 않도록 (작업 큐가 재시도)
+        if ctl.error is not None:
+            raise ctl.error
 
-        add_item(item)
+        return {"inferred": inferred, "infer_sec": infer_sec, **waits}
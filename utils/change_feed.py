@@ -0,0 +1,38 @@
+import uuid
+from threading import Condition
+
+
+# 서버 프로세스마다 다른 값 → 재시작 후 들어온 Last-Event-ID 는 무효 처리
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+class ChangeFeed:
+    """
+    key(job_id) 별 버전 번호.
+    상태가 바뀔 때 touch() 하면 wait() 로 기다리던 SSE 스트림이 깨어난다.
+    """
+
+    def __init__(self):
+        self.cond = Condition()
+        self.seq = 0
+        self.versions = {}
+
+    def touch(self, key):
+        with self.cond:
+            self.seq += 1
+            self.versions[key] = self.seq
+            self.cond.notify_all()
+
+    def version(self, key):
+        with self.cond:
+            return self.versions.get(key, 0)
+
+    def wait(self, key, after, timeout):
+        """ key 버전이 after 보다 커지거나 timeout 까지 대기 → 현재 버전 """
+        with self.cond:
+            self.cond.wait_for(lambda: self.versions.get(key, 0) > after, timeout)
+            return self.versions.get(key, 0)
+
+    def forget(self, key):
+        with self.cond:
+            self.versions.pop(key, None)
@@ -1,51 +1,218 @@
+import copy
 import json
+import os
+import time
+import uuid
 from pathlib import Path
 from threading import Lock
 
+from utils.change_feed import ChangeFeed
+
+
+DEFAULT_JOB = "default"
+
+# 서버가 죽었을 때 진행 중이던 상태 → 재시작 후 이 상태로 표시
+RUNNING_STATUSES = ("running", "multi_running")
+
+
+def _initial_state():
+    return {
+        "progress": 0,
+        "status": "idle",
+        "video": "",
+        "clips": [],
+        "videos": [],
+        "index": 0,
+        "total": 0
+    }
+
+
+class JobProgress:
+    """
+    특정 job_id 에 묶인 progress.
+    YoloHighlighter 등 기존 코드가 쓰던 load() / set() 모양 그대로 사용 가능.
+    """
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+
+    def load(self):
+        return self.manager.load(self.job_id)
+
+    def set(self, percent=None, status=None, video=None, **kwargs):
+        self.manager.set(percent, status, video, job_id=self.job_id, **kwargs)
+
+    def is_stopped(self):
+        return self.manager.is_stopped(self.job_id)
+
 
 class ProgressManager:
-    def __init__(self, path: Path):
-        self.path = path
+    """
+    작업(job_id)별 진행 상태를 메모리에 보관.
+    - set() / load() 는 파일을 건드리지 않음
+    - path 가 있으면 상태 변경 / min_interval 초 경과 / min_delta % 변화 시에만 파일로 저장
+      (서버 재시작 시 마지막 상태 복구용)
+    """
+
+    def __init__(self, path: Path = None, min_interval=1.0, min_delta=10, max_jobs=50):
+        self.path = Path(path) if path else None
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self.max_jobs = max_jobs
         self.lock = Lock()
+        self.feed = ChangeFeed()    # SSE 스트림용 변경 알림
 
-        if not self.path.exists():
-            self.save({
-                "progress": 0,
-                "status": "idle",
-                "video": "",
-                "clips": [],
-                "videos": [],
-                "index": 0,
-                "total": 0
-            })
+        self.jobs = {}
+        self.latest = DEFAULT_JOB
+        self._last_saved = 0.0
+        self._saved_progress = {}
+        self._dirty = False
 
-    def load(self):
+        self._restore()
+        if DEFAULT_JOB not in self.jobs:
+            self.jobs[DEFAULT_JOB] = _initial_state()
+
+    # ---------------------------------------
+    # 파일 복구 / 저장
+    # ---------------------------------------
+    def _restore(self):
+        if not self.path or not self.path.exists():
+            return
         try:
-            with self.lock:
-                with open(self.path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except:
-            return {}
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+
+        if "jobs" in data:
+            self.jobs = data["jobs"]
+            self.latest = data.get("latest") or DEFAULT_JOB
+        elif data:
+            # 예전 형식: progress.json 전체가 상태 1개
+            self.jobs = {DEFAULT_JOB: data}
+
+        for state in self.jobs.values():
+            if state.get("status") in RUNNING_STATUSES:
+                state["status"] = "error_interrupted"
+
+    def _persist(self, force=False):
+        """ lock 을 잡은 상태에서 호출 """
+        if not self.path:
+            return
+        now = time.time()
+        if not force and not self._dirty:
+            return
+        if not force and now - self._last_saved < self.min_interval:
+            return
 
-    def save(self, data):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"latest": self.latest, "jobs": self.jobs}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+        self._last_saved = now
+        self._dirty = False
+        self._saved_progress = {k: v.get("progress", 0) for k, v in self.jobs.items()}
+
+    def flush(self):
+        with self.lock:
+            self._persist(force=True)
+
+    # ---------------------------------------
+    # job 관리
+    # ---------------------------------------
+    def new_job(self, **fields):
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            state = _initial_state()
+            state.update(fields)
+            state["job_id"] = job_id
+            self.jobs[job_id] = state
+            self.latest = job_id
+
+            # 오래된 job 정리 (default 는 유지)
+            while len(self.jobs) > self.max_jobs:
+                oldest = next(k for k in self.jobs if k != DEFAULT_JOB)
+                del self.jobs[oldest]
+
+            self._dirty = True
+            self._persist(force=True)
+        self.feed.touch(job_id)
+        return job_id
+
+    def job(self, job_id=None):
+        return JobProgress(self, self.resolve(job_id))
+
+    def resolve(self, job_id=None):
+        """ job_id 가 없으면 가장 최근 job """
+        return job_id or self.latest
+
+    # ---------------------------------------
+    # 기존 인터페이스
+    # ---------------------------------------
+    def load(self, job_id=None):
         with self.lock:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            state = self.jobs.get(self.resolve(job_id))
+            return dict(state) if state else {}
+
+    def save(self, data, job_id=None):
+        with self.lock:
+            job_id = self.resolve(job_id)
+            self.jobs[job_id] = dict(data)
+            self._dirty = True
+            self._persist(force=True)
+        self.feed.touch(job_id)
 
     # 🔥 수정된 set 함수 (어떤 필드든 저장 가능)
-    def set(self, percent=None, status=None, video=None, **kwargs):
-        data = self.load()
+    def set(self, percent=None, status=None, video=None, job_id=None, **kwargs):
+        with self.lock:
+            job_id = self.resolve(job_id)
+            data = self.jobs.setdefault(job_id, _initial_state())
+
+            # 중지된 job 은 늦게 도착한 running 갱신으로 되살아나지 않도록
+            if data.get("status") == "stopped" and status in RUNNING_STATUSES:
+                status = None
+            status_changed = status is not None and status != data.get("status")
 
-        if percent is not None:
-            data["progress"] = percent
-        if status is not None:
-            data["status"] = status
-        if video is not None:
-            data["video"] = video
+            fields = dict(kwargs)
+            if percent is not None:
+                fields["progress"] = percent
+            if status is not None:
+                fields["status"] = status
+            if video is not None:
+                fields["video"] = video
 
-        # 🔥 videos, index, total, clips 등 자유롭게 저장 가능
-        for k, v in kwargs.items():
-            data[k] = v
+            # 🔥 videos, index, total, clips 등 자유롭게 저장 가능
+            changed = False
+            for k, v in fields.items():
+                if data.get(k) != v:
+                    # 호출 쪽에서 계속 고치는 dict / list 를 그대로 물고 있지 않도록 복사
+                    data[k] = copy.deepcopy(v)
+                    changed = True
 
-        self.save(data)
+            if not changed:
+                return
 
+            self._dirty = True
+            moved = abs(data.get("progress", 0) - self._saved_progress.get(job_id, 0))
+            self._persist(force=status_changed or moved >= self.min_delta)
+        self.feed.touch(job_id)
+
+    def stop(self, job_id=None):
+        self.set(status="stopped", job_id=job_id)
+
+    def is_stopped(self, job_id=None):
+        with self.lock:
+            state = self.jobs.get(self.resolve(job_id))
+            return bool(state) and state.get("status") == "stopped"
+
+    def reset(self):
+        with self.lock:
+            old = list(self.jobs)
+            self.jobs = {DEFAULT_JOB: _initial_state()}
+            self.latest = DEFAULT_JOB
+            self._saved_progress = {}
+            self._persist(force=True)
+        for job_id in old:
+            self.feed.touch(job_id)
@@ -0,0 +1,47 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+import config
+from services.job_queue import JobWorker, get_job_queue
+from services.job_handlers import build_handlers, job_limits, job_limit_groups
+
+
+def build_worker():
+    queue = get_job_queue()
+    return JobWorker(queue, build_handlers(queue), job_limits(), job_limit_groups())
+
+
+_embedded_lock = None
+
+
+def start_embedded_worker():
+    """
+    웹 프로세스 안에서 작업 워커 스레드 시작 (JOB_WORKER_EMBEDDED=1).
+    gunicorn 워커가 여러 개여도 이 서버에서는 1개만 (lock 파일) → 나머지 프로세스는 건너뜀
+    return : 시작했으면 JobWorker / 아니면 None
+    """
+    global _embedded_lock
+    if _embedded_lock is not None:
+        return None
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+
+    lock = open(config.JOB_DB_PATH.with_name(config.JOB_DB_PATH.name + ".worker.lock"), "a")
+    if fcntl:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            print("↪ 내장 작업 워커는 다른 프로세스에서 실행 중 → 건너뜀")
+            return None
+    _embedded_lock = lock
+    return build_worker().start_background()
+
+
+# 🔥 별도 작업 워커 프로세스: python worker.py
+#    (웹 쪽은 JOB_WORKER_EMBEDDED=0 으로 두고 이 프로세스를 따로 실행)
+if __name__ == "__main__":
+    print("📦 job db:", config.JOB_DB_PATH)
+    build_worker().run_forever()